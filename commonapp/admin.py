@@ -1,3 +1,7 @@
 from django.contrib import admin
 
 # Register your models here.
+from .models import MediaBlob, OutboundEmail
+
+admin.site.register(OutboundEmail)
+admin.site.register(MediaBlob)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CommonappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'commonapp'
+
+    def ready(self):
+        import commonapp.signals  # Import signals when the app is ready
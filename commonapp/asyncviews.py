@@ -0,0 +1,63 @@
+"""Plumbing for async (ASGI) views of read endpoints that fan out into independent queries.
+
+DRF viewsets are synchronous, so these are plain Django `async def` views with the same JWT
+authentication, role check and JSON error shape as the viewset actions they mirror.
+
+Django's async ORM methods (aget, acount, ...) all hand the query to one shared thread
+(thread_sensitive), so gathering them still runs them one after another. in_thread() runs
+each query function in a worker thread with its own database connection instead, which is
+what lets asyncio.gather() overlap them; the connection is closed afterwards the way the end
+of a request would (CONN_MAX_AGE), which hands it back to the pool (commonapp/dbpool.py).
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.http import JsonResponse
+from rest_framework import exceptions
+
+from .authentication import CachedJWTAuthentication
+
+
+def in_thread(func, *args, **kwargs):
+    """Awaitable running func(*args, **kwargs) in a worker thread on its own DB connection"""
+    def run():
+        try:
+            return func(*args, **kwargs)
+        finally:
+            connection.close_if_unusable_or_obsolete()
+    return sync_to_async(run, thread_sensitive=False)()
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, safe=False, encoder=DjangoJSONEncoder)
+
+
+def _error(exc, request=None, authentication=None):
+    response = json_response({'detail': str(exc.detail)}, status=exc.status_code)
+    if exc.status_code == 401 and authentication is not None:
+        response['WWW-Authenticate'] = authentication.authenticate_header(request)
+    return response
+
+
+def api_view(user_type):
+    """GET-only async view for users of `user_type` ('doctor' / 'patient'), like IsDoctor / IsPatient"""
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return _error(exceptions.MethodNotAllowed(request.method))
+            authentication = CachedJWTAuthentication()
+            try:
+                result = await sync_to_async(authentication.authenticate)(request)
+            except exceptions.APIException as exc:
+                return _error(exc, request, authentication)
+            if result is None:
+                return _error(exceptions.NotAuthenticated(), request, authentication)
+            request.user, request.auth = result
+            if request.user.user_type != user_type:
+                return _error(exceptions.PermissionDenied())
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
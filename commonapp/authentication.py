@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import CustomUser
+
+# user fields kept in the cached principal; everything else stays deferred on the request user
+PRINCIPAL_FIELDS = ('id', 'username', 'user_type', 'is_active', 'is_staff', 'is_superuser')
+
+
+def principal_cache_key(user_id):
+    return f"commonapp:principal:{user_id}"
+
+
+def load_principal(user_id):
+    """{field: value} for the user plus doctor_id/patient_id, from the cache or one query"""
+    key = principal_cache_key(user_id)
+    principal = cache.get(key)
+    if principal is None:
+        row = (
+            CustomUser.objects.filter(id=user_id)
+            .values(*PRINCIPAL_FIELDS, 'doctor__id', 'patient__id')
+            .first()
+        )
+        if row is None:
+            return None
+        principal = {field: row[field] for field in PRINCIPAL_FIELDS}
+        principal['doctor_id'] = row['doctor__id']
+        principal['patient_id'] = row['patient__id']
+        cache.set(key, principal, getattr(settings, 'AUTH_PRINCIPAL_CACHE_TIMEOUT', 60))
+    return principal
+
+
+def forget_principal(user_id):
+    cache.delete(principal_cache_key(user_id))
+
+
+def _partial_instance(model, values):
+    """Model instance with only `values` loaded, the rest deferred (like .only())"""
+    field_names = [field.attname for field in model._meta.concrete_fields if field.attname in values]
+    return model.from_db(DEFAULT_DB_ALIAS, field_names, [values[name] for name in field_names])
+
+
+def _set_role(user, accessor, model, pk):
+    # prime the reverse one-to-one so hasattr(user, 'doctor'/'patient') never hits the DB
+    related = getattr(CustomUser, accessor).related
+    role = _partial_instance(model, {'id': pk, 'user_id': user.pk}) if pk else None
+    related.set_cached_value(user, role)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication without the per-request user query.
+
+    request.user is a CustomUser built from the cached principal with only PRINCIPAL_FIELDS
+    loaded (other fields load lazily, and save() only writes loaded fields), and with
+    user.doctor / user.patient set to pk-only instances, so role-filtered querysets like
+    Appointment.objects.filter(doctor=user.doctor) need no extra auth query.
+    The cache entry is dropped whenever the user, or their doctor/patient row, changes.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        principal = load_principal(user_id)
+        if principal is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not principal['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        from doctorapp.models import Doctor
+        from patientapp.models import Patient
+
+        user = _partial_instance(CustomUser, {field: principal[field] for field in PRINCIPAL_FIELDS})
+        _set_role(user, 'doctor', Doctor, principal['doctor_id'])
+        _set_role(user, 'patient', Patient, principal['patient_id'])
+        return user
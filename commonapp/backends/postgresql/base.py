@@ -0,0 +1,8 @@
+"""Django's PostgreSQL backend, with a per-process connection pool when settings give it a POOL (commonapp/dbpool.py)"""
+from django.db.backends.postgresql import base
+
+from commonapp.dbpool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    pass
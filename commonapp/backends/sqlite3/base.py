@@ -0,0 +1,11 @@
+"""Django's SQLite backend with the same connection pool, to try pooling locally without PostgreSQL"""
+from django.db.backends.sqlite3 import base
+
+from commonapp.dbpool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+
+    def poolable(self):
+        # an in-memory database lives and dies with its one connection
+        return not self.is_in_memory_db()
@@ -0,0 +1,116 @@
+"""Response compression negotiated from Accept-Encoding: brotli or gzip, for large bodies only.
+
+Like django.middleware.gzip.GZipMiddleware, with three differences:
+- It also offers brotli ("br") when the brotli package is installed.
+- It honours the client's q-values.
+- It leaves bodies under RESPONSE_COMPRESSION_MIN_BYTES alone, since compressing a detail
+  response costs more CPU than the bytes it saves.
+
+Streaming responses are passed through untouched. Compressing an event stream would buffer
+its events, and the exports are streamed to keep memory flat.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'application/xml', 'image/svg+xml')
+
+
+def _min_bytes():
+    return getattr(settings, 'RESPONSE_COMPRESSION_MIN_BYTES', 1024)
+
+
+def _brotli_quality():
+    return getattr(settings, 'RESPONSE_BROTLI_QUALITY', 5)
+
+
+def available_encodings():
+    """Codings this process can produce, preferred first"""
+    return (['br'] if brotli is not None else []) + ['gzip']
+
+
+def accepted_encodings(header):
+    """{coding: q} of an Accept-Encoding header"""
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def choose_encoding(header):
+    """The coding to answer an Accept-Encoding header with, or None for identity"""
+    accepted = accepted_encodings(header)
+    best, best_q = None, 0.0
+    for coding in available_encodings():
+        q = accepted.get(coding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(content, coding):
+    if coding == 'br':
+        return brotli.compress(content, quality=_brotli_quality())
+    return compress_string(content, max_random_bytes=100)  # GZipMiddleware's BREACH mitigation
+
+
+class CompressionMiddleware:
+    # async capable without a thread hop, so the async dashboard views stay on the event loop
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding') or len(response.content) < _min_bytes():
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if coding is None:
+            return response
+        compressed = compress(response.content, coding)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = coding
+        # the bytes differ from the identity response's, so a strong validator becomes weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,342 @@
+"""Bounded per-process database connection pool, used by the backends in commonapp/backends/.
+
+Django's built-in pooling (OPTIONS={'pool': ...}) needs psycopg 3 and psycopg_pool. This tree
+runs psycopg2, so these backends pool the DB-API connections themselves:
+
+    DATABASES = {'default': {'ENGINE': 'commonapp.backends.postgresql', 'CONN_MAX_AGE': 0,
+                             'CONN_HEALTH_CHECKS': True, 'POOL': {'max_size': 10}, ...}}
+
+When Django closes a connection (the end of a request, with CONN_MAX_AGE=0), the pool takes the
+raw connection back instead of closing it. The next connect() in any thread of the process
+reuses an idle one. Each worker process opens at most max_size connections, so the database
+sees at most workers x max_size. A checkout that finds them all busy waits up to `timeout`
+seconds and then fails with OperationalError.
+
+With CONN_HEALTH_CHECKS on, a connection that sat idle longer than `check_interval` seconds is
+pinged (SELECT 1) before it is handed out. Connections older than `max_lifetime` are closed
+instead of reused, and so are idle ones past `max_idle` beyond the first `min_size`.
+
+A streaming response holds its request's connection until the stream ends. Responses that
+can stay open indefinitely must hand it back once they are done with the database, as the
+event streams do (commonapp.events.release_connections). Otherwise every open stream pins a
+connection. The CSV/NDJSON exports keep theirs while they stream, because their server-side
+cursors need it.
+
+stats() reports each pool in this process (served at /api/db_pool/):
+- open, active and idle connections, and threads waiting for one
+- time spent waiting for a free connection
+- checkout latency and hold time percentiles
+- queries run on pooled connections and their time
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.base.base import NO_DB_ALIAS
+
+logger = logging.getLogger(__name__)
+
+SAMPLES = 1000  # recent checkouts kept per pool for the percentiles
+
+DEFAULTS = {
+    'min_size': 0,
+    'max_size': 10,
+    'timeout': 30.0,
+    'check_interval': 5.0,
+    'max_idle': 600.0,
+    'max_lifetime': 3600.0,
+}
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+def _percentiles(samples, pcts=(50, 95, 99)):
+    ordered = sorted(samples)
+    if not ordered:
+        return {f'p{pct}': None for pct in pcts}
+    return {
+        f'p{pct}': round(ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))], 3)
+        for pct in pcts
+    }
+
+
+def _close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+class ConnectionPool:
+    """At most max_size DB-API connections shared by the threads of one process.
+
+    check(connection) pings a connection (raising or returning False when it's unusable);
+    reset(connection) runs before it goes back to idle (raising discards it).
+    """
+
+    def __init__(self, check=None, reset=None, **options):
+        unknown = set(options) - set(DEFAULTS)
+        if unknown:
+            raise ImproperlyConfigured(f"Unknown POOL options: {', '.join(sorted(unknown))}")
+        options = {**DEFAULTS, **options}
+        if options['max_size'] < 1 or not 0 <= options['min_size'] <= options['max_size']:
+            raise ImproperlyConfigured("POOL needs 1 <= max_size and 0 <= min_size <= max_size")
+        self.min_size, self.max_size = options['min_size'], options['max_size']
+        self.timeout, self.check_interval = options['timeout'], options['check_interval']
+        self.max_idle, self.max_lifetime = options['max_idle'], options['max_lifetime']
+        self.check = check
+        self.reset = reset
+        self.pid = os.getpid()
+        self.closed = False
+        self._cond = threading.Condition()
+        self._idle = []  # (connection, opened_at, returned_at), most recently returned last
+        self._out = {}  # id(connection) -> (opened_at, checked_out_at) of active connections
+        self._size = 0  # open connections, idle or active (including ones being opened)
+        self._waiting = 0
+        self._counts = {'checkouts': 0, 'connects': 0, 'timeouts': 0, 'failed_checks': 0, 'discarded': 0, 'queries': 0}
+        self._wait_ms_total = self._query_ms_total = 0.0
+        self._wait_ms = deque(maxlen=SAMPLES)
+        self._checkout_ms = deque(maxlen=SAMPLES)
+        self._held_ms = deque(maxlen=SAMPLES)
+
+    def getconn(self, connect):
+        """An idle connection, or a new one from connect() while under max_size"""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = 0.0
+        while True:
+            with self._cond:
+                if self.closed:
+                    raise PoolTimeout("The connection pool is closed")
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counts['timeouts'] += 1
+                        raise PoolTimeout(
+                            f"No database connection free after {self.timeout}s ({self.max_size} in use in this process)"
+                        )
+                    self._waiting += 1
+                    began = time.monotonic()
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                        waited += time.monotonic() - began
+                if self._idle:
+                    connection, opened_at, returned_at = self._idle.pop()
+                else:
+                    connection = None
+                    self._size += 1  # the slot is taken now, the connection opened outside the lock
+
+            now = time.monotonic()
+            if connection is None:
+                try:
+                    connection = connect()
+                except BaseException:
+                    self._forget_slot()
+                    raise
+                opened_at = time.monotonic()
+                fresh = True
+            elif now - opened_at > self.max_lifetime:
+                self._discard(connection)
+                continue
+            elif self.check is not None and now - returned_at > self.check_interval and not self._healthy(connection):
+                self._discard(connection)
+                continue
+            else:
+                fresh = False
+
+            checked_out_at = time.monotonic()
+            with self._cond:
+                self._out[id(connection)] = (opened_at, checked_out_at)
+                self._counts['checkouts'] += 1
+                self._counts['connects'] += fresh
+                self._wait_ms_total += waited * 1000
+                self._wait_ms.append(waited * 1000)
+                self._checkout_ms.append((checked_out_at - start) * 1000)
+            return connection
+
+    def putconn(self, connection, discard=False):
+        """Take a checked out connection back; discard=True (or a failing reset) closes it"""
+        with self._cond:
+            opened_at, checked_out_at = self._out.pop(id(connection), (None, None))
+        if opened_at is None:
+            _close_quietly(connection)  # not (or no longer) ours, e.g. checked out of a replaced pool
+            return
+        if not discard and self.reset is not None:
+            try:
+                self.reset(connection)
+            except Exception:
+                discard = True
+        now = time.monotonic()
+        with self._cond:
+            self._held_ms.append((now - checked_out_at) * 1000)
+        if discard or self.closed or now - opened_at > self.max_lifetime:
+            self._discard(connection)
+            return
+        with self._cond:
+            self._idle.append((connection, opened_at, now))
+            stale = self._expire_idle(now)
+            self._cond.notify()
+        for item in stale:
+            _close_quietly(item[0])
+
+    def record_query(self, ms):
+        with self._cond:
+            self._counts['queries'] += 1
+            self._query_ms_total += ms
+
+    def close(self):
+        """Close the idle connections; active ones are closed when they come back"""
+        with self._cond:
+            self.closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for item in idle:
+            _close_quietly(item[0])
+
+    def stats(self):
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                'pid': self.pid,
+                'max_size': self.max_size,
+                'size': self._size,
+                'active': self._size - idle,
+                'idle': idle,
+                'waiting': self._waiting,
+                **self._counts,
+                'wait_ms_total': round(self._wait_ms_total, 3),
+                'wait_ms': {**_percentiles(self._wait_ms), 'max': round(max(self._wait_ms, default=0), 3)},
+                'checkout_ms': _percentiles(self._checkout_ms),
+                'held_ms': _percentiles(self._held_ms),
+                'query_ms_total': round(self._query_ms_total, 3),
+            }
+
+    def _healthy(self, connection):
+        try:
+            healthy = self.check(connection) is not False
+        except Exception:
+            healthy = False
+        if not healthy:
+            with self._cond:
+                self._counts['failed_checks'] += 1
+            logger.info("Dropping a pooled database connection that failed its health check")
+        return healthy
+
+    def _expire_idle(self, now):
+        """Pop idle connections unused for max_idle seconds (oldest first, keeping min_size open)"""
+        stale = []
+        while self._idle and self._size > self.min_size and now - self._idle[0][2] > self.max_idle:
+            stale.append(self._idle.pop(0))
+            self._size -= 1
+        return stale
+
+    def _forget_slot(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _discard(self, connection):
+        _close_quietly(connection)
+        with self._cond:
+            self._counts['discarded'] += 1
+        self._forget_slot()
+
+
+class PooledDatabaseWrapperMixin:
+    """Pools the connections of a backend's DatabaseWrapper when its settings have a POOL dict"""
+    _pools = {}  # alias -> (pid, connection params, ConnectionPool), shared by the threads of a process
+    _pools_lock = threading.Lock()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool_in_use = None  # the pool the current connection was checked out of
+        if self.settings_dict.get('POOL'):
+            self.execute_wrappers.append(self._count_query)
+
+    def poolable(self):
+        return True
+
+    @property
+    def connection_pool(self):
+        options = self.settings_dict.get('POOL')
+        if not options or self.alias == NO_DB_ALIAS or not self.poolable():
+            return None
+        if self.settings_dict.get('CONN_MAX_AGE', 0) != 0:
+            raise ImproperlyConfigured("Pooling doesn't support persistent connections, set CONN_MAX_AGE to 0")
+        params = self.get_connection_params()
+        with self._pools_lock:
+            pid, pool_params, pool = self._pools.get(self.alias, (None, None, None))
+            if pid == os.getpid() and pool_params == params:
+                return pool
+            # a forked worker leaves the parent's pool alone (closing would end the parent's
+            # sessions); new connection params (a test database) retire the old pool
+            if pool is not None and pid == os.getpid():
+                pool.close()
+            check = self.pool_check if self.settings_dict.get('CONN_HEALTH_CHECKS') else None
+            pool = ConnectionPool(check=check, reset=self.pool_reset, **({} if options is True else options))
+            self._pools[self.alias] = (os.getpid(), params, pool)
+            return pool
+
+    @staticmethod
+    def pool_check(connection):
+        cursor = connection.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def pool_reset(connection):
+        # a request that ended mid-transaction (or with autocommit off) must not leak it into the next
+        connection.rollback()
+
+    def get_new_connection(self, conn_params):
+        pool = self.connection_pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        try:
+            connection = pool.getconn(lambda: super(PooledDatabaseWrapperMixin, self).get_new_connection(conn_params))
+        except PoolTimeout as exc:
+            raise self.Database.OperationalError(str(exc)) from exc
+        self._pool_in_use = pool
+        return connection
+
+    def _close(self):
+        pool, self._pool_in_use = self._pool_in_use, None
+        if pool is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            # inside an atomic block close() keeps pointing at the connection until the block
+            # exits, so it must really be closed rather than handed to another thread
+            pool.putconn(self.connection, discard=self.in_atomic_block)
+
+    def _count_query(self, execute, sql, params, many, context):
+        start = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if self._pool_in_use is not None:
+                self._pool_in_use.record_query((time.monotonic() - start) * 1000)
+
+
+def stats():
+    """{alias: stats} of the connection pools of this process"""
+    with PooledDatabaseWrapperMixin._pools_lock:
+        pools = {alias: pool for alias, (pid, params, pool) in PooledDatabaseWrapperMixin._pools.items() if pid == os.getpid()}
+    return {alias: pool.stats() for alias, pool in pools.items()}
+
+
+def close_pool(alias):
+    """Close this process's pool for `alias`; the next connect() starts a new one"""
+    with PooledDatabaseWrapperMixin._pools_lock:
+        pid, params, pool = PooledDatabaseWrapperMixin._pools.pop(alias, (None, None, None))
+    if pool is not None and pid == os.getpid():
+        pool.close()
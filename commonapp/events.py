@@ -0,0 +1,374 @@
+"""Publish/subscribe and server-sent event (SSE) streams.
+
+Model signals publish small deltas (after commit) to a named channel; every open stream
+subscribed to that channel gets them pushed instead of re-polling a list endpoint.
+
+    events.publish_on_commit('beds', 'assigned', lambda: {...})
+    return events.stream_response(request, 'beds', initial=lambda: [('snapshot', [...])])
+
+Published events go through the transport named by settings.EVENT_TRANSPORT: the default
+LocalTransport reaches this process only, PostgresTransport every process sharing the
+database. Each process keeps the last EVENT_STREAM_HISTORY events per channel, so a client
+reconnecting with Last-Event-ID gets what it missed rather than a new snapshot.
+
+Streams are async generators when the request came in over ASGI (hospitalproject/asgi.py),
+so an open stream costs no thread. Under WSGI (runserver, gunicorn sync workers) the
+stream falls back to a blocking generator and holds its worker thread while open.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import secrets
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.http import StreamingHttpResponse
+from django.utils.module_loading import import_string
+from rest_framework.renderers import BaseRenderer
+
+logger = logging.getLogger(__name__)
+
+# returned to a subscriber that fell too far behind; its stream ends and the client reconnects
+_OVERFLOW = object()
+
+
+def _heartbeat():
+    return getattr(settings, 'EVENT_STREAM_HEARTBEAT', 15)
+
+
+def _queue_size():
+    return getattr(settings, 'EVENT_STREAM_QUEUE_SIZE', 1000)
+
+
+def _history_size():
+    return getattr(settings, 'EVENT_STREAM_HISTORY', 500)
+
+
+class Subscription:
+    """Events of one channel buffered for one stream, readable from a thread or an event loop"""
+
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.overflowed = False
+        self._items = deque()
+        self._condition = threading.Condition()
+        self._loop = self._wakeup = None  # bound by the first aget()
+
+    def deliver(self, item):
+        with self._condition:
+            if len(self._items) >= _queue_size():
+                self.overflowed = True
+            else:
+                self._items.append(item)
+            self._condition.notify()
+            loop, wakeup = self._loop, self._wakeup
+        if self.overflowed:
+            self.broker.unsubscribe(self)
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                self.broker.unsubscribe(self)  # the server loop is gone
+
+    def _pop(self):
+        if self.overflowed:
+            return _OVERFLOW
+        return self._items.popleft() if self._items else None
+
+    def get(self, timeout):
+        """Next (id, event, data), None after `timeout` seconds, or _OVERFLOW"""
+        with self._condition:
+            if not self._items and not self.overflowed:
+                self._condition.wait(timeout)
+            return self._pop()
+
+    async def aget(self, timeout):
+        with self._condition:
+            if self._loop is None:
+                self._loop, self._wakeup = asyncio.get_running_loop(), asyncio.Event()
+            item = self._pop()
+            if item is None:
+                self._wakeup.clear()
+        if item is not None:
+            return item
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        with self._condition:
+            return self._pop()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalTransport:
+    """Delivers published events to this process only (runserver, one worker, tests)"""
+    remote = False  # True when subscribers may live in other processes
+
+    def start(self, broker):
+        self.broker = broker
+
+    def send(self, message):
+        self.broker.dispatch(message)
+
+
+class PostgresTransport:
+    """Delivers published events to every process through PostgreSQL LISTEN/NOTIFY.
+
+    A publishing process NOTIFYs on its Django connection; each process with subscribers
+    keeps one extra connection LISTENing in a background thread and dispatches what arrives
+    (its own events included). NOTIFY payloads are capped at 8000 bytes, so a larger event
+    is sent as {"id": ..., "truncated": true} and the client refetches that row.
+    """
+    remote = True
+    pg_channel = 'hms_events'
+    max_payload = 7900
+
+    def start(self, broker):
+        self.broker = broker
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def send(self, message):
+        from django.db import connection
+        payload = json.dumps(message, cls=DjangoJSONEncoder, separators=(',', ':'))
+        if len(payload.encode()) > self.max_payload:
+            logger.warning("Event %s on %s too large for NOTIFY, sending it truncated", message['id'], message['channel'])
+            data = message['data']
+            message = {**message, 'data': {'id': data.get('id') if isinstance(data, dict) else None, 'truncated': True}}
+            payload = json.dumps(message, cls=DjangoJSONEncoder, separators=(',', ':'))
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.pg_channel, payload])
+
+    def listen(self):
+        """Start the LISTEN thread (once), when this process gets its first subscriber"""
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen_forever, name='events-listen', daemon=True)
+                self._listener.start()
+
+    def _listen_forever(self):
+        import select
+        import time
+
+        import psycopg2
+        from django.db import connections
+
+        while True:
+            try:
+                conn = psycopg2.connect(**connections['default'].get_connection_params())
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.pg_channel}')
+                while True:
+                    if select.select([conn], [], [], _heartbeat()) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.broker.dispatch(json.loads(conn.notifies.pop(0).payload))
+            except Exception:
+                logger.exception("Event listener lost its connection, reconnecting")
+                time.sleep(1)
+
+
+class Broker:
+    """Subscriptions and recent history per channel; events arrive through the transport"""
+
+    def __init__(self, transport=None):
+        self._lock = threading.Lock()
+        self._subscriptions = {}  # channel -> set of Subscription
+        self._history = {}  # channel -> deque of (id, event, data), for resuming streams
+        self._ids = itertools.count(1)
+        self._process = secrets.token_hex(4)  # keeps ids unique across processes
+        self._transport = transport
+
+    @property
+    def transport(self):
+        if self._transport is None:
+            self._transport = import_string(getattr(settings, 'EVENT_TRANSPORT', 'commonapp.events.LocalTransport'))()
+            self._transport.start(self)
+        return self._transport
+
+    def subscribe(self, channel, last_event_id=None):
+        """(subscription, replay): replay is the history after last_event_id, or None when
+        that id is no longer (or was never) in the history and the client needs a full reload"""
+        if hasattr(self.transport, 'listen'):
+            self.transport.listen()
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+            history = list(self._history.get(channel, ()))
+        replay = None
+        if last_event_id:
+            ids = [item[0] for item in history]
+            if last_event_id in ids:
+                replay = history[ids.index(last_event_id) + 1:]
+        return subscription, replay
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.get(subscription.channel, set()).discard(subscription)
+
+    def publish(self, channel, event, data):
+        """Send (event, data) to the subscribers of `channel` in every process; returns the event id"""
+        event_id = f"{self._process}-{next(self._ids)}"
+        self.transport.send({'id': event_id, 'channel': channel, 'event': event, 'data': data})
+        return event_id
+
+    def dispatch(self, message):
+        """Record an event from the transport and hand it to this process's subscribers"""
+        item = (message['id'], message['event'], message['data'])
+        with self._lock:
+            history = self._history.setdefault(message['channel'], deque(maxlen=_history_size()))
+            history.append(item)
+            subscriptions = list(self._subscriptions.get(message['channel'], ()))
+        for subscription in subscriptions:
+            subscription.deliver(item)
+
+    def forget(self, channel):
+        """Drop the history of `channel`: a change went unpublished, so resuming would miss it"""
+        with self._lock:
+            self._history.pop(channel, None)
+
+    def wants(self, channel):
+        """Whether anyone may be streaming `channel` (always, with a cross-process transport)"""
+        if self.transport.remote:
+            return True
+        with self._lock:
+            return bool(self._subscriptions.get(channel))
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscriptions.get(channel, ()))
+
+
+broker = Broker()
+
+
+def publish(channel, event, data):
+    return broker.publish(channel, event, data)
+
+
+def publish_on_commit(channel, event, build):
+    """Publish (event, build()) once the current transaction commits, if anyone is listening.
+
+    build() runs after the commit, so it can read the saved rows. Skipping the publish drops
+    the channel history, so a stream resuming across the skipped change reloads instead.
+    """
+    if broker.wants(channel):
+        def send():
+            data = build()
+            if data is not None:
+                publish(channel, event, data)
+        transaction.on_commit(send)
+    else:
+        broker.forget(channel)
+
+
+def format_event(event, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def _render(item, match):
+    event_id, event, data = item
+    return format_event(event, data, event_id) if match is None or match(event, data) else None
+
+
+def _sync_stream(subscription, preamble, match):
+    try:
+        yield from preamble
+        while True:
+            item = subscription.get(_heartbeat())
+            if item is _OVERFLOW:
+                return
+            if item is None:
+                yield ': keep-alive\n\n'
+            elif (text := _render(item, match)) is not None:
+                yield text
+    finally:
+        subscription.close()
+
+
+async def _async_stream(subscription, preamble, match):
+    try:
+        for text in preamble:
+            yield text
+        while True:
+            item = await subscription.aget(_heartbeat())
+            if item is _OVERFLOW:
+                return
+            if item is None:
+                yield ': keep-alive\n\n'
+            elif (text := _render(item, match)) is not None:
+                yield text
+    finally:
+        subscription.close()
+
+
+def release_connections():
+    """Hand this thread's database connections back (to the pool, see commonapp/dbpool.py).
+
+    Django closes them on request_finished, which for a streaming response fires only when
+    the stream ends. An event stream can stay open for hours, and it doesn't need a
+    connection once its preamble is read. Connections inside an atomic block are kept.
+    """
+    for connection in connections.all(initialized_only=True):
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+def last_event_id(request):
+    """Where a reconnecting client left off: the Last-Event-ID header EventSource sends, or ?last_event_id="""
+    return request.META.get('HTTP_LAST_EVENT_ID') or request.GET.get('last_event_id') or None
+
+
+def stream_response(request, channel, initial=(), match=None):
+    """text/event-stream of `channel`, starting with the (event, data) pairs of `initial`.
+
+    `initial` may be a callable; it is called after subscribing, so nothing published while
+    it reads the database is lost (a delta may repeat what the snapshot already shows).
+    A client resuming from an event id still in the channel history gets the events it
+    missed instead, and `initial` isn't read at all. `match(event, data)` can drop events
+    this client doesn't want. The request's database connections are released once the
+    preamble is built, so open streams don't hold pooled connections.
+    """
+    subscription, replay = broker.subscribe(channel, last_event_id(request))
+    try:
+        if replay is not None:
+            preamble = [text for item in replay if (text := _render(item, match)) is not None]
+        else:
+            # here, not in the async stream: `initial` may run ORM queries
+            preamble = [format_event(event, data) for event, data in (initial() if callable(initial) else initial)]
+    except BaseException:
+        subscription.close()
+        raise
+    finally:
+        release_connections()
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        content = _async_stream(subscription, preamble, match)
+    else:
+        content = _sync_stream(subscription, preamble, match)
+    response = StreamingHttpResponse(content, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # don't let nginx buffer the stream
+    return response
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets DRF content negotiation accept `Accept: text/event-stream` on a streaming action"""
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return format_event('error', data)  # only reached for error responses
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with the work factor taken from settings.PASSWORD_PBKDF2_ITERATIONS.
+
+    Same algorithm name as Django's hasher, so existing hashes keep verifying; a hash made
+    with a different iteration count is re-encoded on the user's next successful login
+    (AbstractBaseUser.check_password rehashes whenever must_update() says so).
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', PBKDF2PasswordHasher.iterations)
@@ -0,0 +1,182 @@
+"""Bulk import of doctor and patient accounts from CSV or JSONL.
+
+Rows are streamed from the file and handled a chunk at a time: validated together (one
+query for clashing usernames), passwords hashed in a process pool, then CustomUser, Profile
+and Doctor/Patient rows written with bulk_create in one transaction per chunk. Memory use
+depends on the chunk size, not on the file size. Used by `manage.py import_accounts` and
+the /api/import/ endpoint.
+
+Columns: username, email, password, first_name, last_name, user_type (doctor|patient),
+address, mobile, and for patients symptoms, blood_group, date_of_birth (YYYY-MM-DD),
+for doctors department.
+"""
+import codecs
+import csv
+import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.db import DataError, IntegrityError, transaction
+from django.utils.dateparse import parse_date
+
+from doctorapp import directory
+from doctorapp.models import Doctor, DoctorStats, departments
+from patientapp.models import Patient
+from .models import CustomUser, Profile
+from . import search
+
+REQUIRED = ('username', 'email', 'password', 'first_name', 'last_name', 'user_type')
+TEXT_FIELDS = REQUIRED + ('address', 'mobile', 'symptoms', 'blood_group', 'date_of_birth', 'department')
+ERROR_REPORT_HEADER = ['row', 'username', 'error']
+
+
+def read_rows(stream, fmt):
+    """Yield (row_number, dict) from a binary or text stream, one line at a time"""
+    if isinstance(stream.read(0), bytes):
+        stream = codecs.getreader('utf-8-sig')(stream)
+    if fmt == 'jsonl':
+        for number, line in enumerate(stream, start=1):
+            if line.strip():
+                try:
+                    yield number, json.loads(line)
+                except ValueError as e:
+                    yield number, {'_error': f"invalid JSON: {e}"}
+    else:
+        for number, row in enumerate(csv.DictReader(stream), start=1):
+            yield number, row
+
+
+def chunks(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def _clean(row):
+    """Normalised row, or raise ValueError with the reason it can't be imported"""
+    if not isinstance(row, dict):
+        raise ValueError("row is not an object")
+    if '_error' in row:
+        raise ValueError(row['_error'])
+    row = {key: (value.strip() if isinstance(value, str) else value) for key, value in row.items() if key}
+    # JSONL values can be numbers, lists, ... (CSV ones are always strings)
+    wrong_type = [field for field in TEXT_FIELDS if row.get(field) is not None and not isinstance(row[field], str)]
+    if wrong_type:
+        raise ValueError(f"{', '.join(wrong_type)} must be text")
+    missing = [field for field in REQUIRED if not row.get(field)]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    row['user_type'] = row['user_type'].lower()
+    if row['user_type'] not in dict(CustomUser.USER_TYPE_CHOICES):
+        raise ValueError(f"invalid user_type {row['user_type']!r}")
+    if row['user_type'] == 'doctor' and row.get('department') and row['department'] not in dict(departments):
+        raise ValueError(f"invalid department {row['department']!r}")
+    if row.get('date_of_birth'):
+        row['date_of_birth'] = parse_date(row['date_of_birth'])
+        if row['date_of_birth'] is None:
+            raise ValueError("date_of_birth must be YYYY-MM-DD")
+    return row
+
+
+def _hash_passwords(passwords, pool):
+    if pool is None:
+        return [make_password(password) for password in passwords]
+    return list(pool.map(make_password, passwords, chunksize=16))
+
+
+def _write_chunk(rows, hashes):
+    with transaction.atomic():
+        users = CustomUser.objects.bulk_create([
+            CustomUser(
+                username=row['username'], email=row['email'], password=hashed,
+                first_name=row['first_name'], last_name=row['last_name'],
+                user_type=row['user_type'], is_active=True,
+            )
+            for row, hashed in zip(rows, hashes)
+        ])
+        Profile.objects.bulk_create([Profile(user=user) for user in users])
+        doctors = Doctor.objects.bulk_create([
+            Doctor(
+                user=user, address=row.get('address') or '', mobile=row.get('mobile') or None,
+                department=row.get('department') or 'Cardiologist',
+                status=True,  # what the activate_doctor signal would have set
+            )
+            for row, user in zip(rows, users) if row['user_type'] == 'doctor'
+        ])
+        DoctorStats.objects.bulk_create([DoctorStats(doctor=doctor) for doctor in doctors])
+        patients = Patient.objects.bulk_create([
+            Patient(
+                user=user, address=row.get('address') or '', mobile=row.get('mobile') or '',
+                symptoms=row.get('symptoms') or '', blood_group=row.get('blood_group') or None,
+                date_of_birth=row.get('date_of_birth'),
+            )
+            for row, user in zip(rows, users) if row['user_type'] == 'patient'
+        ])
+        # bulk_create skips the signals that keep the search index current
+        search.reindex(Doctor, [doctor.pk for doctor in doctors])
+        search.reindex(Patient, [patient.pk for patient in patients])
+        if doctors:
+            # nor does the doctor directory cache see the new roster without a post_save
+            transaction.on_commit(directory.invalidate)
+
+
+def _write_rows(numbered, hashes):
+    """Write the chunk; if the database rejects it, retry row by row.
+
+    Returns the (row_number, username, reason) of the rows the database refused (e.g. a
+    username created since the clash check, or a value too long for its column).
+    """
+    try:
+        _write_chunk([row for _, row in numbered], hashes)
+        return []
+    except (IntegrityError, DataError):
+        pass
+    errors = []
+    for (number, row), hashed in zip(numbered, hashes):
+        try:
+            _write_chunk([row], [hashed])
+        except (IntegrityError, DataError) as e:
+            errors.append((number, row['username'], f"could not be saved: {e}"))
+    return errors
+
+
+def import_accounts(rows, chunk_size=500, workers=None, start_after=0, on_chunk=None):
+    """Import (row_number, row) pairs and return (imported, failed) counts.
+
+    Rows numbered <= start_after are skipped (resume). After each chunk commits,
+    on_chunk(last_row_number, errors) gets that chunk's (row_number, username, reason)
+    errors, e.g. to save a checkpoint and append to an error report.
+    """
+    imported = failed = 0
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=django.setup) if workers != 0 else None
+    try:
+        for chunk in chunks(((n, row) for n, row in rows if n > start_after), chunk_size):
+            valid, seen, errors = [], set(), []
+            for number, row in chunk:
+                try:
+                    row = _clean(row)
+                    if row['username'] in seen:
+                        raise ValueError("duplicate username in file")
+                    seen.add(row['username'])
+                    valid.append((number, row))
+                except ValueError as e:
+                    errors.append((number, row.get('username', '') if isinstance(row, dict) else '', str(e)))
+
+            taken = set(CustomUser.objects.filter(username__in=seen).values_list('username', flat=True))
+            errors.extend((number, row['username'], "username already exists") for number, row in valid if row['username'] in taken)
+            rows_ok = [(number, row) for number, row in valid if row['username'] not in taken]
+
+            if rows_ok:
+                rejected = _write_rows(rows_ok, _hash_passwords([row['password'] for _, row in rows_ok], pool))
+                errors.extend(rejected)
+                imported += len(rows_ok) - len(rejected)
+            failed += len(errors)
+            if on_chunk:
+                on_chunk(chunk[-1][0], sorted(errors))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return imported, failed
+
@@ -0,0 +1,228 @@
+"""Index advisor: EXPLAIN the queries the API actually runs and propose missing indexes.
+
+capture() seeds throwaway rows (querybudget._seed, rolled back afterwards), calls every
+GET list/action route registered by the viewsets as both a doctor and a patient, and keeps
+the SELECTs they run. explain() asks the database for each query's plan (on PostgreSQL
+with enable_seqscan off, so a sequential scan means no index could serve the query,
+not that the seeded table was small) and flags full table scans. propose() turns the
+filter/order columns of a flagged scan into a models.Index: equality columns first, then
+one range/order column, and boolean filters (is_active, is_occupied, ...) become the
+condition of a partial index. Used by `manage.py advise_indexes`.
+"""
+import re
+from dataclasses import dataclass, field
+
+from django.apps import apps
+from django.db import connection, models, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver
+from rest_framework.test import APIClient
+
+from .querybudget import _Rollback, _seed, _uncached
+
+# routes needing query parameters to reach their interesting queries
+EXTRA_URLS = [
+    ('/api/hospital/beds/?ward=ICU&available=true', 'doctor'),
+    ('/api/hospital/beds/available_beds/?ward=Emergency', 'doctor'),
+    ('/api/doctor/appointments/available_slots/?department=Cardiologist', 'patient'),
+    ('/api/doctor/appointments/doctor_appointments/?upcoming=true', 'doctor'),
+    ('/api/doctor/profile/my_patients/?search=budget', 'doctor'),
+    ('/api/patient/profile/search_doctors/?search=budget', 'patient'),
+]
+
+# routes that aren't reads even though they answer GET
+SKIP_ACTIONS = {
+    'export_invoices',  # renders PDFs, nothing the database can help with
+    'stream',  # server-sent events, never ends
+}
+
+_REF = r'(?:"(?P<table>\w+)"|(?P<alias>[UT]\d+))\."(?P<column>\w+)"'
+_ALIAS = re.compile(r'"(\w+)"\s+(?:AS\s+)?"?([UT]\d+)\b')
+_WHERE = re.compile(r'\bWHERE\b(.*?)(?:\bGROUP BY\b|\bORDER BY\b|\bLIMIT\b|\)\s*(?:AS|$)|$)', re.S)
+_ORDER = re.compile(r'\bORDER BY\b(.*?)(?:\bLIMIT\b|$)', re.S)
+
+
+@dataclass
+class Scan:
+    url: str
+    table: str
+    detail: str
+    sql: str
+
+
+@dataclass
+class Proposal:
+    model: type
+    fields: list
+    condition: dict = field(default_factory=dict)
+    seen_in: set = field(default_factory=set)
+
+    @property
+    def name(self):
+        base = '_'.join([self.model._meta.model_name[:8], *[f[:8] for f in self.fields]])
+        return f"{base[:25]}_{'p' if self.condition else ''}idx"
+
+    def index(self):
+        condition = models.Q(**self.condition) if self.condition else None
+        return models.Index(fields=list(self.fields), condition=condition, name=self.name)
+
+    def as_code(self):
+        condition = f", condition=models.Q({', '.join(f'{k}={v!r}' for k, v in self.condition.items())})" if self.condition else ''
+        return f"models.Index(fields={list(self.fields)!r}{condition}, name={self.name!r})"
+
+
+def routes():
+    """(url, role) for every GET route of a viewset that takes no pk, as each role"""
+    def walk(resolver, prefix=''):
+        for pattern in resolver.url_patterns:
+            if hasattr(pattern, 'url_patterns'):
+                yield from walk(pattern, prefix + str(pattern.pattern))
+            else:
+                yield prefix + str(pattern.pattern), pattern
+
+    found = []
+    for path, pattern in walk(get_resolver()):
+        actions = getattr(pattern.callback, 'actions', None) or {}
+        if 'get' not in actions or actions['get'] in SKIP_ACTIONS or pattern.pattern.regex.groups or 'format' in path:
+            continue
+        url = '/' + path.replace('^', '').replace('$', '')
+        found.extend((url, role) for role in ('doctor', 'patient'))
+    return found + [(url, role) for url, role in EXTRA_URLS]
+
+
+def capture(urls, rows=20):
+    """{url: [sql, ...]} of the SELECTs each url runs against `rows` seeded rows of everything"""
+    captured = {}
+    try:
+        with _uncached(), transaction.atomic():
+            users = _seed(rows)
+            for url, role in urls:
+                client = APIClient()
+                client.force_authenticate(users[role])
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url)
+                    if hasattr(response, 'streaming_content'):
+                        b''.join(response.streaming_content)
+                captured.setdefault(url, []).extend(
+                    query['sql'] for query in queries if query['sql'].lstrip().upper().startswith('SELECT')
+                )
+            raise _Rollback
+    except _Rollback:
+        pass
+    return captured
+
+
+def _plan_scans(sql):
+    """[(table, plan line)] of the full table scans in the plan of one query"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('EXPLAIN ' + sql)
+            lines = [row[0] for row in cursor.fetchall()]
+            return [(m.group(1), line.strip()) for line in lines if (m := re.search(r'Seq Scan on (\w+)', line))]
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            details = [row[3] for row in cursor.fetchall()]
+            # "SCAN t" is a full table scan; "SCAN t USING INDEX" walks an index for the order
+            return [
+                (m.group(1), d) for d in details
+                if (m := re.match(r'SCAN (\w+)(?: AS \w+)?$', d)) and not m.group(1).startswith('sqlite_')
+            ]
+    return []
+
+
+def explain(captured):
+    """Scan records for every captured query whose plan reads a whole table"""
+    scans, seen = [], set()
+    try:
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            for url, queries in captured.items():
+                for sql in queries:
+                    for table, detail in _plan_scans(sql):
+                        if (sql, table) not in seen:
+                            seen.add((sql, table))
+                            scans.append(Scan(url, table, detail, sql))
+            raise _Rollback
+    except _Rollback:
+        pass
+    return scans
+
+
+def _model_for(table):
+    for model in apps.get_models():
+        if model._meta.db_table == table:
+            return model
+    return None
+
+
+def _columns(sql, table):
+    """(equality columns, range/order columns, boolean conditions) the query puts on `table`"""
+    aliases = {alias for name, alias in _ALIAS.findall(sql) if name == table}
+    where = _WHERE.search(sql)
+    where = where.group(1) if where else ''
+    equal, ranged, condition = [], [], {}
+    for match in re.finditer(_REF, where):
+        if (match.group('table') or match.group('alias')) not in ({table} | aliases):
+            continue
+        column = match.group('column')
+        before, after = where[:match.start()].rstrip(), where[match.end():].lstrip()
+        if re.match(r'(=|IN\b|IS\b)', after, re.I):
+            equal.append(column)
+        elif re.match(r'(<|>|LIKE\b|BETWEEN\b)', after, re.I):
+            ranged.append(column)
+        elif not re.match(r'[=<>!]', after):
+            condition[column] = not before.upper().endswith('NOT')  # bare boolean column
+    order = _ORDER.search(sql)
+    if order:
+        for match in re.finditer(_REF, order.group(1)):
+            if (match.group('table') or match.group('alias')) in ({table} | aliases):
+                ranged.append(match.group('column'))
+    return list(dict.fromkeys(equal)), list(dict.fromkeys(ranged)), condition
+
+
+def _field_name(model, column):
+    for model_field in model._meta.concrete_fields:
+        if model_field.column == column:
+            return model_field.name
+    return column
+
+
+def propose(scans):
+    """Deduplicated index proposals for the flagged scans, keyed by (model, fields, condition)"""
+    proposals = {}
+    for scan in scans:
+        model = _model_for(scan.table)
+        if model is None:
+            continue  # not a Django model (e.g. a search FTS table)
+        equal, ranged, condition = _columns(scan.sql, scan.table)
+        fields = [_field_name(model, c) for c in equal if c not in condition]
+        fields += [_field_name(model, c) for c in ranged if c not in condition and c not in equal][:1]
+        conditions = {_field_name(model, c): value for c, value in condition.items()}
+        if not fields and conditions:
+            fields = [model._meta.pk.name]  # a partial index on the boolean alone
+        if not fields or fields == [model._meta.pk.name] and not conditions:
+            continue  # unfiltered list, nothing an index would narrow
+        key = (model, tuple(fields), tuple(sorted(conditions.items())))
+        proposal = proposals.setdefault(key, Proposal(model, fields, conditions))
+        proposal.seen_in.add(scan.url)
+    return list(proposals.values())
+
+
+def migrations_for(proposals):
+    """{app_label: Migration} adding the proposed indexes on top of each app's latest migration"""
+    from django.db import migrations
+    from django.db.migrations.loader import MigrationLoader
+
+    leaves = dict(MigrationLoader(connection, ignore_no_migrations=True).graph.leaf_nodes())
+    result = {}
+    for proposal in proposals:
+        label = proposal.model._meta.app_label
+        migration = result.get(label)
+        if migration is None:
+            migration = result[label] = migrations.Migration('advised_indexes', label)
+            migration.dependencies = [(label, leaves[label])] if label in leaves else []
+            migration.operations = []
+        migration.operations.append(migrations.AddIndex(model_name=proposal.model._meta.model_name, index=proposal.index()))
+    return result
@@ -0,0 +1,56 @@
+from pathlib import Path
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db.migrations.writer import MigrationWriter
+
+from commonapp import indexadvisor
+
+
+class Command(BaseCommand):
+    help = (
+        "Run every viewset GET route against seeded throwaway rows (rolled back), EXPLAIN the "
+        "queries they issue, report full table scans and propose indexes (as Meta.indexes "
+        "entries and a migration)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20, help="Rows of each kind to seed")
+        parser.add_argument('--sql', action='store_true', help="Print the SQL of every flagged query")
+        parser.add_argument('--write', action='store_true', help="Write the proposed migrations into the apps' migrations folders")
+        parser.add_argument('--fail-on-scan', action='store_true', help="Exit with an error when any index is proposed (for CI)")
+
+    def handle(self, *args, **options):
+        captured = indexadvisor.capture(indexadvisor.routes(), rows=options['rows'])
+        total = sum(len(queries) for queries in captured.values())
+        scans = indexadvisor.explain(captured)
+        self.stdout.write(f"{len(captured)} routes, {total} SELECTs, {len(scans)} full table scans")
+
+        for scan in scans:
+            self.stdout.write(f"  {scan.url:<60} {scan.table:<32} {scan.detail}")
+            if options['sql']:
+                self.stdout.write(f"      {scan.sql}")
+
+        proposals = indexadvisor.propose(scans)
+        if not proposals:
+            self.stdout.write(self.style.SUCCESS("No index to propose"))
+            return
+
+        self.stdout.write("\nProposed indexes (add to the model's Meta.indexes):")
+        for proposal in proposals:
+            self.stdout.write(f"  {proposal.model._meta.label}: {proposal.as_code()}")
+            self.stdout.write(f"      used by {', '.join(sorted(proposal.seen_in))}")
+
+        for label, migration in indexadvisor.migrations_for(proposals).items():
+            writer = MigrationWriter(migration)
+            if options['write']:
+                leaf = migration.dependencies[0][1] if migration.dependencies else '0000'
+                number = int(leaf.split('_')[0]) + 1
+                path = Path(apps.get_app_config(label).path) / 'migrations' / f"{number:04d}_advised_indexes.py"
+                path.write_text(writer.as_string())
+                self.stdout.write(f"\nwrote {path}")
+            else:
+                self.stdout.write(f"\n# {label}/migrations/XXXX_advised_indexes.py\n{writer.as_string()}")
+
+        if options['fail_on_scan']:
+            raise CommandError(f"{len(proposals)} index(es) proposed")
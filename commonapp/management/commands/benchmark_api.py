@@ -0,0 +1,113 @@
+import json
+import statistics
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from commonapp.models import CustomUser
+from commonapp.views import get_tokens_for_user
+
+# (name, role, url) driven through the real URLconf
+ROUTES = [
+    ('doctor.my_patients', 'doctor', '/api/doctor/profile/my_patients/'),
+    ('doctor.my_patients.search', 'doctor', '/api/doctor/profile/my_patients/?search=fever'),
+    ('doctor.dashboard_stats', 'doctor', '/api/doctor/profile/dashboard_stats/'),
+    ('doctor.discharged_patients', 'doctor', '/api/doctor/profile/discharged_patients/'),
+    ('doctor.appointments', 'doctor', '/api/doctor/appointments/'),
+    ('doctor.prescriptions', 'doctor', '/api/doctor/prescriptions/'),
+    ('patient.dashboard_overview', 'patient', '/api/patient/profile/dashboard_overview/'),
+    ('patient.my_profile', 'patient', '/api/patient/profile/my_profile/'),
+    ('patient.search_doctors', 'patient', '/api/patient/profile/search_doctors/?department=Cardiologist'),
+    ('patient.search_doctors.name', 'patient', '/api/patient/profile/search_doctors/?search=Doctr1'),
+    ('patient.invoices', 'patient', '/api/patient/invoices/'),
+    ('patient.available_slots', 'patient', '/api/doctor/appointments/available_slots/?department=Cardiologist'),
+    ('hospital.beds', 'doctor', '/api/hospital/beds/'),
+    ('hospital.ward_summary', 'doctor', '/api/hospital/beds/ward_summary/'),
+    ('hospital.active_cases', 'doctor', '/api/hospital/emergency-cases/active_cases/'),
+]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark API routes through the Django test client against the current database "
+        "(seed it with `manage.py seed_hospital` first): p50/p95/p99 latency and query counts, "
+        "optionally compared with a stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=30, help="Timed requests per route")
+        parser.add_argument('--warmup', type=int, default=3, help="Untimed requests per route first")
+        parser.add_argument('--doctor', default='seed_doctor_0', help="Username of the doctor to log in as")
+        parser.add_argument('--patient', default='seed_patient_0', help="Username of the patient to log in as")
+        parser.add_argument('--only', nargs='*', help="Route names to run (default: all)")
+        parser.add_argument('--baseline', help="JSON file with results of an earlier run to compare against")
+        parser.add_argument('--save-baseline', help="Write this run's results to a JSON file")
+        parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed p95 slowdown vs baseline (0.25 = 25%%)")
+
+    def client_for(self, username):
+        user = CustomUser.objects.filter(username=username).first()
+        if user is None:
+            raise CommandError(f"User {username!r} not found, run `manage.py seed_hospital` first")
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(user)['access']}")
+        return client
+
+    def run_route(self, client, url, requests, warmup):
+        for _ in range(warmup):
+            client.get(url)
+        timings, queries = [], []
+        for _ in range(requests):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = client.get(url)
+                if hasattr(response, 'streaming_content'):
+                    b"".join(response.streaming_content)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(len(captured))
+        if response.status_code >= 400:
+            raise CommandError(f"{url} answered {response.status_code}")
+        return {
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'p99_ms': round(percentile(timings, 99), 2),
+            'queries': round(statistics.mean(queries), 1),
+            'bytes': len(response.content) if not hasattr(response, 'streaming_content') else None,
+        }
+
+    def handle(self, *args, **options):
+        clients = {'doctor': self.client_for(options['doctor']), 'patient': self.client_for(options['patient'])}
+        routes = [route for route in ROUTES if not options['only'] or route[0] in options['only']]
+        baseline = json.loads(Path(options['baseline']).read_text()) if options['baseline'] else {}
+
+        self.stdout.write(f"{'route':<30} {'p50':>9} {'p95':>9} {'p99':>9} {'queries':>8}  vs baseline")
+        results, regressions = {}, []
+        for name, role, url in routes:
+            result = results[name] = self.run_route(clients[role], url, options['requests'], options['warmup'])
+            comparison = ''
+            previous = baseline.get(name)
+            if previous:
+                change = result['p95_ms'] / previous['p95_ms'] - 1 if previous['p95_ms'] else 0
+                comparison = f"p95 {change:+.0%}, queries {previous['queries']} -> {result['queries']}"
+                if change > options['tolerance'] or result['queries'] > previous['queries']:
+                    regressions.append(name)
+                    comparison += "  REGRESSION"
+            self.stdout.write(
+                f"{name:<30} {result['p50_ms']:>7.1f}ms {result['p95_ms']:>7.1f}ms {result['p99_ms']:>7.1f}ms "
+                f"{result['queries']:>8}  {comparison}"
+            )
+
+        if options['save_baseline']:
+            Path(options['save_baseline']).write_text(json.dumps(results, indent=2))
+            self.stdout.write(f"saved baseline to {options['save_baseline']}")
+        if regressions:
+            raise CommandError(f"Regressed against baseline: {', '.join(regressions)}")
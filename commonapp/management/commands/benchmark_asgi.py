@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+
+from commonapp.models import CustomUser
+from commonapp.views import get_tokens_for_user
+
+from .benchmark_api import percentile
+
+# (name, role, sync viewset action served over WSGI, async view served over ASGI)
+ROUTES = [
+    ('patient.my_profile', 'patient', '/api/patient/profile/my_profile/', '/api/patient/async/profile/my_profile/'),
+    ('patient.dashboard_overview', 'patient', '/api/patient/profile/dashboard_overview/', '/api/patient/async/profile/dashboard_overview/'),
+    ('doctor.dashboard_stats', 'doctor', '/api/doctor/profile/dashboard_stats/?breakdown=week', '/api/doctor/async/profile/dashboard_stats/?breakdown=week'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the dashboard actions as sync viewsets behind WSGI (one thread per concurrent "
+        "request) with their async views behind ASGI (one event loop) at the same concurrency: "
+        "latency percentiles, throughput, peak Python memory and threads. Runs against the "
+        "current database (seed it with `manage.py seed_hospital` first)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=20, help="Requests in flight at once, in both modes")
+        parser.add_argument('--requests', type=int, default=200, help="Timed requests per route and mode")
+        parser.add_argument('--doctor', default='seed_doctor_0', help="Username of the doctor to log in as")
+        parser.add_argument('--patient', default='seed_patient_0', help="Username of the patient to log in as")
+        parser.add_argument('--cold', action='store_true', help="Don't cache dashboard snapshots, so every request queries")
+        parser.add_argument('--only', nargs='*', help="Route names to run (default: all)")
+
+    def headers_for(self, username):
+        user = CustomUser.objects.filter(username=username).first()
+        if user is None:
+            raise CommandError(f"User {username!r} not found, run `manage.py seed_hospital` first")
+        return {'Authorization': f"Bearer {get_tokens_for_user(user)['access']}"}
+
+    def run_wsgi(self, url, headers, requests, concurrency):
+        """Latencies (ms) of `requests` GETs from `concurrency` threads, like a threaded WSGI server"""
+        def worker(count):
+            client, timings = Client(headers=headers), []
+            try:
+                for _ in range(count):
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    timings.append((time.perf_counter() - start) * 1000)
+                    if response.status_code >= 400:
+                        raise CommandError(f"{url} answered {response.status_code}")
+            finally:
+                connection.close()
+            return timings
+
+        shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+        with ThreadPoolExecutor(concurrency) as pool:
+            return [t for timings in pool.map(worker, shares) for t in timings]
+
+    def run_asgi(self, url, headers, requests, concurrency):
+        """Latencies (ms) of `requests` GETs from `concurrency` tasks on one event loop"""
+        async def worker(client, count, timings):
+            for _ in range(count):
+                start = time.perf_counter()
+                response = await client.get(url, headers=headers)  # AsyncClient(headers=) doesn't reach the ASGI scope
+                timings.append((time.perf_counter() - start) * 1000)
+                if response.status_code >= 400:
+                    raise CommandError(f"{url} answered {response.status_code}")
+
+        async def main():
+            client, timings = AsyncClient(), []
+            shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+            await asyncio.gather(*(worker(client, share, timings) for share in shares))
+            return timings
+
+        return asyncio.run(main())
+
+    def measure(self, run, *args):
+        """(latencies, seconds, peak traced MB, peak threads) of one run"""
+        peak_threads, done = [threading.active_count()], threading.Event()
+
+        def sample():
+            while not done.wait(0.01):
+                peak_threads[0] = max(peak_threads[0], threading.active_count())
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            timings = run(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            done.set()
+            sampler.join()
+        return timings, elapsed, peak / 1024 / 1024, peak_threads[0] - 1  # minus the sampler
+
+    def handle(self, *args, **options):
+        headers = {'doctor': self.headers_for(options['doctor']), 'patient': self.headers_for(options['patient'])}
+        routes = [route for route in ROUTES if not options['only'] or route[0] in options['only']]
+        concurrency, requests = options['concurrency'], options['requests']
+        overrides = {'PATIENT_DASHBOARD_CACHE_TIMEOUT': 0} if options['cold'] else {}
+
+        self.stdout.write(
+            f"{concurrency} concurrent, {requests} requests per route and mode"
+            + (", snapshots uncached" if options['cold'] else "")
+        )
+        self.stdout.write(f"{'route':<28} {'mode':<5} {'p50':>9} {'p95':>9} {'p99':>9} {'req/s':>8} {'peak MB':>8} {'threads':>8}")
+        with override_settings(**overrides):
+            for name, role, sync_url, async_url in routes:
+                for mode, run, url in (('wsgi', self.run_wsgi, sync_url), ('asgi', self.run_asgi, async_url)):
+                    run(url, headers[role], concurrency, concurrency)  # warm up
+                    timings, elapsed, peak_mb, threads = self.measure(run, url, headers[role], requests, concurrency)
+                    self.stdout.write(
+                        f"{name:<28} {mode:<5} {percentile(timings, 50):>7.1f}ms {percentile(timings, 95):>7.1f}ms "
+                        f"{percentile(timings, 99):>7.1f}ms {len(timings) / elapsed:>8.0f} {peak_mb:>8.1f} {threads:>8}"
+                    )
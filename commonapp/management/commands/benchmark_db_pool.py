@@ -0,0 +1,88 @@
+import copy
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import load_backend
+
+from commonapp import dbpool
+
+from .benchmark_api import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare a connection per request with the connection pool (commonapp/dbpool.py): threads "
+        "each run request-like cycles of connect, a few queries and close. Reports latency "
+        "percentiles, throughput, connections opened, and the pool's wait/checkout/hold times. "
+        "Works against PostgreSQL (ENGINE commonapp.backends.postgresql) or the SQLite stand-in "
+        "(commonapp.backends.sqlite3, file database)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help="Database alias whose settings to use")
+        parser.add_argument('--threads', type=int, default=20, help="Concurrent request threads")
+        parser.add_argument('--requests', type=int, default=50, help="Requests per thread")
+        parser.add_argument('--queries', type=int, default=3, help="Queries per request")
+        parser.add_argument('--max-size', type=int, default=5, help="Pool size (fewer than --threads shows waiting)")
+
+    def settings_for(self, alias, pooled, max_size):
+        settings_dict = copy.deepcopy(connections[alias].settings_dict)
+        if not issubclass(load_backend(settings_dict['ENGINE']).DatabaseWrapper, dbpool.PooledDatabaseWrapperMixin):
+            raise CommandError(
+                f"{settings_dict['ENGINE']} doesn't pool, use commonapp.backends.postgresql or commonapp.backends.sqlite3"
+            )
+        settings_dict['CONN_MAX_AGE'] = 0
+        settings_dict['POOL'] = {**(settings_dict.get('POOL') or {}), 'max_size': max_size} if pooled else None
+        return settings_dict
+
+    def run(self, settings_dict, alias, threads, requests, queries):
+        """Latencies (ms) of every request"""
+        backend = load_backend(settings_dict['ENGINE'])
+
+        def worker(_):
+            connection, timings = backend.DatabaseWrapper(settings_dict, alias), []
+            try:
+                for _ in range(requests):
+                    start = time.perf_counter()
+                    connection.ensure_connection()
+                    for _ in range(queries):
+                        with connection.cursor() as cursor:
+                            cursor.execute('SELECT 1')
+                            cursor.fetchone()
+                    connection.close()  # what the end of a request does with CONN_MAX_AGE=0
+                    timings.append((time.perf_counter() - start) * 1000)
+            finally:
+                connection.close()
+            return timings
+
+        with ThreadPoolExecutor(threads) as executor:
+            return [t for timings in executor.map(worker, range(threads)) for t in timings]
+
+    def handle(self, *args, **options):
+        threads, requests = options['threads'], options['requests']
+        self.stdout.write(
+            f"{threads} threads x {requests} requests of {options['queries']} queries, pool of {options['max_size']}"
+        )
+        self.stdout.write(f"{'mode':<8} {'p50':>9} {'p95':>9} {'p99':>9} {'req/s':>8} {'connects':>9}")
+        for mode in ('direct', 'pooled'):
+            alias = f"{options['database']}_benchmark_{mode}"  # its own pool, not the app's
+            settings_dict = self.settings_for(options['database'], mode == 'pooled', options['max_size'])
+            start = time.perf_counter()
+            timings = self.run(settings_dict, alias, threads, requests, options['queries'])
+            elapsed = time.perf_counter() - start
+            stats = dbpool.stats().get(alias)
+            self.stdout.write(
+                f"{mode:<8} {percentile(timings, 50):>7.2f}ms {percentile(timings, 95):>7.2f}ms "
+                f"{percentile(timings, 99):>7.2f}ms {len(timings) / elapsed:>8.0f} "
+                f"{stats['connects'] if stats else len(timings):>9}"
+            )
+            if stats:
+                self.stdout.write(
+                    f"         pool: {stats['checkouts']} checkouts, {stats['timeouts']} timeouts, "
+                    f"wait p95 {stats['wait_ms']['p95']}ms (max {stats['wait_ms']['max']}ms), "
+                    f"checkout p95 {stats['checkout_ms']['p95']}ms, held p95 {stats['held_ms']['p95']}ms, "
+                    f"{stats['queries']} queries in {stats['query_ms_total']}ms"
+                )
+                dbpool.close_pool(alias)
@@ -0,0 +1,97 @@
+import io
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from commonapp import compression, renderers
+from commonapp.models import CustomUser
+from commonapp.views import get_tokens_for_user
+
+# (name, role, url) of the list payloads worth encoding faster; ?page_size= is appended where paginated
+ROUTES = [
+    ('doctor.doctor_appointments', 'doctor', '/api/doctor/appointments/doctor_appointments/'),
+    ('doctor.discharged_patients', 'doctor', '/api/doctor/profile/discharged_patients/'),
+    ('doctor.my_patients', 'doctor', '/api/doctor/profile/my_patients/'),
+    ('doctor.prescriptions', 'doctor', '/api/doctor/prescriptions/'),
+    ('patient.invoices', 'patient', '/api/patient/invoices/'),
+    ('hospital.beds', 'doctor', '/api/hospital/beds/'),
+]
+
+
+def timed(func, repeat):
+    """(median ms, last result) of `repeat` calls"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare DRF's JSON renderer/parser with the orjson ones (commonapp/renderers.py) on the "
+        "payloads of large list routes: encode and decode time, bytes, and what gzip/brotli make "
+        "of them. Runs against the current database (seed it with `manage.py seed_hospital` first)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50, help="Timed encodes/decodes per payload")
+        parser.add_argument('--page-size', type=int, default=100, help="Rows per page of the paginated routes")
+        parser.add_argument('--doctor', default='seed_doctor_0', help="Username of the doctor to log in as")
+        parser.add_argument('--patient', default='seed_patient_0', help="Username of the patient to log in as")
+        parser.add_argument('--only', nargs='*', help="Route names to run (default: all)")
+
+    def client_for(self, username):
+        user = CustomUser.objects.filter(username=username).first()
+        if user is None:
+            raise CommandError(f"User {username!r} not found, run `manage.py seed_hospital` first")
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(user)['access']}")
+        return client
+
+    def payload(self, client, url, page_size):
+        response = client.get(url, {'page_size': page_size}, HTTP_ACCEPT='application/json')
+        if response.status_code >= 400:
+            raise CommandError(f"{url} answered {response.status_code}")
+        return response.data
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            raise CommandError("orjson isn't installed (pip install orjson)")
+        clients = {'doctor': self.client_for(options['doctor']), 'patient': self.client_for(options['patient'])}
+        routes = [route for route in ROUTES if not options['only'] or route[0] in options['only']]
+        repeat = options['repeat']
+        codings = compression.available_encodings()
+
+        self.stdout.write(
+            f"median of {repeat} runs, {options['page_size']} rows per page; encode/decode ms for json -> orjson"
+        )
+        self.stdout.write(
+            f"{'route':<28} {'bytes':>8} {'encode':>16} {'decode':>16} {'same':>5}"
+            + ''.join(f" {coding + ' bytes':>11} {coding + ' ms':>8}" for coding in codings)
+        )
+        for name, role, url in routes:
+            data = self.payload(clients[role], url, options['page_size'])
+            json_ms, json_body = timed(lambda: JSONRenderer().render(data), repeat)
+            orjson_ms, orjson_body = timed(lambda: renderers.ORJSONRenderer().render(data), repeat)
+            json_dec_ms, decoded = timed(lambda: JSONParser().parse(io.BytesIO(json_body)), repeat)
+            orjson_dec_ms, _ = timed(lambda: renderers.ORJSONParser().parse(io.BytesIO(orjson_body)), repeat)
+            # the same document, whatever the byte-level differences (e.g. float exponents)
+            same = json.loads(orjson_body) == decoded
+
+            compressed = ''
+            for coding in codings:
+                ms, body = timed(lambda: compression.compress(orjson_body, coding), repeat)
+                compressed += f" {len(body):>11} {ms:>8.2f}"
+            self.stdout.write(
+                f"{name:<28} {len(orjson_body):>8} {json_ms:>6.2f} -> {orjson_ms:>6.2f} "
+                f"{json_dec_ms:>6.2f} -> {orjson_dec_ms:>6.2f} {'yes' if same else 'NO':>5}{compressed}"
+            )
+            if not same:
+                self.stderr.write(f"{name}: orjson output differs from DRF's ({len(json_body)} vs {len(orjson_body)} bytes)")
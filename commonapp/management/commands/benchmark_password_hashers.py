@@ -0,0 +1,39 @@
+import os
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Measure password verification speed of each configured hasher on this host (login CPU cost)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=2.0, help="Time spent verifying with each hasher")
+
+    def handle(self, *args, **options):
+        cores = os.cpu_count() or 1
+        self.stdout.write(f"{cores} CPU core(s), preferred hasher: {settings.PASSWORD_HASHERS[0]}")
+        self.stdout.write(f"{'hasher':<32} {'ms/verify':>10} {'logins/s/core':>14} {'logins/s/host':>14}")
+
+        for hasher in get_hashers():
+            try:
+                encoded = hasher.encode('benchmark-Passw0rd', hasher.salt())
+            except (ValueError, ImportError) as e:  # e.g. argon2-cffi not installed
+                self.stdout.write(f"{hasher.algorithm:<32} skipped ({e})")
+                continue
+
+            verifications = 0
+            start = time.perf_counter()
+            while True:
+                hasher.verify('benchmark-Passw0rd', encoded)
+                verifications += 1
+                elapsed = time.perf_counter() - start
+                if elapsed >= options['seconds']:
+                    break
+
+            per_verify = elapsed / verifications
+            self.stdout.write(
+                f"{hasher.algorithm:<32} {per_verify * 1000:>10.1f} {1 / per_verify:>14.1f} {cores / per_verify:>14.1f}"
+            )
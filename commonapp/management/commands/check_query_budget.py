@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from commonapp.querybudget import ENDPOINTS, QueryBudgetExceeded, check_flat
+
+
+class Command(BaseCommand):
+    help = (
+        "Fail when a list endpoint's query count grows with the number of rows it returns (N+1). "
+        "Seeds throwaway rows inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--small', type=int, default=2, help="Rows seeded for the first measurement")
+        parser.add_argument('--large', type=int, default=8, help="Rows seeded for the second (keep it within one page)")
+
+    def handle(self, *args, **options):
+        try:
+            report = check_flat(options['small'], options['large'])
+            grown, errors = {}, {}
+        except QueryBudgetExceeded as e:
+            report, grown, errors = e.args
+
+        for url, _ in ENDPOINTS:
+            small, large = report[url]
+            flag = "GROWS" if url in grown else ("HTTP %s" % errors[url] if url in errors else "ok")
+            self.stdout.write(f"{url:<55} {small:>4} -> {large:>4}  {flag}")
+
+        if grown or errors:
+            raise CommandError(f"{len(grown)} endpoint(s) over budget, {len(errors)} failing")
+        self.stdout.write(self.style.SUCCESS("All endpoints run a constant number of queries"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from commonapp import storage
+
+
+class Command(BaseCommand):
+    help = "Move existing profile pictures into content-addressed blobs so identical files are stored once"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='profile_pics', help="Media directory to move (default profile_pics)")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be freed")
+
+    def handle(self, *args, **options):
+        files, freed = storage.dedupe(options['path'], dry_run=options['dry_run'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{files} files, {freed} bytes of duplicates"
+            + (" (dry run, nothing moved)" if options['dry_run'] else " freed")
+        ))
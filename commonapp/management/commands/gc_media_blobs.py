@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from commonapp import storage
+
+
+class Command(BaseCommand):
+    help = "Delete stored profile picture blobs (and their thumbnails) no row has referenced for the grace period"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=24.0, help="Keep unreferenced blobs this long")
+        parser.add_argument('--recount', action='store_true', help="Recompute every refcount from the image fields first")
+        parser.add_argument('--dry-run', action='store_true', help="Only list what would be deleted")
+
+    def handle(self, *args, **options):
+        if options['recount'] and not options['dry_run']:
+            self.stdout.write(f"{storage.recount()} refcounts corrected")
+        older_than = timezone.now() - timedelta(hours=options['grace_hours'])
+        removed = storage.collect_garbage(older_than, dry_run=options['dry_run'])
+        for name, size in removed:
+            self.stdout.write(f"  {name} ({size} bytes)")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(removed)} blobs, {sum(size for _, size in removed)} bytes"
+            + (" (dry run, nothing deleted)" if options['dry_run'] else " deleted")
+        ))
@@ -0,0 +1,53 @@
+import csv
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from commonapp.importer import ERROR_REPORT_HEADER, import_accounts, read_rows
+
+
+class Command(BaseCommand):
+    help = "Bulk import doctor and patient accounts from a CSV or JSONL file (see commonapp/importer.py for columns)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Default: from the file extension")
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=None, help="Password hashing processes (default: CPU count, 0 = in process)")
+        parser.add_argument('--checkpoint', help="Checkpoint file (default: <path>.checkpoint); an existing one resumes the import")
+        parser.add_argument('--errors', help="Per-row error report CSV (default: <path>.errors.csv)")
+        parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint")
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f"{path} not found")
+        fmt = options['format'] or ('jsonl' if path.suffix in ('.jsonl', '.ndjson') else 'csv')
+        checkpoint = Path(options['checkpoint'] or f"{path}.checkpoint")
+        error_path = Path(options['errors'] or f"{path}.errors.csv")
+
+        start_after = 0
+        if checkpoint.exists() and not options['restart']:
+            start_after = json.loads(checkpoint.read_text())['last_row']
+            self.stdout.write(f"resuming after row {start_after}")
+
+        resuming = start_after and error_path.exists()
+        with open(path, 'rb') as source, open(error_path, 'a' if resuming else 'w', newline='') as report:
+            writer = csv.writer(report)
+            if not resuming:
+                writer.writerow(ERROR_REPORT_HEADER)
+
+            def on_chunk(last_row, errors):
+                writer.writerows(errors)
+                report.flush()
+                checkpoint.write_text(json.dumps({'last_row': last_row}))
+                self.stdout.write(f"row {last_row} done")
+
+            imported, failed = import_accounts(
+                read_rows(source, fmt), chunk_size=options['chunk_size'], workers=options['workers'],
+                start_after=start_after, on_chunk=on_chunk,
+            )
+
+        checkpoint.unlink(missing_ok=True)  # finished, a rerun starts over
+        self.stdout.write(self.style.SUCCESS(f"imported {imported}, failed {failed} (see {error_path})"))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from commonapp.thumbnails import make_pending
+
+
+class Command(BaseCommand):
+    help = "Make WebP thumbnails of newly uploaded doctor/patient profile pictures in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20, help="Rows claimed per model per batch")
+        parser.add_argument('--loop', action='store_true', help="Keep running and poll for new uploads")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep when nothing is pending (with --loop)")
+
+    def handle(self, *args, **options):
+        while True:
+            made, failed = make_pending(options['batch_size'])
+            if made or failed:
+                self.stdout.write(f"made {made}, failed {failed}")
+                continue  # there may be more pending right away
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
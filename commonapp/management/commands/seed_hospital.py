@@ -0,0 +1,207 @@
+import random
+from datetime import date, datetime, timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from commonapp import search
+from commonapp.models import CustomUser, Profile
+from doctorapp import directory, slots
+from doctorapp.models import Appointment, Doctor, DoctorSlotOccupancy, Prescription, departments
+from hospitalapp.models import SEVERITY_PRIORITY, Bed, EmergencyCase
+from patientapp.models import Invoice, Patient, PatientDischargeDetails
+
+SEED_PASSWORD = 'seed-Passw0rd'
+
+
+def batched(iterable_size, batch_size):
+    for start in range(0, iterable_size, batch_size):
+        yield start, min(start + batch_size, iterable_size)
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic hospital with bulk_create (users named seed_doctor_<n> / seed_patient_<n>, "
+        f"password '{SEED_PASSWORD}'). Meant for benchmarks on a throwaway database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=200)
+        parser.add_argument('--patients', type=int, default=5000)
+        parser.add_argument('--appointments', type=int, default=50000)
+        parser.add_argument('--prescriptions', type=float, default=0.5, help="Share of past appointments that get a prescription")
+        parser.add_argument('--invoices', type=int, default=10000)
+        parser.add_argument('--discharges', type=int, default=2000)
+        parser.add_argument('--beds', type=int, default=500)
+        parser.add_argument('--emergencies', type=int, default=100, help="Active emergency cases")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=1, help="Random seed, same seed gives the same data")
+
+    def log(self, message):
+        self.stdout.write(f"[{datetime.now():%H:%M:%S}] {message}")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        # hashing once keeps seeding fast; every seeded user shares it
+        self.password = make_password(SEED_PASSWORD)
+
+        doctor_ids = self.create_doctors(options['doctors'])
+        patient_ids = self.create_patients(options['patients'], doctor_ids)
+        self.create_appointments(options['appointments'], options['prescriptions'], doctor_ids, patient_ids)
+        self.create_invoices(options['invoices'], patient_ids)
+        self.create_discharges(options['discharges'], doctor_ids, patient_ids)
+        self.create_beds(options['beds'], options['emergencies'], patient_ids)
+
+        # bulk_create skips signals, rebuild what they would have maintained
+        self.log("reconciling doctor stats")
+        report = StringIO()
+        call_command('reconcile_doctor_stats', stdout=report)
+        self.log(report.getvalue().strip().splitlines()[-1])
+        self.log("rebuilding search index")
+        search.reindex(Doctor)
+        search.reindex(Patient)
+        directory.invalidate()
+        self.log("done")
+
+    def create_users(self, prefix, count, user_type):
+        ids = []
+        for start, end in batched(count, self.batch_size):
+            users = [
+                CustomUser(
+                    username=f"{prefix}_{i}", email=f"{prefix}_{i}@example.com", password=self.password,
+                    first_name=f"{prefix.split('_')[1].title()}{i}", last_name="Seed", user_type=user_type, is_active=True,
+                )
+                for i in range(start, end)
+            ]
+            with transaction.atomic():
+                users = CustomUser.objects.bulk_create(users)
+                Profile.objects.bulk_create([Profile(user=user) for user in users])
+            ids.extend(user.pk for user in users)
+        return ids
+
+    def create_doctors(self, count):
+        self.log(f"creating {count} doctors")
+        user_ids = self.create_users('seed_doctor', count, 'doctor')
+        doctors = Doctor.objects.bulk_create([
+            Doctor(
+                user_id=user_id, address=f"Street {i}", mobile=f"01{i:09d}",
+                department=departments[i % len(departments)][0], status=True,
+            )
+            for i, user_id in enumerate(user_ids)
+        ], batch_size=self.batch_size)
+        return [doctor.pk for doctor in doctors]
+
+    def create_patients(self, count, doctor_ids):
+        self.log(f"creating {count} patients")
+        user_ids = self.create_users('seed_patient', count, 'patient')
+        patient_ids = []
+        for start, end in batched(count, self.batch_size):
+            patients = Patient.objects.bulk_create([
+                Patient(
+                    user_id=user_ids[i], address=f"House {i}", mobile=f"01{i:09d}",
+                    symptoms=self.rng.choice(['fever', 'cough', 'chest pain', 'rash', 'headache', 'fracture']),
+                    assigned_doctor_id=self.rng.choice(doctor_ids) if doctor_ids and self.rng.random() < 0.8 else None,
+                    blood_group=self.rng.choice(['A+', 'B+', 'O+', 'AB+', 'O-']),
+                )
+                for i in range(start, end)
+            ])
+            patient_ids.extend(patient.pk for patient in patients)
+        return patient_ids
+
+    def create_appointments(self, count, prescription_share, doctor_ids, patient_ids):
+        if not (doctor_ids and patient_ids):
+            return
+        self.log(f"creating {count} appointments")
+        # each doctor works the clinic hours slot by slot, half of it in the past, half ahead
+        opening = settings.CLINIC_OPENING_HOUR * 60 // slots.SLOT_MINUTES
+        per_day = settings.CLINIC_CLOSING_HOUR * 60 // slots.SLOT_MINUTES - opening
+        per_doctor = -(-count // len(doctor_ids))
+        first_day = timezone.localdate() - timedelta(days=per_doctor // per_day // 2)
+        now = timezone.now()
+
+        occupancy = {}
+        for start, end in batched(count, self.batch_size):
+            appointments = []
+            for n in range(start, end):
+                doctor_id = doctor_ids[n % len(doctor_ids)]
+                k = n // len(doctor_ids)
+                day = first_day + timedelta(days=k // per_day)
+                appointment_date = slots.slot_start(day, opening + k % per_day)
+                key = (doctor_id, day)
+                occupancy[key] = occupancy.get(key, 0) | slots.occupied_bits(appointment_date)[day]
+                appointments.append(Appointment(
+                    doctor_id=doctor_id, patient_id=self.rng.choice(patient_ids), appointment_date=appointment_date,
+                    reason="Checkup", is_completed=appointment_date < now,
+                ))
+            with transaction.atomic():
+                appointments = Appointment.objects.bulk_create(appointments)
+                Prescription.objects.bulk_create([
+                    Prescription(
+                        patient_id=appointment.patient_id, doctor_id=appointment.doctor_id, appointment_id=appointment.pk,
+                        symptoms="seeded", medication="Paracetamol", dosage="500mg",
+                    )
+                    for appointment in appointments
+                    if appointment.is_completed and self.rng.random() < prescription_share
+                ])
+        DoctorSlotOccupancy.objects.bulk_create(
+            [DoctorSlotOccupancy(doctor_id=doctor_id, day=day, occupied=bits) for (doctor_id, day), bits in occupancy.items()],
+            batch_size=self.batch_size,
+        )
+
+    def create_invoices(self, count, patient_ids):
+        if not patient_ids:
+            return
+        self.log(f"creating {count} invoices")
+        for start, end in batched(count, self.batch_size):
+            Invoice.objects.bulk_create([
+                Invoice(
+                    patient_id=self.rng.choice(patient_ids), description="Seeded services",
+                    amount=f"{self.rng.randint(100, 50000)}.{self.rng.randint(0, 99):02d}",
+                    is_paid=self.rng.random() < 0.6,
+                )
+                for _ in range(start, end)
+            ])
+
+    def create_discharges(self, count, doctor_ids, patient_ids):
+        if not (doctor_ids and patient_ids):
+            return
+        self.log(f"creating {count} discharges")
+        for start, end in batched(count, self.batch_size):
+            discharges = []
+            for _ in range(start, end):
+                days = self.rng.randint(1, 20)
+                room, medicine, fee, other = (self.rng.randint(100, 5000) for _ in range(4))
+                discharges.append(PatientDischargeDetails(
+                    patient_id=self.rng.choice(patient_ids), doctor_id=self.rng.choice(doctor_ids),
+                    address="Seeded", mobile="0", symptoms="seeded",
+                    release_date=date.today() - timedelta(days=self.rng.randint(0, 365)), days_spent=days,
+                    room_charge=room, medicine_cost=medicine, doctor_fee=fee, other_charge=other,
+                    total=room + medicine + fee + other,
+                ))
+            PatientDischargeDetails.objects.bulk_create(discharges)
+
+    def create_beds(self, count, emergencies, patient_ids):
+        self.log(f"creating {count} beds and {emergencies} emergency cases")
+        wards = [ward for ward, _ in Bed.ward.field.choices]
+        occupants = self.rng.sample(patient_ids, min(len(patient_ids), count * 2 // 3))
+        Bed.objects.bulk_create([
+            Bed(
+                bed_number=f"SEED-{i}", ward=wards[i % len(wards)],
+                is_occupied=i < len(occupants), patient_id=occupants[i] if i < len(occupants) else None,
+            )
+            for i in range(count)
+        ], batch_size=self.batch_size)
+        severities = [self.rng.choice(list(SEVERITY_PRIORITY)) for _ in range(emergencies if patient_ids else 0)]
+        EmergencyCase.objects.bulk_create([
+            EmergencyCase(
+                patient_id=self.rng.choice(patient_ids), description="Seeded emergency",
+                severity=severity, priority=SEVERITY_PRIORITY[severity],  # bulk_create skips save()
+            )
+            for severity in severities
+        ], batch_size=self.batch_size)
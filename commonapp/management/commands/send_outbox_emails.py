@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from commonapp.outbox import deliver_pending
+
+
+class Command(BaseCommand):
+    help = "Send queued emails (activation links etc.) from the outbox in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--max-attempts', type=int, default=5, help="Give up on an email after this many failures")
+        parser.add_argument('--loop', action='store_true', help="Keep running and poll for new emails")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep when the outbox is empty (with --loop)")
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = deliver_pending(options['batch_size'], options['max_attempts'])
+            if sent or failed:
+                self.stdout.write(f"sent {sent}, failed {failed}")
+                continue  # there may be more due right away
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,72 @@
+from django.db import OperationalError, migrations
+
+# PostgreSQL: GIN trigram indexes for the `%>` (word similarity) lookups in commonapp/search.py
+TRIGRAM_INDEXES = [
+    ('search_user_first_name_trgm', 'commonapp_customuser', 'first_name'),
+    ('search_user_last_name_trgm', 'commonapp_customuser', 'last_name'),
+    ('search_patient_symptoms_trgm', 'patientapp_patient', 'symptoms'),
+    ('search_doctor_department_trgm', 'doctorapp_doctor', 'department'),
+]
+
+# SQLite: FTS5 tables (rowid = patient / doctor pk), filled from the current rows
+FTS_TABLES = [
+    (
+        'search_patient_fts',
+        "SELECT t.id, u.first_name, u.last_name, t.symptoms FROM patientapp_patient t "
+        "JOIN commonapp_customuser u ON u.id = t.user_id",
+    ),
+    (
+        'search_doctor_fts',
+        "SELECT t.id, u.first_name, u.last_name, t.department FROM doctorapp_doctor t "
+        "JOIN commonapp_customuser u ON u.id = t.user_id",
+    ),
+]
+
+
+def has_trigram_fts(connection):
+    """Whether this SQLite build has FTS5 with the trigram tokenizer (SQLite 3.34+)"""
+    if connection.Database.sqlite_version_info < (3, 34, 0):
+        return False
+    with connection.cursor() as cursor:
+        try:  # FTS5 itself is a compile time option
+            cursor.execute("CREATE VIRTUAL TABLE temp.search_trigram_probe USING fts5(c0, tokenize='trigram')")
+        except OperationalError:
+            return False
+        cursor.execute("DROP TABLE temp.search_trigram_probe")
+    return True
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for name, table, column in TRIGRAM_INDEXES:
+            schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)")
+    elif vendor == 'sqlite' and has_trigram_fts(schema_editor.connection):
+        # without the FTS tables commonapp/search.py falls back to icontains
+        for table, source in FTS_TABLES:
+            schema_editor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(c0, c1, c2, tokenize='trigram')")
+            schema_editor.execute(f"INSERT INTO {table} (rowid, c0, c1, c2) {source}")
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for name, _, _ in TRIGRAM_INDEXES:
+            schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+    elif vendor == 'sqlite':
+        for table, _ in FTS_TABLES:
+            schema_editor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commonapp', '0004_outboundemail'),
+        ('doctorapp', '0007_doctorstats'),
+        ('patientapp', '0003_patient_blood_group_patient_date_of_birth'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
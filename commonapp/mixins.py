@@ -0,0 +1,36 @@
+import functools
+
+
+class RelatedFieldsMixin:
+    """Apply the relations a viewset's serializer reads to every queryset it serves.
+
+    Declare them on the viewset:
+
+        select_related_fields = ('patient__user',)
+        prefetch_related_fields = ()
+
+    get_queryset() is wrapped automatically, including overrides written in the viewset
+    itself; querysets built by hand inside an action can go through self.with_related().
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        own = cls.__dict__.get('get_queryset')
+        if own is not None and not getattr(own, '_with_related', False):
+            @functools.wraps(own)
+            def get_queryset(self):
+                return self.with_related(own(self))
+            get_queryset._with_related = True
+            cls.get_queryset = get_queryset
+
+    def get_queryset(self):
+        return self.with_related(super().get_queryset())
+
+    def with_related(self, queryset):
+        if self.select_related_fields:
+            queryset = queryset.select_related(*self.select_related_fields)
+        if self.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*self.prefetch_related_fields)
+        return queryset
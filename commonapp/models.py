@@ -5,8 +5,11 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 # from rest_framework.permissions import BasePermission
 from django.conf import settings
+from django.utils import timezone
 import uuid
 
+from .storage import profile_pic_storage
+
 class CustomUser(AbstractUser):
     USER_TYPE_CHOICES = (
         # ('admin', 'Admin'),
@@ -36,10 +39,16 @@ class CustomUser(AbstractUser):
 class Profile(models.Model):
     """Extended user profile model"""
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    image = models.ImageField(upload_to='profile_pics/', null=True, blank=True)
+    image = models.ImageField(upload_to='profile_pics/', storage=profile_pic_storage, null=True, blank=True)
     activation_token = models.CharField(max_length=100, null=True, blank=True)
     token_generated_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # account activation looks the token up; activated profiles (token cleared) stay out
+            models.Index(fields=['activation_token'], condition=models.Q(activation_token__isnull=False), name='profile_activation_token_idx'),
+        ]
+
     def generate_activation_token(self):
         token = uuid.uuid4().hex  # Generate a unique token
         self.activation_token = token
@@ -50,5 +59,58 @@ class Profile(models.Model):
         return f"Profile for {self.user.username}"
 
 
+class OutboundEmail(models.Model):
+    """Email waiting to be sent by `manage.py send_outbox_emails` (written in the caller's transaction)"""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),  # claimed by a worker until next_attempt_at (then claimable again)
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),  # gave up after the maximum number of attempts
+    )
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the worker only ever scans due pending (or abandoned sending) rows
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_due_idx'),
+        ]
 
+    @classmethod
+    def queue(cls, subject, body, recipient_list, from_email=None):
+        return cls.objects.create(
+            subject=subject,
+            body=body,
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            to=list(recipient_list),
+        )
 
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
+
+
+class MediaBlob(models.Model):
+    """One stored file of commonapp.storage.ContentAddressedStorage and how many fields point at it"""
+    name = models.CharField(max_length=100, unique=True)  # blobs/<aa>/<bb>/<sha256><ext>
+    size = models.PositiveBigIntegerField(default=0)
+    refcount = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # garbage collection only looks at unreferenced blobs
+            models.Index(fields=['updated_at'], condition=models.Q(refcount__lte=0), name='mediablob_unreferenced_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} refs)"
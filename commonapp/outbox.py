@@ -0,0 +1,97 @@
+"""Delivery side of the email outbox (commonapp.models.OutboundEmail)."""
+import logging
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# how long a claimed batch stays reserved for its worker; a worker that dies mid-batch
+# leaves its rows in 'sending', and they become due again once this has passed
+CLAIM_LEASE = timedelta(minutes=10)
+
+
+def retry_delay(attempts, base_seconds=30, max_seconds=3600):
+    """Exponential backoff: 30s, 1m, 2m, 4m ... capped at an hour"""
+    return timedelta(seconds=min(base_seconds * 2 ** max(attempts - 1, 0), max_seconds))
+
+
+def claim_batch(batch_size=50):
+    """Due rows, marked 'sending' (with the attempt counted) in a transaction of their own.
+
+    Rows are locked with skip_locked only while they are claimed, so several workers can drain
+    the outbox side by side without any lock being held over SMTP.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status__in=('pending', 'sending'), next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        for email in batch:
+            email.status = 'sending'
+            email.attempts += 1
+            email.next_attempt_at = now + CLAIM_LEASE
+        OutboundEmail.objects.bulk_update(batch, ['status', 'attempts', 'next_attempt_at'])
+    return batch
+
+
+def _record_failure(email, error, max_attempts):
+    email.last_error = str(error)
+    if email.attempts >= max_attempts:
+        email.status = 'failed'
+    else:
+        email.status = 'pending'
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+    email.save(update_fields=['status', 'next_attempt_at', 'last_error'])
+
+
+def _record_sent(email):
+    email.status = 'sent'
+    email.sent_at = timezone.now()
+    email.last_error = ''
+    email.save(update_fields=['status', 'sent_at', 'last_error'])
+
+
+def deliver_pending(batch_size=50, max_attempts=5):
+    """Send one batch of due emails over a single SMTP connection.
+
+    The batch is claimed and committed first; each outcome is then saved on its own, so an
+    unreachable server or a crash mid-batch still leaves every attempt and its backoff recorded.
+    Returns (sent, failed) counts for the batch.
+    """
+    batch = claim_batch(batch_size)
+    if not batch:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        logger.warning("Could not open the email connection: %s", e)
+        for email in batch:
+            _record_failure(email, e, max_attempts)
+        return 0, len(batch)
+    try:
+        for email in batch:
+            message = EmailMessage(email.subject, email.body, email.from_email, email.to, connection=connection)
+            try:
+                message.send()
+            except Exception as e:
+                failed += 1
+                _record_failure(email, e, max_attempts)
+            else:
+                sent += 1
+                _record_sent(email)
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass  # already sent (or recorded); a failing QUIT changes nothing
+    return sent, failed
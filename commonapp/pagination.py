@@ -0,0 +1,179 @@
+"""List pagination: page numbers or keyset cursors.
+
+Page numbers (?page=) need an OFFSET and a COUNT(*), both of which get slower the deeper
+you page. A keyset cursor instead remembers the ordering values of the last row sent and
+asks for the rows after them, so on an index matching the ordering every page costs the
+same. A view opts in by declaring that ordering (ending in a unique field):
+
+    keyset_ordering = ('appointment_date', 'id')
+
+Such views answer with cursors ({next, previous, results}) unless the request asks for
+?page= or ?pagination=page; any other view can still be asked for ?pagination=cursor
+once it declares an ordering.
+"""
+import base64
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering=None):
+        if ordering:
+            self.ordering = tuple(ordering)
+
+    def get_ordering(self, view):
+        ordering = getattr(self, 'ordering', None) or getattr(view, 'keyset_ordering', None)
+        if not ordering:
+            raise AssertionError(f"{type(view).__name__} needs keyset_ordering to use cursor pagination")
+        return ordering
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def encode_cursor(self, values, reverse):
+        payload = json.dumps({'v': values, 'r': reverse}, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            values = payload['v']
+            if len(values) != len(self.ordering):
+                raise ValueError
+            # back to dates/datetimes/decimals so the comparison is typed
+            values = [
+                None if value is None else model._meta.get_field(name.lstrip('-')).to_python(value)
+                for name, value in zip(self.ordering, values)
+            ]
+            return values, bool(payload['r'])
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def after(self, values, reverse):
+        """Q for rows strictly after `values` in the ordering (before it when reverse)"""
+        condition, equal = Q(), Q()
+        for name, value in zip(self.ordering, values):
+            field = name.lstrip('-')
+            descending = name.startswith('-') != reverse
+            condition |= equal & Q(**{f"{field}__{'lt' if descending else 'gt'}": value})
+            equal &= Q(**{field: value})
+        return condition
+
+    def row_values(self, row):
+        fields = [name.lstrip('-') for name in self.ordering]
+        if isinstance(row, dict):
+            return [row[field] for field in fields]
+        return [getattr(row, field) for field in fields]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.ordering = self.get_ordering(view)
+        self.request = request
+        size = self.get_page_size(request)
+        values, reverse = self.decode_cursor(request, queryset.model)
+
+        order = [name[1:] if name.startswith('-') else '-' + name for name in self.ordering] if reverse else list(self.ordering)
+        queryset = queryset.order_by(*order)
+        if values is not None:
+            queryset = queryset.filter(self.after(values, reverse))
+        rows = list(queryset[:size + 1])  # the extra row tells whether there is more
+        more = len(rows) > size
+        rows = rows[:size]
+        if reverse:
+            rows.reverse()
+
+        has_next = more if not reverse else values is not None
+        has_previous = values is not None if not reverse else more
+        self.next_cursor = self.encode_cursor(self.row_values(rows[-1]), False) if rows and has_next else None
+        self.previous_cursor = self.encode_cursor(self.row_values(rows[0]), True) if rows and has_previous else None
+        return rows
+
+    def link(self, cursor):
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), 'page')
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.link(self.next_cursor),
+            'previous': self.link(self.previous_cursor),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class ListPagination(PageNumberPagination):
+    """Default pagination: keyset when the view declares keyset_ordering, page numbers otherwise.
+
+    The request can pick either: ?page=2 or ?pagination=page, ?cursor=... or ?pagination=cursor.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    keyset_ordering = None  # set on a subclass to paginate a hand-built queryset by keyset
+    default_mode = 'cursor'  # for views with a keyset ordering
+
+    def use_keyset(self, request, view):
+        ordering = self.keyset_ordering or getattr(view, 'keyset_ordering', None)
+        if not ordering:
+            return False
+        mode = request.query_params.get('pagination')
+        if mode in ('cursor', 'page'):
+            return mode == 'cursor'
+        if KeysetPagination.cursor_query_param in request.query_params:
+            return True
+        if self.page_query_param in request.query_params:
+            return False
+        return self.default_mode == 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.use_keyset(request, view):
+            self.keyset = KeysetPagination(self.keyset_ordering)
+            self.keyset.page_size = self.page_size or self.keyset.page_size
+            self.keyset.max_page_size = self.max_page_size
+            rows = self.keyset.paginate_queryset(queryset, request, view)
+            self.display_page_controls = bool(self.keyset.next_cursor or self.keyset.previous_cursor)
+            return rows
+        ordering = self.keyset_ordering or getattr(view, 'keyset_ordering', None)
+        if ordering and not queryset.ordered:
+            queryset = queryset.order_by(*ordering)  # same order in both modes
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_html_context(self):
+        if self.keyset is not None:
+            return {'previous_url': self.keyset.link(self.keyset.previous_cursor), 'next_url': self.keyset.link(self.keyset.next_cursor)}
+        return super().get_html_context()
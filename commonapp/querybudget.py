@@ -0,0 +1,108 @@
+"""Query budget checks for list endpoints.
+
+An endpoint is within budget when the number of SQL queries it runs doesn't depend on how
+many rows it returns, i.e. no serializer walks a relation row by row (N+1). measure() counts
+the queries of one request; check_flat() seeds the same endpoint at two sizes and compares.
+Used by `manage.py check_query_budget`. The apps' tests.py pin each endpoint's count with
+assertNumQueries over the same seed (commonapp.testing.QueryBudgetTestCase).
+"""
+from datetime import date, timedelta
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def measure(client, url):
+    """(status_code, number of queries) of one GET"""
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    return response.status_code, len(queries)
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _uncached():
+    # response caches would answer without the queries being measured (and their
+    # invalidations only run on commit, which the rolled back seeding never reaches)
+    return override_settings(DOCTOR_DIRECTORY_CACHE_TIMEOUT=0)
+
+
+def _seed(rows):
+    """A doctor and a patient with `rows` records of every kind attached to them"""
+    from commonapp.models import CustomUser
+    from doctorapp.models import Appointment, Doctor, Prescription
+    from hospitalapp.models import Bed, EmergencyCase
+    from patientapp.models import Invoice, Patient, PatientDischargeDetails
+
+    doctor = Doctor.objects.create(user=CustomUser.objects.create_user(
+        'budget_doctor', 'budget_doctor@example.com', None, user_type='doctor', first_name='Budget', last_name='Doctor'))
+    patient = Patient.objects.create(
+        user=CustomUser.objects.create_user('budget_patient', 'budget_patient@example.com', None, user_type='patient'),
+        mobile='0', symptoms='budget', assigned_doctor=doctor)
+    for i in range(rows):
+        other = Patient.objects.create(
+            user=CustomUser.objects.create_user(f'budget_patient_{i}', '', None, user_type='patient', first_name=f'P{i}'),
+            mobile='0', symptoms='budget', assigned_doctor=doctor)
+        Bed.objects.create(bed_number=f'budget-{i}', ward='General', is_occupied=True, patient=other)
+        Bed.objects.create(bed_number=f'budget-free-{i}', ward='Emergency')
+        EmergencyCase.objects.create(patient=other, severity='Mild', description='budget')
+        appointment = Appointment.objects.create(
+            patient=patient, doctor=doctor, appointment_date=timezone.now() + timedelta(days=1, hours=i))
+        Prescription.objects.create(
+            patient=patient, doctor=doctor, appointment=appointment, symptoms='s', medication='m', dosage='d')
+        PatientDischargeDetails.objects.create(
+            patient=patient, doctor=doctor, address='a', release_date=date.today(), days_spent=1,
+            room_charge=1, medicine_cost=1, doctor_fee=1, other_charge=1, total=4)
+        Invoice.objects.create(patient=patient, description='budget', amount='1.00')
+    return {'doctor': doctor.user, 'patient': patient.user}
+
+
+# (url, role making the request); each url lists the seeded rows (a page of them at most)
+ENDPOINTS = [
+    ('/api/hospital/beds/', 'doctor'),
+    ('/api/hospital/beds/available_beds/?ward=Emergency', 'doctor'),
+    ('/api/hospital/emergency-cases/', 'doctor'),
+    ('/api/hospital/emergency-cases/active_cases/', 'doctor'),
+    ('/api/doctor/profile/', 'doctor'),
+    ('/api/doctor/profile/my_patients/', 'doctor'),
+    ('/api/doctor/appointments/', 'doctor'),
+    ('/api/doctor/appointments/doctor_appointments/', 'doctor'),
+    ('/api/doctor/prescriptions/', 'doctor'),
+    ('/api/patient/discharge/', 'patient'),
+    ('/api/patient/invoices/', 'patient'),
+    ('/api/patient/profile/search_doctors/', 'patient'),
+]
+
+
+def _counts(rows, endpoints):
+    counts = {}
+    try:
+        with _uncached(), transaction.atomic():
+            users = _seed(rows)
+            for url, role in endpoints:
+                client = APIClient()
+                client.force_authenticate(users[role])
+                counts[url] = measure(client, url)
+            raise _Rollback  # leave the database as it was
+    except _Rollback:
+        pass
+    return counts
+
+
+def check_flat(small=2, large=8, endpoints=ENDPOINTS):
+    """{url: (queries at small, queries at large)}; raises QueryBudgetExceeded if any grew"""
+    before, after = _counts(small, endpoints), _counts(large, endpoints)
+    report = {url: (before[url][1], after[url][1]) for url, _ in endpoints}
+    grown = {url: counts for url, counts in report.items() if counts[1] > counts[0]}
+    errors = {url: after[url][0] for url, _ in endpoints if after[url][0] >= 400}
+    if grown or errors:
+        raise QueryBudgetExceeded(report, grown, errors)
+    return report
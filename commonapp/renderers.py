@@ -0,0 +1,57 @@
+"""orjson-backed JSON renderer and parser, opted into with API_JSON_BACKEND=orjson (settings.py).
+
+They produce and accept the same JSON as DRF's JSONRenderer / JSONParser: datetimes in UTC
+end in "Z", dates and UUIDs are ISO strings, and raw Decimals (.values() rows, aggregates)
+become numbers like DRF's encoder makes them (serializer DecimalFields such as
+Invoice.amount are already strings). Whatever orjson can't encode itself goes through DRF's
+encoder. Anything orjson refuses outright (ints beyond 64 bits, pretty printing, non-UTF-8
+request bodies) falls back to DRF, as does everything when orjson isn't installed.
+
+`manage.py benchmark_json` compares both on the seeded dataset.
+"""
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # optional; DRF's json then does the work
+    orjson = None
+
+_default = encoders.JSONEncoder().default  # Decimal, lazy strings, querysets, ...
+
+
+def dumps(data):
+    """Compact UTF-8 JSON bytes of `data`, as DRF's JSONRenderer would write them"""
+    content = orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z)
+    # like DRF, keep the output a strict JavaScript subset
+    return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class ORJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            return dumps(data)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,151 @@
+"""Ranked, typo tolerant search over patients and doctors.
+
+PostgreSQL: pg_trgm word similarity on each searched column, each served by its own GIN
+trigram index (commonapp migration 0005); the per-column best matches are merged in Python.
+SQLite (local runs): FTS5 tables using the trigram tokenizer, one row per patient/doctor
+(rowid = pk). A term matches on any trigram it shares with a row and bm25 ranks rows that
+share more of them first, so a typo only costs the trigrams it touches. The trigram
+tokenizer needs SQLite 3.34+; older builds get no FTS tables from the migration.
+Other backends, and SQLite without the FTS tables, fall back to icontains (no typo tolerance).
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+
+# share of a term's trigrams a row must contain to match on SQLite
+MIN_SHARED_TRIGRAMS = 0.5
+
+# model label -> (FTS table, searched fields in FTS column order, SELECT feeding the FTS table)
+TARGETS = {
+    'patientapp.Patient': (
+        'search_patient_fts',
+        ('user__first_name', 'user__last_name', 'symptoms'),
+        "SELECT t.id, u.first_name, u.last_name, t.symptoms FROM patientapp_patient t "
+        "JOIN commonapp_customuser u ON u.id = t.user_id",
+    ),
+    'doctorapp.Doctor': (
+        'search_doctor_fts',
+        ('user__first_name', 'user__last_name', 'department'),
+        "SELECT t.id, u.first_name, u.last_name, t.department FROM doctorapp_doctor t "
+        "JOIN commonapp_customuser u ON u.id = t.user_id",
+    ),
+}
+
+
+def _max_results():
+    return getattr(settings, 'SEARCH_MAX_RESULTS', 200)
+
+
+def _fts_table(model):
+    table = TARGETS[model._meta.label][0]
+    if connection.vendor == 'sqlite' and table in connection.introspection.table_names():
+        return table
+    return None
+
+
+def _trigrams(term):
+    term = ' '.join(term.lower().split())
+    return sorted({term[i:i + 3] for i in range(len(term) - 2)})
+
+
+def _ordered(queryset, ids):
+    """queryset limited to ids, in that order"""
+    if not ids:
+        return queryset.none()
+    rank = Case(*[When(pk=pk, then=Value(position)) for position, pk in enumerate(ids)], output_field=IntegerField())
+    return queryset.filter(pk__in=ids).annotate(search_rank=rank).order_by('search_rank')
+
+
+def _search_fts(queryset, term, table):
+    # only rows of the caller's queryset (e.g. one doctor's patients) compete for the limit
+    scope_sql, scope_params = queryset.order_by().values('pk').query.sql_with_params()
+    grams = _trigrams(term)
+    if grams:
+        # every trigram as its own quoted phrase, OR-ed
+        match = ' OR '.join('"%s"' % gram.replace('"', '""') for gram in grams)
+        sql = (
+            f"SELECT rowid, c0, c1, c2 FROM {table} WHERE {table} MATCH %s AND rowid IN ({scope_sql}) "
+            f"ORDER BY bm25({table}) LIMIT %s"
+        )
+        params = [match, *scope_params, _max_results() * 5]
+    else:
+        # shorter than a trigram, the tokenizer can't match it; substring scan instead
+        columns = ' OR '.join(f"{column} LIKE %s" for column in ('c0', 'c1', 'c2'))
+        sql = f"SELECT rowid, c0, c1, c2 FROM {table} WHERE ({columns}) AND rowid IN ({scope_sql}) LIMIT %s"
+        params = [f"%{term.strip()}%"] * 3 + [*scope_params, _max_results()]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    if grams:
+        # sharing one common trigram ("doc") isn't a match; keep rows holding enough of the
+        # term's trigrams, like pg_trgm's similarity threshold, most shared first
+        wanted = set(grams)
+        term = ' '.join(term.lower().split())
+        shared, exact = {}, set()
+        for pk, *columns in rows:
+            text = ' '.join(columns).lower()
+            shared[pk] = len(wanted & set(_trigrams(text))) / len(wanted)
+            if term in text:
+                exact.add(pk)
+        ids = sorted((pk for pk in shared if shared[pk] >= MIN_SHARED_TRIGRAMS), key=lambda pk: (-shared[pk], pk not in exact))
+    else:
+        ids = [row[0] for row in rows]
+    return _ordered(queryset, ids[:_max_results()])
+
+
+def _search_trigram(queryset, term, fields):
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    # one query per column keeps each on its own index (an OR across joined tables can't)
+    best = {}
+    for field in fields:
+        matches = (
+            queryset.order_by()
+            .filter(**{f'{field}__trigram_word_similar': term})
+            .annotate(similarity=TrigramWordSimilarity(term, field))
+            .order_by('-similarity')
+            .values_list('pk', 'similarity')[:_max_results()]
+        )
+        for pk, similarity in matches:
+            best[pk] = max(similarity, best.get(pk, 0))
+    ids = sorted(best, key=lambda pk: (-best[pk], pk))[:_max_results()]
+    return _ordered(queryset, ids)
+
+
+def search(queryset, term):
+    """Patients or doctors of `queryset` matching `term`, best match first"""
+    term = term.strip()
+    if not term:
+        return queryset
+    fields = TARGETS[queryset.model._meta.label][1]
+    if connection.vendor == 'postgresql':
+        return _search_trigram(queryset, term, fields)
+    table = _fts_table(queryset.model)
+    if table:
+        return _search_fts(queryset, term, table)
+    matches = Q()
+    for field in fields:
+        matches |= Q(**{f'{field}__icontains': term})
+    return queryset.filter(matches)
+
+
+def reindex(model, pks=None):
+    """Refresh the SQLite FTS rows of some (default all) patients or doctors.
+
+    Saves go through signals (commonapp/signals.py); bulk_create callers call this.
+    """
+    table = _fts_table(model)
+    if table is None:
+        return
+    source = TARGETS[model._meta.label][2]
+    with connection.cursor() as cursor:
+        if pks is None:
+            cursor.execute(f"DELETE FROM {table}")
+            cursor.execute(f"INSERT INTO {table} (rowid, c0, c1, c2) {source}")
+            return
+        pks = list(pks)
+        for start in range(0, len(pks), 500):
+            batch = pks[start:start + 500]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(f"DELETE FROM {table} WHERE rowid IN ({placeholders})", batch)
+            cursor.execute(f"INSERT INTO {table} (rowid, c0, c1, c2) {source} WHERE t.id IN ({placeholders})", batch)
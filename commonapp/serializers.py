@@ -79,13 +79,13 @@ class UserSerializer(serializers.ModelSerializer):
         # Create corresponding doctor/patient profile
         if user.user_type == 'doctor':
             doctor = Doctor.objects.create(user=user)
-            if image:  # Also copy to doctor profile
-                doctor.profile_pic = image
+            if image:  # Also point the doctor profile at the stored blob (no second copy)
+                doctor.profile_pic = profile.image.name
                 doctor.save()
         elif user.user_type == 'patient':
             patient = Patient.objects.create(user=user)
-            if image:  # Also copy to patient profile
-                patient.profile_pic = image
+            if image:  # Also point the patient profile at the stored blob (no second copy)
+                patient.profile_pic = profile.image.name
                 patient.save()
 
         return user
@@ -0,0 +1,85 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from doctorapp.models import Doctor
+from patientapp.models import Patient
+from .models import CustomUser, Profile
+from .authentication import forget_principal
+from . import search, storage
+
+def _forget_principal_now_and_on_commit(user_id):
+    forget_principal(user_id)
+    transaction.on_commit(lambda: forget_principal(user_id))
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def forget_user_principal(sender, instance, **kwargs):
+    # covers deactivation and user_type changes. Dropped again on commit: a request running
+    # meanwhile may have cached the row as it was before the change
+    _forget_principal_now_and_on_commit(instance.pk)
+
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+def forget_role_principal(sender, instance, **kwargs):
+    _forget_principal_now_and_on_commit(instance.user_id)
+
+
+# SQLite FTS rows behind commonapp/search.py (no-ops on other backends)
+
+@receiver(post_save, sender=Doctor)
+@receiver(post_save, sender=Patient)
+def reindex_search_row(sender, instance, **kwargs):
+    search.reindex(sender, [instance.pk])
+
+@receiver(post_delete, sender=Doctor)
+@receiver(post_delete, sender=Patient)
+def drop_search_row(sender, instance, **kwargs):
+    search.reindex(sender, [instance.pk])  # the row is gone, so this only deletes
+
+@receiver(post_save, sender=CustomUser)
+def reindex_user_search_rows(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return  # the Doctor/Patient row doesn't exist yet
+    if update_fields is not None and not {'first_name', 'last_name'} & set(update_fields):
+        return  # e.g. last_login on every login
+    search.reindex(Doctor, Doctor.objects.filter(user_id=instance.pk).values_list('pk', flat=True))
+    search.reindex(Patient, Patient.objects.filter(user_id=instance.pk).values_list('pk', flat=True))
+
+
+# MediaBlob refcounts behind commonapp/storage.py: one per image field pointing at a blob
+
+def _image_field(sender):
+    return {Profile: 'image', Doctor: 'profile_pic', Patient: 'profile_pic'}[sender]
+
+def _file_name(value):
+    return getattr(value, 'name', value) or ''
+
+@receiver(post_init, sender=Profile)
+@receiver(post_init, sender=Doctor)
+@receiver(post_init, sender=Patient)
+def remember_image(sender, instance, **kwargs):
+    # raw attribute, so a deferred field doesn't cost a query (None: not loaded, not tracked)
+    field = _image_field(sender)
+    instance._loaded_image_name = _file_name(instance.__dict__[field]) if field in instance.__dict__ else None
+
+@receiver(post_save, sender=Profile)
+@receiver(post_save, sender=Doctor)
+@receiver(post_save, sender=Patient)
+def count_image_reference(sender, instance, update_fields=None, **kwargs):
+    field = _image_field(sender)
+    if update_fields is not None and field not in update_fields:
+        return
+    name, old = _file_name(getattr(instance, field)), instance._loaded_image_name
+    if old is not None and name != old:
+        storage.add_reference(name, 1)
+        storage.add_reference(old, -1)
+        instance._loaded_image_name = name
+
+@receiver(post_delete, sender=Profile)
+@receiver(post_delete, sender=Doctor)
+@receiver(post_delete, sender=Patient)
+def drop_image_reference(sender, instance, **kwargs):
+    if instance._loaded_image_name is not None:
+        storage.add_reference(instance._loaded_image_name, -1)
@@ -0,0 +1,177 @@
+"""Content-addressed storage for profile pictures.
+
+A saved file is stored once under blobs/<aa>/<bb>/<sha256><ext>, whatever name it was
+uploaded with; saving identical bytes again (the same signup image for Profile, Doctor
+and Patient, or two users uploading the same avatar) returns the existing blob without
+writing it. Each blob has a MediaBlob row whose refcount the signals in commonapp/signals.py
+keep equal to the number of image fields pointing at it; `manage.py gc_media_blobs`
+deletes blobs nobody has referenced for a while.
+"""
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+BLOB_DIR = 'blobs'
+
+
+def blob_name(digest, ext):
+    return f"{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{ext.lower()}"
+
+
+def file_digest(content):
+    hasher = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        hasher.update(chunk)
+    content.seek(0)
+    return hasher.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def _save(self, name, content):
+        blob = blob_name(file_digest(content), os.path.splitext(name)[1])
+        if not self.exists(blob):
+            # two first uploads racing end up as blob and blob_<suffix>; both stay valid
+            blob = super()._save(blob, content)
+        register_blob(blob, content.size)
+        return blob
+
+
+def profile_pic_storage():
+    return ContentAddressedStorage()
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(BLOB_DIR + '/')
+
+
+def register_blob(name, size=0):
+    from .models import MediaBlob
+    try:
+        with transaction.atomic():
+            _, created = MediaBlob.objects.get_or_create(name=name, defaults={'size': size})
+    except IntegrityError:
+        return  # registered by a concurrent save
+    if not created:
+        # saved again: restart the grace period before an unreferenced blob is collected
+        MediaBlob.objects.filter(name=name).update(updated_at=timezone.now())
+
+
+def add_reference(name, delta):
+    """Move a blob's refcount by delta (+1 when a field starts pointing at it, -1 when it stops)"""
+    from .models import MediaBlob
+    if not is_blob(name):
+        return
+    changes = {'refcount': F('refcount') + delta, 'updated_at': timezone.now()}
+    if not MediaBlob.objects.filter(name=name).update(**changes) and delta > 0:
+        register_blob(name)
+        MediaBlob.objects.filter(name=name).update(**changes)
+
+
+def references():
+    """(model, field name) of every image field stored here"""
+    from doctorapp.models import Doctor
+    from patientapp.models import Patient
+    from .models import Profile
+    return [(Profile, 'image'), (Doctor, 'profile_pic'), (Patient, 'profile_pic')]
+
+
+def recount():
+    """Set every MediaBlob.refcount from the fields again; returns the number of rows corrected"""
+    from django.db.models import Count
+    from .models import MediaBlob
+
+    counts = {}
+    for model, field in references():
+        rows = model.objects.filter(**{f'{field}__startswith': BLOB_DIR + '/'}).values(field).annotate(n=Count('pk')).order_by()
+        for row in rows:
+            counts[row[field]] = counts.get(row[field], 0) + row['n']
+    for name in counts:
+        register_blob(name)
+    corrected = 0
+    for blob in MediaBlob.objects.all().iterator():
+        if blob.refcount != counts.get(blob.name, 0):
+            MediaBlob.objects.filter(pk=blob.pk).update(refcount=counts.get(blob.name, 0), updated_at=timezone.now())
+            corrected += 1
+    return corrected
+
+
+def collect_garbage(older_than, dry_run=False):
+    """Delete unreferenced blobs (and their thumbnails) last touched before `older_than`.
+
+    The grace period covers a file saved moments ago whose row isn't committed yet.
+    Returns [(name, size)] of the blobs removed.
+    """
+    from .models import MediaBlob
+    from .thumbnails import CACHE_DIR
+
+    storage = profile_pic_storage()
+    removed = []
+    for blob in MediaBlob.objects.filter(refcount__lte=0, updated_at__lt=older_than).iterator():
+        if dry_run:
+            removed.append((blob.name, blob.size))
+            continue
+        with transaction.atomic():
+            # re-checked under the row lock: a save may have just picked it up again
+            if not MediaBlob.objects.select_for_update().filter(pk=blob.pk, refcount__lte=0).delete()[0]:
+                continue
+            name = blob.name
+            transaction.on_commit(lambda name=name: _delete_blob_files(storage, name, CACHE_DIR))
+        removed.append((blob.name, blob.size))
+    return removed
+
+
+def _delete_blob_files(storage, name, thumbnail_dir):
+    storage.delete(name)
+    directory = f"{thumbnail_dir}/{name}"
+    if storage.exists(directory):
+        for file_name in storage.listdir(directory)[1]:
+            storage.delete(f"{directory}/{file_name}")
+
+
+def dedupe(directory, dry_run=False):
+    """Move the files under `directory` (uploads from before this storage) into blobs.
+
+    Every row naming such a file is pointed at its blob and the old file deleted, so
+    identical pictures end up stored once. Returns (files, bytes freed).
+    """
+    storage = profile_pic_storage()
+    files = freed = 0
+
+    def walk(path):
+        directories, names = storage.listdir(path)
+        for name in names:
+            yield f"{path}/{name}"
+        for sub in directories:
+            yield from walk(f"{path}/{sub}")
+
+    if not storage.exists(directory):
+        return files, freed
+    blobs = set()
+    for name in list(walk(directory.rstrip('/'))):
+        with storage.open(name, 'rb') as f:
+            blob = blob_name(file_digest(f), os.path.splitext(name)[1])
+        files += 1
+        if blob in blobs or storage.exists(blob):
+            freed += storage.size(name)
+        blobs.add(blob)
+        if dry_run:
+            continue
+        if not storage.exists(blob):
+            with storage.open(name, 'rb') as f:
+                blob = storage.save(name, f)
+        with transaction.atomic():
+            # update() skips the refcount signals; recount() below sets them from scratch
+            for model, field in references():
+                model.objects.filter(**{field: name}).update(**{field: blob})
+        storage.delete(name)
+    if not dry_run:
+        recount()
+    return files, freed
@@ -0,0 +1,61 @@
+"""Helpers shared by the apps' tests.py: users with their doctor/patient rows, API clients,
+and the query budget test case."""
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from .models import CustomUser
+
+
+def make_user(username, user_type, **fields):
+    return CustomUser.objects.create_user(username, f'{username}@example.com', 'pw-test-123', user_type=user_type, **fields)
+
+
+def make_doctor(username='doctor', **fields):
+    from doctorapp.models import Doctor
+    user = make_user(username, 'doctor', first_name=fields.pop('first_name', 'Doc'), last_name=fields.pop('last_name', 'Tor'))
+    return Doctor.objects.create(user=user, address='addr', mobile='0', status=True, **fields)
+
+
+def make_patient(username='patient', **fields):
+    from patientapp.models import Patient
+    user = make_user(username, 'patient', first_name=fields.pop('first_name', 'Pat'), last_name=fields.pop('last_name', ''))
+    return Patient.objects.create(user=user, address='addr', mobile='0', symptoms=fields.pop('symptoms', 'cough'), **fields)
+
+
+def bearer(user):
+    """Authorization header value for `user`, as the frontend sends it"""
+    from .views import get_tokens_for_user
+    return f"Bearer {get_tokens_for_user(user)['access']}"
+
+
+def api_client(user):
+    """APIClient authenticating as `user` through the JWT authentication the views use"""
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=bearer(user))
+    return client
+
+
+@override_settings(DOCTOR_DIRECTORY_CACHE_TIMEOUT=0)  # a cached answer would run no queries at all
+class QueryBudgetTestCase(TestCase):
+    """Pins the number of queries of list endpoints over a page of seeded rows.
+
+    budgets maps url -> (role making the request, queries); see commonapp/querybudget.py.
+    An N+1 in a serializer shows up as a count far above the budget.
+    """
+    budgets = {}
+    rows = 8  # seeded records of every kind, within one page
+
+    @classmethod
+    def setUpTestData(cls):
+        from .querybudget import _seed
+        cls.users = _seed(cls.rows)
+
+    def test_query_budgets(self):
+        for url, (role, queries) in self.budgets.items():
+            with self.subTest(url=url):
+                client = APIClient()
+                client.force_authenticate(self.users[role])
+                with self.assertNumQueries(queries):
+                    response = client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.json())
@@ -1,3 +1,656 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import threading
+import uuid
+import zlib
 
-# Create your tests here.
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import connection, connections
+from django.db.utils import OperationalError, load_backend
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from doctorapp import directory
+from doctorapp.models import Doctor
+from hospitalapp.models import Bed
+from patientapp.models import Patient
+
+from . import compression, dbpool, importer, indexadvisor, outbox, renderers, search, storage, thumbnails
+from .pagination import KeysetPagination
+from .authentication import CachedJWTAuthentication, load_principal, principal_cache_key
+from .models import CustomUser, MediaBlob, OutboundEmail
+from .testing import api_client, bearer, make_doctor, make_patient, make_user
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.rollbacks = 0
+
+    def close(self):
+        self.closed = True
+
+    def rollback(self):
+        if self.closed:
+            raise RuntimeError("closed")
+        self.rollbacks += 1
+
+    def cursor(self):
+        if self.closed:
+            raise RuntimeError("closed")
+        return self
+
+    def execute(self, sql):
+        pass
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def pool(self, **options):
+        return dbpool.ConnectionPool(
+            check=dbpool.PooledDatabaseWrapperMixin.pool_check,
+            reset=dbpool.PooledDatabaseWrapperMixin.pool_reset,
+            **{'timeout': 0.2, 'check_interval': 0, **options},
+        )
+
+    def test_reuses_returned_connections(self):
+        pool = self.pool(max_size=2)
+        first = pool.getconn(FakeConnection)
+        pool.putconn(first)
+        self.assertIs(pool.getconn(FakeConnection), first)
+        self.assertEqual(first.rollbacks, 1)
+        stats = pool.stats()
+        self.assertEqual((stats['connects'], stats['checkouts'], stats['active'], stats['idle']), (1, 2, 1, 0))
+
+    def test_waits_then_times_out_when_exhausted(self):
+        pool = self.pool(max_size=1)
+        held = pool.getconn(FakeConnection)
+        with self.assertRaises(dbpool.PoolTimeout):
+            pool.getconn(FakeConnection)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+        threading.Timer(0.05, pool.putconn, [held]).start()
+        self.assertIs(pool.getconn(FakeConnection), held)
+        self.assertGreater(pool.stats()['wait_ms']['max'], 0)
+
+    def test_drops_connections_failing_the_health_check(self):
+        pool = self.pool(max_size=1)
+        dead = pool.getconn(FakeConnection)
+        pool.putconn(dead)
+        dead.closed = True
+        fresh = pool.getconn(FakeConnection)
+        self.assertIsNot(fresh, dead)
+        stats = pool.stats()
+        self.assertEqual((stats['failed_checks'], stats['size']), (1, 1))
+
+    def test_discard_frees_the_slot(self):
+        pool = self.pool(max_size=1)
+        connection = pool.getconn(FakeConnection)
+        pool.putconn(connection, discard=True)
+        self.assertTrue(connection.closed)
+        self.assertIsNot(pool.getconn(FakeConnection), connection)
+
+
+class PooledBackendTests(SimpleTestCase):
+    """The SQLite stand-in backend, on a throwaway file database"""
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        self.alias = f'pool_test_{id(self)}'
+        self.addCleanup(dbpool.close_pool, self.alias)
+        self.settings_dict = {
+            **connections['default'].settings_dict,
+            'ENGINE': 'commonapp.backends.sqlite3', 'NAME': self.path, 'CONN_MAX_AGE': 0,
+            'POOL': {'max_size': 1, 'timeout': 0.2},
+        }
+
+    def wrapper(self):
+        return load_backend(self.settings_dict['ENGINE']).DatabaseWrapper(self.settings_dict, self.alias)
+
+    def test_close_hands_the_connection_to_the_next_request(self):
+        first, second = self.wrapper(), self.wrapper()
+        first.ensure_connection()
+        raw = first.connection
+        with self.assertRaises(OperationalError):
+            second.ensure_connection()  # the only connection is checked out
+        first.close()
+        second.ensure_connection()
+        self.assertIs(second.connection, raw)
+        second.close()
+        self.assertEqual(dbpool.stats()[self.alias]['connects'], 1)
+
+    def test_connection_closed_inside_atomic_is_not_reused(self):
+        first = self.wrapper()
+        with first.cursor():
+            pass
+        raw = first.connection
+        first.set_autocommit(False)
+        first.in_atomic_block = True
+        first.close()
+        first.in_atomic_block = False
+        first.closed_in_transaction = False
+        first.connection = None
+        second = self.wrapper()
+        second.ensure_connection()
+        self.assertIsNot(second.connection, raw)
+        second.close()
+
+
+class FlakyEmailBackend(EmailBackend):
+    """locmem backend refusing mail to bad@example.com"""
+
+    def send_messages(self, messages):
+        if any('bad@example.com' in message.to for message in messages):
+            raise OSError("mailbox unavailable")
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='commonapp.tests.FlakyEmailBackend')
+class OutboxTests(TestCase):
+
+    def queue(self, to='good@example.com'):
+        return OutboundEmail.queue('Activate', 'link', [to])
+
+    def test_sends_and_backs_off_per_message(self):
+        good, bad = self.queue(), self.queue('bad@example.com')
+        self.assertEqual(outbox.deliver_pending(), (1, 1))
+        good.refresh_from_db()
+        bad.refresh_from_db()
+        self.assertEqual((good.status, good.attempts), ('sent', 1))
+        self.assertEqual((bad.status, bad.attempts, bad.last_error), ('pending', 1, 'mailbox unavailable'))
+        self.assertGreater(bad.next_attempt_at, timezone.now())
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_gives_up_after_max_attempts(self):
+        bad = self.queue('bad@example.com')
+        OutboundEmail.objects.filter(pk=bad.pk).update(attempts=4)
+        outbox.deliver_pending(max_attempts=5)
+        bad.refresh_from_db()
+        self.assertEqual((bad.status, bad.attempts), ('failed', 5))
+
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend', EMAIL_HOST='127.0.0.1', EMAIL_PORT=1,
+                       EMAIL_USE_TLS=False, EMAIL_TIMEOUT=2)
+    def test_unreachable_server_records_the_attempt(self):
+        email = self.queue()
+        self.assertEqual(outbox.deliver_pending(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('pending', 1))
+        self.assertTrue(email.last_error)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+
+    def test_claimed_rows_are_skipped_until_their_lease_expires(self):
+        email = self.queue()
+        self.assertEqual(outbox.claim_batch(), [email])
+        self.assertEqual(outbox.claim_batch(), [])  # another worker's claim
+
+        OutboundEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(outbox.deliver_pending(), (1, 0))  # its worker died; reclaimed
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('sent', 2))
+
+
+class ImportAccountsTests(TestCase):
+
+    def run_import(self, *rows):
+        lines = '\n'.join(json.dumps(row) for row in rows)
+        errors = []
+        counts = importer.import_accounts(
+            importer.read_rows(io.StringIO(lines), 'jsonl'), workers=0, on_chunk=lambda last, chunk: errors.extend(chunk)
+        )
+        return counts, errors
+
+    def account(self, username, **fields):
+        return {'username': username, 'email': f'{username}@example.com', 'password': 'pw-test-123',
+                'first_name': 'A', 'last_name': 'B', 'user_type': 'patient', 'mobile': '1', **fields}
+
+    def test_imports_doctors_and_patients(self):
+        counts, errors = self.run_import(self.account('p1', date_of_birth='1990-01-02'), self.account('d1', user_type='Doctor'))
+        self.assertEqual((counts, errors), ((2, 0), []))
+        self.assertEqual(CustomUser.objects.get(username='d1').doctor.status, True)
+        self.assertEqual(str(CustomUser.objects.get(username='p1').patient.date_of_birth), '1990-01-02')
+
+    def test_imported_doctors_start_a_new_directory_version(self):
+        cache.clear()
+        version = directory.roster_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run_import(self.account('p1'))
+        self.assertEqual(directory.roster_version(), version)  # patients aren't in the directory
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run_import(self.account('d1', user_type='doctor'))
+        self.assertNotEqual(directory.roster_version()['token'], version['token'])
+
+    def test_non_text_values_are_row_errors(self):
+        counts, errors = self.run_import(
+            self.account('p1', user_type=1), self.account('p2', date_of_birth=19900102), self.account('p3'), [1, 2],
+        )
+        self.assertEqual(counts, (1, 3))
+        self.assertEqual(errors, [
+            (1, 'p1', 'user_type must be text'), (2, 'p2', 'date_of_birth must be text'), (4, '', 'row is not an object'),
+        ])
+
+    def test_rows_the_database_refuses_are_row_errors(self):
+        hash_passwords = importer._hash_passwords
+
+        def taken_meanwhile(passwords, pool):
+            make_user('p2', 'patient')  # created after the chunk's clash check
+            return hash_passwords(passwords, pool)
+
+        with mock.patch.object(importer, '_hash_passwords', taken_meanwhile):
+            counts, errors = self.run_import(self.account('p1'), self.account('p2'), self.account('p3'))
+        self.assertEqual(counts, (2, 1))
+        self.assertEqual([error[:2] for error in errors], [(2, 'p2')])
+        self.assertEqual(set(CustomUser.objects.values_list('username', flat=True)), {'p1', 'p2', 'p3'})
+
+
+class MediaBlobTests(TestCase):
+    """Identical pictures are stored once and refcounted; unreferenced blobs get collected"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.first, self.second = make_doctor('first'), make_doctor('second')
+
+    def set_picture(self, doctor, data):
+        doctor.profile_pic.save('avatar.png', ContentFile(data))  # saves the doctor too
+
+    def refcounts(self):
+        return dict(MediaBlob.objects.values_list('name', 'refcount'))
+
+    def test_identical_pictures_share_a_blob(self):
+        self.set_picture(self.first, b'same bytes')
+        self.set_picture(self.second, b'same bytes')
+        self.assertEqual(self.first.profile_pic.name, self.second.profile_pic.name)
+        self.assertTrue(storage.is_blob(self.first.profile_pic.name))
+        self.assertEqual(self.refcounts(), {self.first.profile_pic.name: 2})
+
+    def test_replacing_and_deleting_move_the_counts(self):
+        self.set_picture(self.first, b'same bytes')
+        self.set_picture(self.second, b'same bytes')
+        shared = self.first.profile_pic.name
+        self.set_picture(self.second, b'other bytes')
+        self.assertEqual(self.refcounts(), {shared: 1, self.second.profile_pic.name: 1})
+        self.first.delete()
+        self.assertEqual(self.refcounts()[shared], 0)
+        self.assertEqual(storage.recount(), 0)  # the signals kept them exact
+
+    def test_collects_only_unreferenced_blobs_past_the_grace_period(self):
+        self.set_picture(self.first, b'kept')
+        self.set_picture(self.second, b'dropped')
+        kept, dropped = self.first.profile_pic.name, self.second.profile_pic.name
+        self.second.profile_pic = None
+        self.second.save()
+
+        self.assertEqual(storage.collect_garbage(timezone.now() - timedelta(hours=1)), [])  # within the grace period
+        with self.captureOnCommitCallbacks(execute=True):
+            removed = storage.collect_garbage(timezone.now() + timedelta(seconds=1))
+        self.assertEqual([name for name, _ in removed], [dropped])
+        self.assertFalse(storage.profile_pic_storage().exists(dropped))
+        self.assertTrue(storage.profile_pic_storage().exists(kept))
+
+    def test_recount_repairs_drift(self):
+        self.set_picture(self.first, b'same bytes')
+        MediaBlob.objects.update(refcount=5)
+        self.assertEqual(storage.recount(), 1)
+        self.assertEqual(self.refcounts(), {self.first.profile_pic.name: 1})
+
+
+class PrincipalCacheTests(TestCase):
+    """CachedJWTAuthentication skips the user query, and saves invalidate what it cached"""
+
+    def setUp(self):
+        self.user = make_user('someone', 'patient')
+        self.authorization = bearer(self.user)
+
+    def authenticate(self):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=self.authorization)
+        return CachedJWTAuthentication().authenticate(request)[0]
+
+    def test_cached_principal_needs_no_query(self):
+        with self.assertNumQueries(1):
+            self.authenticate()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+            self.assertEqual((user.pk, user.user_type), (self.user.pk, 'patient'))
+            self.assertIsNone(getattr(user, 'patient', None))
+
+    def test_deactivation_applies_to_the_next_request(self):
+        client = api_client(self.user)
+        self.assertEqual(client.get('/api/patient/invoices/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(client.get('/api/patient/invoices/').status_code, 401)
+
+    def test_new_role_row_shows_up(self):
+        self.authenticate()
+        from patientapp.models import Patient
+        patient = Patient.objects.create(user=self.user, address='a', mobile='0', symptoms='s')
+        self.assertEqual(self.authenticate().patient.pk, patient.pk)
+
+    def test_entry_cached_before_the_commit_is_dropped_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+            cache.set(principal_cache_key(self.user.pk), {**load_principal(self.user.pk), 'is_active': True})
+        self.assertIsNone(cache.get(principal_cache_key(self.user.pk)))
+
+
+class ThumbnailTests(TestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name, THUMBNAIL_SIZES=(16, 32)))
+        self.doctor = make_doctor()
+        self.set_picture('red')
+
+    def set_picture(self, color):
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 48), color).save(buffer, 'PNG')
+        self.doctor.profile_pic.save('avatar.png', ContentFile(buffer.getvalue()))
+
+    def test_makes_and_records_thumbnails(self):
+        self.assertEqual(thumbnails.make_pending(), (1, 0))
+        self.doctor.refresh_from_db()
+        self.assertEqual(self.doctor.thumbnails_source, self.doctor.profile_pic.name)
+        self.assertEqual(sorted(self.doctor.profile_pic_thumbnails), ['16', '32'])
+        self.assertIsNone(self.doctor.thumbnails_claimed_at)
+        self.assertFalse(thumbnails.pending(type(self.doctor)).exists())
+
+    def test_claimed_rows_are_skipped_until_their_lease_expires(self):
+        model = type(self.doctor)
+        self.assertEqual(thumbnails.claim_batch(model), [self.doctor])
+        self.assertEqual(thumbnails.claim_batch(model), [])  # another worker's claim
+        model.objects.update(thumbnails_claimed_at=timezone.now() - thumbnails.CLAIM_LEASE - timedelta(seconds=1))
+        self.assertEqual(thumbnails.make_pending(), (1, 0))  # its worker died; reclaimed
+
+    def test_picture_replaced_while_rendering(self):
+        render = thumbnails.render_variants
+
+        def render_then_replace(name):
+            variants = render(name)
+            self.set_picture('blue')  # uploaded while the worker renders, outside any lock
+            return variants
+
+        first = self.doctor.profile_pic.name
+        with mock.patch.object(thumbnails, 'render_variants', render_then_replace):
+            thumbnails.make_pending()
+        self.doctor.refresh_from_db()
+        self.assertNotEqual(self.doctor.profile_pic.name, first)
+        self.assertEqual((self.doctor.thumbnails_source, self.doctor.thumbnails_claimed_at), ('', None))
+
+        self.assertEqual(thumbnails.make_pending(), (1, 0))  # the new picture is picked up right away
+        self.doctor.refresh_from_db()
+        self.assertEqual(self.doctor.thumbnails_source, self.doctor.profile_pic.name)
+
+
+class KeysetPaginationTests(TestCase):
+    """Cursor pages over (appointment_date, id), with several rows sharing a date"""
+
+    def setUp(self):
+        from doctorapp.models import Appointment
+        self.patient = make_patient()
+        doctors = [make_doctor(f'doctor{n}') for n in range(3)]
+        start = (timezone.now() + timedelta(days=1)).replace(microsecond=0)
+        # three appointments at each of three times, one per doctor
+        self.appointments = [
+            Appointment.objects.create(patient=self.patient, doctor=doctor, appointment_date=start + timedelta(hours=hour))
+            for hour in range(3) for doctor in doctors
+        ]
+        self.ordered = sorted(self.appointments, key=lambda a: (a.appointment_date, a.pk))
+
+    def test_after_follows_the_ordering(self):
+        from doctorapp.models import Appointment
+        rows = Appointment.objects.all()
+        middle = self.ordered[4]
+        for ordering, reverse, expected in (
+            (('appointment_date', 'id'), False, self.ordered[5:]),
+            (('appointment_date', 'id'), True, self.ordered[:4]),
+            (('-appointment_date', '-id'), False, self.ordered[:4]),
+            (('-appointment_date', '-id'), True, self.ordered[5:]),
+        ):
+            with self.subTest(ordering=ordering, reverse=reverse):
+                condition = KeysetPagination(ordering).after([middle.appointment_date, middle.pk], reverse)
+                self.assertEqual(set(rows.filter(condition)), set(expected))
+
+    def test_next_and_previous_round_trip(self):
+        client = api_client(self.patient.user)
+        url, pages = '/api/doctor/appointments/?page_size=2', []
+        while url:
+            data = client.get(url).json()
+            pages.append([row['id'] for row in data['results']])
+            url = data['next']
+        self.assertEqual([pk for page in pages for pk in page], [a.pk for a in self.ordered])
+        self.assertEqual(len(pages), 5)
+
+        url, back = data['previous'], []
+        while url:
+            data = client.get(url).json()
+            back.append([row['id'] for row in data['results']])
+            url = data['previous']
+        self.assertEqual(back, pages[-2::-1])
+
+    def test_invalid_cursor_is_404(self):
+        response = api_client(self.patient.user).get('/api/doctor/appointments/?cursor=bm90LWEtY3Vyc29y')
+        self.assertEqual(response.status_code, 404)
+
+    def test_doctor_appointments_walks_every_page(self):
+        client = api_client(self.appointments[0].doctor.user)
+        first = client.get('/api/doctor/appointments/doctor_appointments/?page_size=2').json()
+        second = client.get(first['next']).json()
+        self.assertEqual(
+            [row['id'] for row in first['results'] + second['results']],
+            [a.pk for a in self.ordered if a.doctor_id == self.appointments[0].doctor_id],
+        )
+        self.assertIsNone(second['next'])
+
+
+class SearchTests(TestCase):
+    """Ranked, typo tolerant search (pg_trgm on PostgreSQL, FTS5 trigram tables on SQLite)"""
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and not search._fts_table(Doctor):
+            self.skipTest("this SQLite has no FTS5 trigram tokenizer (3.34+); search uses icontains")
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.skipTest("icontains only on this backend")
+        self.maria = make_patient('maria', first_name='Maria', last_name='Gonzalez')
+        self.mario = make_patient('mario', first_name='Mario', last_name='Gonzales')
+        self.bob = make_patient('bob', first_name='Bob', last_name='Stone', symptoms='fever')
+        self.cardiologist = make_doctor('heart', department='Cardiologist')
+        self.surgeon = make_doctor('surgeon', department='Colon and Rectal Surgeons')
+
+    def find(self, model, term):
+        return list(search.search(model.objects.all(), term).values_list('pk', flat=True))
+
+    def test_best_match_first(self):
+        self.assertEqual(self.find(Patient, 'maria gonzalez'), [self.maria.pk, self.mario.pk])
+        self.assertEqual(self.find(Patient, 'Gonzales')[0], self.mario.pk)
+
+    def test_misspellings_still_match(self):
+        self.assertEqual(self.find(Doctor, 'cardiolgist'), [self.cardiologist.pk])
+        self.assertEqual(set(self.find(Patient, 'gonzalex')), {self.maria.pk, self.mario.pk})
+        self.assertEqual(self.find(Patient, 'feverr'), [self.bob.pk])
+        self.assertEqual(self.find(Patient, 'zzzz'), [])
+
+    def test_scoped_to_the_queryset(self):
+        scope = Patient.objects.exclude(pk=self.maria.pk)
+        self.assertEqual(list(search.search(scope, 'maria gonzalez').values_list('pk', flat=True)), [self.mario.pk])
+
+    def test_saves_reindex(self):
+        self.surgeon.department = 'Emergency Medicine Specialists'
+        self.surgeon.save()
+        self.assertEqual(self.find(Doctor, 'emergency'), [self.surgeon.pk])
+        self.assertEqual(self.find(Doctor, 'surgeons'), [])
+
+        user = self.bob.user
+        user.last_name = 'Rivers'
+        user.save()
+        self.assertEqual(self.find(Patient, 'rivers'), [self.bob.pk])
+        self.assertEqual(self.find(Patient, 'stone'), [])
+
+        self.bob.delete()
+        self.assertEqual(self.find(Patient, 'rivers'), [])
+
+    def test_search_doctors_endpoint(self):
+        response = api_client(self.maria.user).get('/api/patient/profile/search_doctors/?search=surgons')
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.surgeon.pk])
+
+
+class SearchFallbackTests(TestCase):
+    """Without the FTS tables (SQLite before 3.34), search is a plain icontains filter"""
+
+    def setUp(self):
+        self.enterContext(mock.patch.object(search, '_fts_table', return_value=None))
+        self.enterContext(mock.patch.object(connection, 'vendor', 'sqlite'))
+        self.patient = make_patient(first_name='Maria', last_name='Gonzalez')
+
+    def test_substring_matches_but_typos_dont(self):
+        patients = Patient.objects.all()
+        self.assertEqual(list(search.search(patients, 'gonz')), [self.patient])
+        self.assertEqual(list(search.search(patients, 'gonzalex')), [])
+        self.assertEqual(list(search.search(patients, '  ')), [self.patient])
+
+
+@skipUnless(renderers.orjson, "orjson is not installed")
+class ORJSONRendererTests(SimpleTestCase):
+    """ORJSONRenderer writes what DRF's JSONRenderer writes; ORJSONParser reads it back"""
+
+    data = {
+        'amount': Decimal('10.50'),
+        'at': datetime(2025, 1, 2, 3, 4, 5, 600000, tzinfo=dt_timezone.utc),
+        'day': date(2025, 1, 2),
+        'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'text': 'line\u2028separated\u2029paragraph é',
+        'nested': [{'n': 1, 'none': None, 'ok': True}],
+        1: 'int key',
+    }
+
+    def test_same_json_as_drf(self):
+        ours, drf = renderers.ORJSONRenderer().render(self.data), JSONRenderer().render(self.data)
+        self.assertEqual(json.loads(ours), json.loads(drf))
+        self.assertEqual(json.loads(ours)['at'], '2025-01-02T03:04:05.600000Z')
+        self.assertEqual(json.loads(ours)['amount'], 10.5)
+        self.assertIn(b'\\u2028', ours)  # escaped like DRF, not the raw separator
+        self.assertNotIn('\u2028'.encode(), ours)
+
+    def test_falls_back_to_drf(self):
+        renderer = renderers.ORJSONRenderer()
+        self.assertEqual(renderer.render({'big': 2 ** 70}), JSONRenderer().render({'big': 2 ** 70}))
+        indented = renderer.render({'a': 1}, 'application/json; indent=2')
+        self.assertEqual(indented, JSONRenderer().render({'a': 1}, 'application/json; indent=2'))
+        self.assertEqual(renderer.render(None), b'')
+
+    def test_parser_round_trip(self):
+        parsed = renderers.ORJSONParser().parse(io.BytesIO(renderers.dumps(self.data)))
+        self.assertEqual(parsed['text'], self.data['text'])
+        self.assertEqual(parsed['1'], 'int key')
+        with self.assertRaises(ParseError):
+            renderers.ORJSONParser().parse(io.BytesIO(b'{"a": NaN'))
+
+
+class CompressionTests(SimpleTestCase):
+
+    def process(self, response, accept_encoding='gzip'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return compression.CompressionMiddleware(lambda request: response)(request)
+
+    def json_response(self, size=4096, **headers):
+        return HttpResponse(b'{"data": "' + b'x' * size + b'"}', content_type='application/json', headers=headers)
+
+    def test_choose_encoding(self):
+        with mock.patch.object(compression, 'brotli', mock.Mock()):  # br offered
+            cases = [
+                ('gzip, br', 'br'), ('br;q=0.5, gzip', 'gzip'), ('br;q=0, gzip;q=0.1', 'gzip'),
+                ('*', 'br'), ('*;q=0.5, br;q=0', 'gzip'), ('gzip;q=0, *', 'br'), ('gzip;q=0, br;q=0', None),
+                ('identity', None), ('', None), ('GZIP;Q=0.8', 'gzip'), ('gzip;q=nonsense', None),
+            ]
+            for header, expected in cases:
+                with self.subTest(header=header):
+                    self.assertEqual(compression.choose_encoding(header), expected)
+        with mock.patch.object(compression, 'brotli', None):
+            self.assertEqual(compression.choose_encoding('br'), None)
+            self.assertEqual(compression.choose_encoding('*'), 'gzip')
+
+    def test_compresses_large_bodies(self):
+        original = self.json_response()
+        body = original.content
+        response = self.process(original)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(zlib.decompress(response.content, 16 + zlib.MAX_WBITS), body)
+
+    def test_strong_etag_becomes_weak(self):
+        self.assertEqual(self.process(self.json_response(ETag='"v1"'))['ETag'], 'W/"v1"')
+        self.assertEqual(self.process(self.json_response(ETag='W/"v1"'))['ETag'], 'W/"v1"')
+        self.assertEqual(self.process(self.json_response(ETag='"v1"'), 'identity')['ETag'], '"v1"')
+
+    def test_passes_through(self):
+        small = self.json_response(size=10)
+        self.assertEqual(small.content, self.process(small).content)
+        self.assertFalse(small.has_header('Content-Encoding'))
+
+        stream = StreamingHttpResponse(iter([b'x' * 4096]), content_type='text/csv')
+        self.assertIs(self.process(stream), stream)
+        self.assertFalse(stream.has_header('Content-Encoding'))
+
+        image = HttpResponse(b'x' * 4096, content_type='image/png')
+        self.assertFalse(self.process(image).has_header('Content-Encoding'))
+        self.assertFalse(self.process(self.json_response(), 'identity').has_header('Content-Encoding'))
+
+    def test_threshold_setting(self):
+        with self.settings(RESPONSE_COMPRESSION_MIN_BYTES=10 ** 6):
+            self.assertFalse(self.process(self.json_response()).has_header('Content-Encoding'))
+
+
+class IndexAdvisorTests(TestCase):
+    """advise_indexes flags a filter no index serves, and is quiet once one does"""
+
+    url = ('/api/hospital/beds/available_beds/?ward=Emergency', 'doctor')
+
+    def proposals(self):
+        return indexadvisor.propose(indexadvisor.explain(indexadvisor.capture([self.url], rows=5)))
+
+    def test_proposes_an_index_for_an_unindexed_filter(self):
+        self.assertEqual(self.proposals(), [])
+        with connection.cursor() as cursor:  # rolled back with the test
+            cursor.execute('DROP INDEX bed_ward_occupied_idx')
+            cursor.execute('DROP INDEX bed_free_idx')
+
+        proposals = self.proposals()
+        self.assertEqual([(p.model, p.fields, p.condition) for p in proposals], [(Bed, ['ward'], {'is_occupied': False})])
+        self.assertEqual(proposals[0].seen_in, {self.url[0]})
+
+        with connection.cursor() as cursor:
+            cursor.execute(str(proposals[0].index().create_sql(Bed, connection.schema_editor())))
+        self.assertEqual(self.proposals(), [])
+
+    def test_command(self):
+        self.enterContext(mock.patch.object(indexadvisor, 'routes', return_value=[self.url]))
+        out = io.StringIO()
+        call_command('advise_indexes', '--rows=5', '--fail-on-scan', stdout=out)
+        self.assertIn('No index to propose', out.getvalue())
+
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX bed_ward_occupied_idx')
+            cursor.execute('DROP INDEX bed_free_idx')
+        out = io.StringIO()
+        with self.assertRaisesMessage(CommandError, '1 index(es) proposed'):
+            call_command('advise_indexes', '--rows=5', '--fail-on-scan', stdout=out)
+        self.assertIn("hospitalapp.Bed: models.Index(fields=['ward'], condition=models.Q(is_occupied=False), name='bed_ward_pidx')", out.getvalue())
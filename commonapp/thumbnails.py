@@ -0,0 +1,144 @@
+"""Profile picture thumbnails, made outside the request by `manage.py make_thumbnails`.
+
+An upload only stores the original. A Doctor/Patient row whose profile_pic differs from
+its thumbnails_source is pending (a partial index keeps finding them cheap). A worker claims
+a batch by stamping thumbnails_claimed_at in a short transaction (skip_locked, so several
+workers can run side by side), renders a WebP per size to thumbnails/<original path>/<size>.webp
+with no transaction open, then records them in profile_pic_thumbnails unless the picture
+changed meanwhile. Until then srcset() falls back to the original for every size.
+"""
+import logging
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .storage import is_blob
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = 'thumbnails'
+
+# how long a claimed row stays reserved for its worker; rows of a worker that died mid-batch
+# are picked up again once this has passed
+CLAIM_LEASE = timedelta(minutes=10)
+
+
+def sizes():
+    return getattr(settings, 'THUMBNAIL_SIZES', (64, 128, 256))
+
+
+def thumbnail_models():
+    from doctorapp.models import Doctor
+    from patientapp.models import Patient
+    return [Doctor, Patient]
+
+
+def render_variants(name):
+    """{"<size>": storage path} of the WebP thumbnails written for the image at `name`"""
+    with default_storage.open(name, 'rb') as f:
+        image = Image.open(f)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    variants = {}
+    for size in sorted(sizes()):
+        variant = image.copy()
+        variant.thumbnail((size, size), Image.LANCZOS)  # keeps the aspect ratio, never upscales
+        buffer = BytesIO()
+        variant.save(buffer, 'WEBP', quality=80, method=4)
+        path = f"{CACHE_DIR}/{name}/{size}.webp"
+        if default_storage.exists(path):
+            default_storage.delete(path)
+        variants[str(size)] = default_storage.save(path, ContentFile(buffer.getvalue()))
+    return variants
+
+
+def pending(model):
+    # the condition of the <model>_thumbnails_pending_idx partial indexes
+    return model.objects.filter(Q(profile_pic__gt='') & ~Q(profile_pic=F('thumbnails_source')))
+
+
+def _delete_files(paths):
+    for path in paths:
+        try:
+            default_storage.delete(path)
+        except OSError:
+            pass
+
+
+def claim_batch(model, batch_size=20):
+    """Pending rows of `model` not claimed by a live worker, stamped as claimed and committed"""
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            pending(model).select_for_update(skip_locked=True)
+            .filter(Q(thumbnails_claimed_at__isnull=True) | Q(thumbnails_claimed_at__lt=now - CLAIM_LEASE))
+            .only('pk', 'profile_pic', 'thumbnails_source', 'profile_pic_thumbnails')
+            .order_by('pk')[:batch_size]
+        )
+        model.objects.filter(pk__in=[row.pk for row in rows]).update(thumbnails_claimed_at=now)
+    return rows
+
+
+def _record(model, pk, source, variants):
+    """Save the thumbnails of `source`; False (nothing saved) if the row has another picture by now"""
+    with transaction.atomic():
+        row = model.objects.select_for_update().filter(pk=pk, profile_pic=source).first()
+        if row is None:
+            model.objects.filter(pk=pk).update(thumbnails_claimed_at=None)  # pending again, for the new picture
+            return False
+        row.profile_pic_thumbnails = variants
+        row.thumbnails_source = source
+        row.thumbnails_claimed_at = None
+        row.save(update_fields=['profile_pic_thumbnails', 'thumbnails_source', 'thumbnails_claimed_at'])
+    return True
+
+
+def make_pending(batch_size=20):
+    """Thumbnail one batch of pending rows per model; returns (made, failed) counts"""
+    made = failed = 0
+    for model in thumbnail_models():
+        for row in claim_batch(model, batch_size):
+            source = row.profile_pic.name
+            try:
+                variants = render_variants(source)
+            except Exception as e:
+                # not an image we can read; leave the original in place and don't retry it
+                logger.warning("Thumbnails failed for %s %s (%s): %s", model.__name__, row.pk, source, e)
+                variants = {}
+                failed += 1
+            else:
+                made += 1
+            if _record(model, row.pk, source, variants):
+                old_files = set(row.profile_pic_thumbnails.values()) - set(variants.values())
+                old_source = row.thumbnails_source
+            else:
+                old_files, old_source = set(variants.values()), source  # made for a picture already replaced
+            # a shared blob's thumbnails may still serve other rows; gc_media_blobs removes them
+            if not is_blob(old_source):
+                _delete_files(old_files)
+    return made, failed
+
+
+def srcset(request, field_file, thumbnails, source):
+    """{"64": url, "128": url, "256": url, "original": url}, every size the original until made"""
+    if not field_file:
+        return None
+    build = request.build_absolute_uri if request else (lambda url: url)
+    original = build(field_file.url)
+    ready = source == field_file.name
+    variants = {
+        str(size): build(default_storage.url(thumbnails[str(size)])) if ready and str(size) in thumbnails else original
+        for size in sorted(sizes())
+    }
+    variants['original'] = original
+    return variants
@@ -1,11 +1,13 @@
 from django.urls import path
-from .views import SignupView, LoginView, LogoutView, ActivateAccountView
+from .views import SignupView, LoginView, LogoutView, ActivateAccountView, ImportAccountsView, ConnectionPoolStatsView
 
 urlpatterns = [
     path('signup/', SignupView.as_view(), name='signup'),
     path('login/', LoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('activate/<str:activation_token>/', ActivateAccountView.as_view(), name='activate_account'),
+    path('import/', ImportAccountsView.as_view(), name='import_accounts'),
+    path('db_pool/', ConnectionPoolStatsView.as_view(), name='db_pool_stats'),
 ]
 
 
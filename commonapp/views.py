@@ -1,5 +1,4 @@
 from django.contrib.auth import authenticate, login, logout
-from django.core.mail import send_mail
 from django.conf import settings
 # from django.utils import timezone
 from django.db import transaction
@@ -9,7 +8,7 @@ from django.http import JsonResponse
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 # from rest_framework.authentication import TokenAuthentication
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -17,11 +16,37 @@ from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
 from django.contrib.auth.models import User
-from .models import CustomUser, Profile
+from .models import CustomUser, Profile, OutboundEmail
 from .serializers import UserSerializer
+from .importer import import_accounts, read_rows
+from . import dbpool
 from doctorapp.models import Doctor
 from patientapp.models import Patient
 from django.contrib.auth import logout as auth_logout
+from contextlib import contextmanager
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LoginTimer:
+    """Wall time of the login phases (db, hash, token), summed per phase"""
+
+    def __init__(self):
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + time.perf_counter() - start
+
+    def server_timing(self):
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.phases.items())
 
 def get_tokens_for_user(user):
     """Generate JWT tokens for a user"""
@@ -67,13 +92,11 @@ class SignupView(APIView):
                 # activation_link = f"{settings.FRONTEND_URL}/api/activate/{activation_token}"
                 activation_link = f"http://localhost:8000/api/activate/{activation_token}/"
 
-                # Send activation email
-                send_mail(
+                # Queue activation email, it commits with the user and `manage.py send_outbox_emails` sends it
+                OutboundEmail.queue(
                     'Activate Your Account',
                     f'Click this link to activate your account: {activation_link}',
-                    settings.DEFAULT_FROM_EMAIL,
                     [user.email],
-                    fail_silently=False,
                 )
 
                 return Response(
@@ -140,8 +163,11 @@ class LoginView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Use CustomUser model for authentication
-        user = CustomUser.objects.filter(username=username).first()
+        timer = LoginTimer()
+
+        # Use CustomUser model for authentication (profile comes in the same query for the image below)
+        with timer.phase('db'):
+            user = CustomUser.objects.filter(username=username).select_related('profile').first()
 
         if not user:
             return Response(
@@ -149,8 +175,10 @@ class LoginView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Check password
-        if not user.check_password(password):
+        # Check password (re-encodes and saves the hash if the hashing profile changed since it was set)
+        with timer.phase('hash'):
+            password_ok = user.check_password(password)
+        if not password_ok:
             return Response(
                 {'error': 'Invalid credentials'}, 
                 status=status.HTTP_400_BAD_REQUEST
@@ -163,7 +191,8 @@ class LoginView(APIView):
             )
         
         # Generate JWT tokens
-        tokens = get_tokens_for_user(user)
+        with timer.phase('token'):
+            tokens = get_tokens_for_user(user)
 
         # Get profile image URL
         image_url = None
@@ -173,7 +202,8 @@ class LoginView(APIView):
         except Exception:
             pass
 
-        return Response({
+        logger.debug("login %s: %s", user.username, timer.server_timing())
+        response = Response({
             'message': 'Login successful!',
             'username': user.username,
             'email': user.email,
@@ -182,6 +212,9 @@ class LoginView(APIView):
             'access': tokens['access'],
             'refresh': tokens['refresh'],
         }, status=status.HTTP_200_OK)
+        if settings.LOGIN_SERVER_TIMING:
+            response['Server-Timing'] = timer.server_timing()
+        return response
     
 
 class LogoutView(APIView):
@@ -203,4 +236,39 @@ class LogoutView(APIView):
             return Response({"error": "Logout failed", "details": str(e)}, status=400)
 
 
+class ImportAccountsView(APIView):
+    """Bulk import doctors/patients from an uploaded CSV or JSONL file (admin only)"""
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminUser]
+    parser_classes = (MultiPartParser, FormParser)
+    MAX_REPORTED_ERRORS = 100
+
+    def post(self, request):#/api/import/ (multipart: file=<accounts.csv|.jsonl>)
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({"error": "file is required"}, status=status.HTTP_400_BAD_REQUEST)
+        fmt = 'jsonl' if upload.name.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+        reported = []
+
+        def on_chunk(last_row, errors):
+            reported.extend(errors[:self.MAX_REPORTED_ERRORS - len(reported)])
+
+        # the upload is read line by line (large ones are already spooled to disk by Django); hashing
+        # stays in this worker, a process pool per request would fork the web server
+        imported, failed = import_accounts(read_rows(upload, fmt), workers=0, on_chunk=on_chunk)
+        return Response({
+            "imported": imported,
+            "failed": failed,
+            "errors": [{"row": row, "username": username, "error": error} for row, username, error in reported],
+        }, status=status.HTTP_200_OK)
+
+
+class ConnectionPoolStatsView(APIView):
+    """Database connection pool stats of the worker process answering (admin only)"""
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):#/api/db_pool/
+        return Response({"pid": os.getpid(), "pools": dbpool.stats()}, status=status.HTTP_200_OK)
 
@@ -0,0 +1,31 @@
+"""Async (ASGI) version of DoctorViewsets.dashboard_stats.
+
+Same response as /api/doctor/profile/dashboard_stats/, with the counters row and the
+?breakdown= appointment count read concurrently (see commonapp/asyncviews.py). Served at
+/api/doctor/async/profile/dashboard_stats/.
+"""
+import asyncio
+
+from commonapp.asyncviews import api_view, in_thread, json_response
+from . import stats
+
+
+@api_view('doctor')
+async def dashboard_stats(request):
+    doctor = getattr(request.user, 'doctor', None)  # pk-only instance from the cached principal
+    if doctor is None:
+        return json_response({"error": "Doctor not found"}, status=404)
+
+    breakdown = request.GET.get('breakdown')
+    window = stats.breakdown_window(breakdown) if breakdown else None
+    if breakdown and window is None:
+        return json_response({"error": f"breakdown must be one of {list(stats.BREAKDOWNS)}"}, status=400)
+
+    if window:
+        data, count = await asyncio.gather(
+            in_thread(stats.counters, doctor.pk), in_thread(stats.appointments_between, doctor.pk, *window)
+        )
+        data[f'appointments_{breakdown}'] = count
+    else:
+        data = await in_thread(stats.counters, doctor.pk)
+    return json_response(data)
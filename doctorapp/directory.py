@@ -0,0 +1,132 @@
+"""Response cache for the doctor directory (PatientViewSet.search_doctors, DoctorViewsets.list).
+
+The roster changes a few times a day but is read constantly, so the serialized payload of
+each distinct query is cached under the current roster version. Doctor and CustomUser
+(doctor) saves start a new version (see doctorapp/signals.py), which orphans the old
+entries until they expire.
+
+Responses carry an ETag (roster version + query) and a Last-Modified (when that version
+started), so a client that already has the page gets a 304 without a cache read, a query
+or any serialization. Hit/miss/304 counts are kept in the cache (stats()).
+"""
+import hashlib
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+CACHE_PREFIX = 'doctorapp:directory'
+VERSION_KEY = f'{CACHE_PREFIX}:version'
+COUNTERS = ('hits', 'misses', 'not_modified')
+
+# query parameters matched case-insensitively by the views, so "Cardio" and "cardio" share an entry
+CASE_INSENSITIVE = ('search', 'department')
+
+
+def _timeout():
+    return getattr(settings, 'DOCTOR_DIRECTORY_CACHE_TIMEOUT', 300)
+
+
+def _new_version(previous=None):
+    # whole seconds (what Last-Modified can say), and later than the previous version's, so
+    # If-Modified-Since can't mistake two versions started within the same second
+    modified = timezone.now().replace(microsecond=0)
+    if previous and modified <= previous['modified']:
+        modified = previous['modified'] + timedelta(seconds=1)
+    return {'token': secrets.token_hex(6), 'modified': modified}
+
+
+def roster_version():
+    """{'token', 'modified'} of the current roster, started now if there is none yet"""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _new_version(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate():
+    cache.set(VERSION_KEY, _new_version(cache.get(VERSION_KEY)), None)
+
+
+def normalize(params):
+    """Sorted (name, value) pairs: blanks dropped, ?page=1 same as no page, case folded where the view ignores it"""
+    pairs = []
+    for name in sorted(params):
+        for value in params.getlist(name):
+            value = value.strip()
+            if name in CASE_INSENSITIVE:
+                value = ' '.join(value.casefold().split())
+            if value and not (name == 'page' and value == '1'):
+                pairs.append((name, value))
+    return pairs
+
+
+def _count(counter):
+    key = f'{CACHE_PREFIX}:stats:{counter}'
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass  # evicted in between; the count restarts
+
+
+def stats():
+    counts = {counter: cache.get(f'{CACHE_PREFIX}:stats:{counter}', 0) for counter in COUNTERS}
+    served = sum(counts.values())
+    counts['hit_ratio'] = round((counts['hits'] + counts['not_modified']) / served, 3) if served else None
+    return counts
+
+
+def _not_modified(request, etag, modified):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:  # takes precedence over If-Modified-Since
+        # weak comparison: CompressionMiddleware sends W/"..." with a compressed body
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        return etag in tags or if_none_match.strip() == '*'
+    since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return since is not None and modified.timestamp() <= since
+
+
+def _with_validators(response, etag, modified, outcome):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(modified.timestamp())
+    response['Cache-Control'] = 'private, no-cache'  # per user, and always revalidated
+    response['X-Cache'] = outcome
+    return response
+
+
+def cached_response(request, scope, build):
+    """The directory response for this request: a 304, the cached payload, or build() cached.
+
+    build() returns the Response a cache miss would have sent; only 200s are cached.
+    """
+    if not _timeout():
+        return build()
+    version = roster_version()
+    # payload URLs are absolute, and the browsable API renders the same data differently
+    key_source = repr((scope, request.get_host(), request.accepted_renderer.format, normalize(request.query_params)))
+    digest = hashlib.sha1(key_source.encode()).hexdigest()[:16]
+    etag = f'"{version["token"]}-{digest}"'
+
+    if _not_modified(request, etag, version['modified']):
+        _count('not_modified')
+        return _with_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, version['modified'], 'HIT')
+
+    key = f'{CACHE_PREFIX}:{version["token"]}:{digest}'
+    data = cache.get(key)
+    if data is not None:
+        _count('hits')
+        return _with_validators(Response(data), etag, version['modified'], 'HIT')
+
+    _count('misses')
+    response = build()
+    if response.status_code != status.HTTP_200_OK:
+        return response
+    cache.set(key, response.data, _timeout())
+    return _with_validators(response, etag, version['modified'], 'MISS')
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from doctorapp.models import Doctor, DoctorStats
+from doctorapp.stats import collect_counts
+
+
+class Command(BaseCommand):
+    help = "Recompute DoctorStats counters from the source tables and report (and fix) drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report drift, don't write")
+
+    def handle(self, *args, **options):
+        counts = collect_counts()
+        stored = {row.doctor_id: row for row in DoctorStats.objects.all()}
+        zero = dict.fromkeys(DoctorStats.COUNTERS, 0)
+
+        to_create, to_update, drifted = [], [], 0
+        for doctor_id in Doctor.objects.values_list('id', flat=True).iterator():
+            actual = counts.get(doctor_id, zero)
+            row = stored.get(doctor_id)
+            if row is None:
+                to_create.append(DoctorStats(doctor_id=doctor_id, **actual))
+                self.stdout.write(f"doctor {doctor_id}: missing stats row {actual}")
+                continue
+            drift = {counter: (getattr(row, counter), actual[counter]) for counter in DoctorStats.COUNTERS if getattr(row, counter) != actual[counter]}
+            if drift:
+                drifted += 1
+                self.stdout.write(f"doctor {doctor_id}: " + ", ".join(f"{counter} {old} -> {new}" for counter, (old, new) in drift.items()))
+                for counter in drift:
+                    setattr(row, counter, actual[counter])
+                to_update.append(row)
+
+        if not options['dry_run']:
+            with transaction.atomic():
+                DoctorStats.objects.bulk_create(to_create, batch_size=1000)
+                DoctorStats.objects.bulk_update(to_update, DoctorStats.COUNTERS, batch_size=1000)
+        self.stdout.write(self.style.SUCCESS(
+            f"{drifted} drifted, {len(to_create)} missing" + (" (dry run, nothing written)" if options['dry_run'] else " fixed")
+        ))
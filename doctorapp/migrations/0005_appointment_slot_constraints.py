@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:00
+
+import datetime
+
+import django.db.models.expressions
+import doctorapp.models
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctorapp', '0004_alter_doctor_profile_pic'),
+        ('patientapp', '0003_patient_blood_group_patient_date_of_birth'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(fields=('doctor', 'appointment_date'), name='unique_doctor_appointment_slot'),
+        ),
+        # lets doctor_id (a plain integer) take part in the GiST exclusion constraint; PostgreSQL only
+        BtreeGistExtension(),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=doctorapp.models.PostgreSQLExclusionConstraint(expressions=[('doctor', '='), (doctorapp.models.TsTzRange('appointment_date', django.db.models.expressions.CombinedExpression(models.F('appointment_date'), '+', models.Value(datetime.timedelta(seconds=1800)))), '&&')], name='appointment_no_overlapping_slot'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:01
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+# a frozen copy of doctorapp/slots.py as of this migration, which must not change with that module
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+
+def occupied_bits(appointment_date):
+    """{day: bitmask} of the half hour slots an appointment starting at appointment_date overlaps"""
+    start = timezone.localtime(appointment_date)
+    minutes = start.hour * 60 + start.minute
+    first = minutes // SLOT_MINUTES
+    on_grid = minutes % SLOT_MINUTES == 0 and start.second == 0 and start.microsecond == 0
+    indexes = [first] if on_grid else [first, first + 1]
+
+    bits = {}
+    for index in indexes:
+        day = start.date() + timedelta(days=index // SLOTS_PER_DAY)
+        bits[day] = bits.get(day, 0) | (1 << (index % SLOTS_PER_DAY))
+    return bits
+
+
+def backfill_slot_occupancy(apps, schema_editor):
+    Appointment = apps.get_model('doctorapp', 'Appointment')
+    DoctorSlotOccupancy = apps.get_model('doctorapp', 'DoctorSlotOccupancy')
+
+    bitmaps = {}
+    for doctor_id, appointment_date in Appointment.objects.values_list('doctor_id', 'appointment_date').iterator():
+        for day, bits in occupied_bits(appointment_date).items():
+            bitmaps[(doctor_id, day)] = bitmaps.get((doctor_id, day), 0) | bits
+
+    DoctorSlotOccupancy.objects.bulk_create(
+        [DoctorSlotOccupancy(doctor_id=doctor_id, day=day, occupied=bits) for (doctor_id, day), bits in bitmaps.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctorapp', '0005_appointment_slot_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorSlotOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('occupied', models.BigIntegerField(default=0)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_occupancy', to='doctorapp.doctor')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('doctor', 'day'), name='unique_doctor_slot_day')],
+            },
+        ),
+        migrations.RunPython(backfill_slot_occupancy, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_doctor_stats(apps, schema_editor):
+    Doctor = apps.get_model('doctorapp', 'Doctor')
+    DoctorStats = apps.get_model('doctorapp', 'DoctorStats')
+    sources = {
+        'assigned_patients': (apps.get_model('patientapp', 'Patient'), 'assigned_doctor_id'),
+        'appointments': (apps.get_model('doctorapp', 'Appointment'), 'doctor_id'),
+        'discharged_patients': (apps.get_model('patientapp', 'PatientDischargeDetails'), 'doctor_id'),
+    }
+    stats = {doctor_id: DoctorStats(doctor_id=doctor_id) for doctor_id in Doctor.objects.values_list('id', flat=True)}
+    for counter, (model, attname) in sources.items():
+        for row in model.objects.exclude(**{f'{attname}__isnull': True}).order_by().values(attname).annotate(n=Count('pk')):
+            setattr(stats[row[attname]], counter, row['n'])
+    DoctorStats.objects.bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctorapp', '0006_doctorslotoccupancy'),
+        ('patientapp', '0003_patient_blood_group_patient_date_of_birth'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorStats',
+            fields=[
+                ('doctor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='doctorapp.doctor')),
+                ('assigned_patients', models.PositiveIntegerField(default=0)),
+                ('appointments', models.PositiveIntegerField(default=0)),
+                ('discharged_patients', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_doctor_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctorapp', '0007_doctorstats'),
+        ('patientapp', '0003_patient_blood_group_patient_date_of_birth'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'appointment_date', 'id'], name='appointment_patient_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['doctor', 'date_issued', 'id'], name='prescription_doctor_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['patient', 'date_issued', 'id'], name='prescription_patient_date_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:23
+
+import commonapp.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctorapp', '0010_profile_pic_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='doctor',
+            name='profile_pic',
+            field=models.ImageField(blank=True, null=True, storage=commonapp.storage.profile_pic_storage, upload_to='profile_pics/'),
+        ),
+    ]
@@ -1,6 +1,12 @@
-from django.db import models
+from datetime import timedelta
+
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
+from django.db import DEFAULT_DB_ALIAS, connections, models
 # from django.contrib.auth.models import User
 from commonapp.models import CustomUser  # Use your custom user model
+from commonapp.storage import profile_pic_storage
+from . import slots
 
 departments=[
 ('Cardiologist','Cardiologist'),
@@ -14,11 +20,26 @@ departments=[
 class Doctor(models.Model):
     user=models.OneToOneField(CustomUser,on_delete=models.CASCADE)
     # profile_pic= models.ImageField(upload_to='profile_pics/DoctorProfilePic/',null=True,blank=True)
-    profile_pic = models.ImageField(upload_to='profile_pics/', null=True, blank=True)
+    profile_pic = models.ImageField(upload_to='profile_pics/', storage=profile_pic_storage, null=True, blank=True)
+    # WebP thumbnails of profile_pic {"64": path, ...} and the profile_pic they were made from (commonapp/thumbnails.py)
+    profile_pic_thumbnails = models.JSONField(default=dict, blank=True)
+    thumbnails_source = models.CharField(max_length=100, blank=True, default='')
+    thumbnails_claimed_at = models.DateTimeField(null=True, blank=True)  # a make_thumbnails worker is on it
     address = models.CharField(max_length=40)
     mobile = models.CharField(max_length=20,null=True)
     department= models.CharField(max_length=50,choices=departments,default='Cardiologist')
     status=models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # active doctors of a department (available_slots, search_doctors)
+            models.Index(fields=['department'], condition=models.Q(status=True), name='doctor_active_department_idx'),
+            # rows waiting for thumbnails (commonapp.thumbnails.pending), a handful among all doctors
+            models.Index(
+                fields=['id'], name='doctor_thumbnails_pending_idx',
+                condition=models.Q(profile_pic__gt='') & ~models.Q(profile_pic=models.F('thumbnails_source')),
+            ),
+        ]
  
     @property
     def get_id(self):
@@ -28,16 +49,123 @@ class Doctor(models.Model):
         return "{} ({})".format(self.user.first_name,self.department)
     
 
+class DoctorStats(models.Model):
+    """Dashboard counters of a doctor, kept current by signals (doctorapp/stats.py)"""
+    COUNTERS = ('assigned_patients', 'appointments', 'discharged_patients')
+
+    doctor = models.OneToOneField(Doctor, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    assigned_patients = models.PositiveIntegerField(default=0)
+    appointments = models.PositiveIntegerField(default=0)
+    discharged_patients = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats of doctor {self.doctor_id}"
+
+
+SLOT_LENGTH = timedelta(minutes=30)  # every appointment blocks the doctor for one slot
+
+
+class TsTzRange(models.Func):
+    function = 'TSTZRANGE'
+    output_field = DateTimeRangeField()
+
+
+class PostgreSQLExclusionConstraint(ExclusionConstraint):
+    """ExclusionConstraint that exists on PostgreSQL only; other backends create and check nothing"""
+
+    def constraint_sql(self, model, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().constraint_sql(model, schema_editor)
+
+    def create_sql(self, model, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().create_sql(model, schema_editor)
+
+    def remove_sql(self, model, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().remove_sql(model, schema_editor)
+
+    def validate(self, model, instance, exclude=None, using=DEFAULT_DB_ALIAS):
+        if connections[using].vendor == 'postgresql':
+            super().validate(model, instance, exclude=exclude, using=using)
+
+
+class AppointmentQuerySet(models.QuerySet):
+    def conflicting(self, doctor, appointment_date):
+        """Appointments of this doctor whose slot overlaps a slot starting at appointment_date"""
+        #single range probe on the (doctor, appointment_date) index
+        return self.filter(
+            doctor=doctor,
+            appointment_date__gt=appointment_date - Appointment.SLOT_LENGTH,
+            appointment_date__lt=appointment_date + Appointment.SLOT_LENGTH,
+        )
+
+
 class Appointment(models.Model):
+    SLOT_LENGTH = SLOT_LENGTH
+
     patient = models.ForeignKey('patientapp.Patient', on_delete=models.CASCADE, related_name='appointments')
     doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='appointments')
     appointment_date = models.DateTimeField()
     reason = models.TextField(blank=True, null=True)
     is_completed = models.BooleanField(default=False)
 
+    objects = AppointmentQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            #its btree doubles as the composite (doctor, appointment_date) index used by conflicting().
+            #identical start times can never both commit
+            models.UniqueConstraint(fields=['doctor', 'appointment_date'], name='unique_doctor_appointment_slot'),
+            #on PostgreSQL overlapping (not identical) slots can't either (GiST, needs btree_gist for doctor_id);
+            #other backends rely on the unique constraint + the doctor row lock in AppointmentSerializers
+            PostgreSQLExclusionConstraint(
+                name='appointment_no_overlapping_slot',
+                expressions=[
+                    ('doctor', RangeOperators.EQUAL),
+                    (TsTzRange('appointment_date', models.F('appointment_date') + SLOT_LENGTH), RangeOperators.OVERLAPS),
+                ],
+            ),
+        ]
+        indexes = [
+            # a patient's appointments in keyset order (appointment_date, id)
+            models.Index(fields=['patient', 'appointment_date', 'id'], name='appointment_patient_date_idx'),
+        ]
+
     def __str__(self):
         return f" {self.appointment_date}"
     
+class DoctorSlotOccupancy(models.Model):
+    """Precomputed slot bitmap of one doctor for one day (see doctorapp/slots.py)"""
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='slot_occupancy')
+    day = models.DateField()
+    occupied = models.BigIntegerField(default=0)  # bit i set -> slot i of the day is taken
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['doctor', 'day'], name='unique_doctor_slot_day'),
+        ]
+
+    @classmethod
+    def rebuild(cls, doctor_id, day):
+        """Recompute one day's bitmap from the appointments that can touch it"""
+        start = slots.day_start(day)
+        appointment_dates = Appointment.objects.filter(
+            doctor_id=doctor_id,
+            appointment_date__gt=start - Appointment.SLOT_LENGTH,
+            appointment_date__lt=start + timedelta(days=1),
+        ).values_list('appointment_date', flat=True)
+        bitmap = slots.day_bitmap(appointment_dates, day)
+        if bitmap:
+            cls.objects.update_or_create(doctor_id=doctor_id, day=day, defaults={'occupied': bitmap})
+        else:
+            cls.objects.filter(doctor_id=doctor_id, day=day).delete()  # no row means a free day
+
+    def __str__(self):
+        return f"Slots of doctor {self.doctor_id} on {self.day}"
+
+
 class Prescription(models.Model):
     patient = models.ForeignKey('patientapp.Patient', on_delete=models.CASCADE, related_name='prescriptions')
     doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE)
@@ -48,6 +176,13 @@ class Prescription(models.Model):
     instructions = models.TextField(blank=True, null=True)
     date_issued = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # keyset pagination (date_issued, id), per doctor and per patient
+            models.Index(fields=['doctor', 'date_issued', 'id'], name='prescription_doctor_date_idx'),
+            models.Index(fields=['patient', 'date_issued', 'id'], name='prescription_patient_date_idx'),
+        ]
+
     def __str__(self):
         return f"Prescription for  {self.doctor.user.first_name}"
     
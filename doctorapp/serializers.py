@@ -1,8 +1,10 @@
 from rest_framework import serializers
 
 from commonapp.serializers import UserSerializer
+from commonapp import thumbnails
 from .import models
-from datetime import timedelta
+from contextlib import contextmanager
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 
 class DoctorSerializers(serializers.ModelSerializer):
@@ -10,9 +12,11 @@ class DoctorSerializers(serializers.ModelSerializer):
     user = UserSerializer()#If user is missing or depth=1 is not used, you'll get an empty or null user object when search doctor
     profile_pic = serializers.ImageField(required=False)#Without required=False, DRF will expect profile_pic on every update.
     profile_pic_url = serializers.SerializerMethodField()#it's necessary, i'm using it in frontend
+    profile_pic_srcset = serializers.SerializerMethodField()
     class Meta:
         model = models.Doctor
         fields = '__all__'
+        read_only_fields = ('profile_pic_thumbnails', 'thumbnails_source', 'thumbnails_claimed_at')  # written by make_thumbnails
         
     def get_user(self, obj):
         return {
@@ -27,6 +31,10 @@ class DoctorSerializers(serializers.ModelSerializer):
             if request:
                 return request.build_absolute_uri(obj.profile_pic.url)
         return None
+
+    def get_profile_pic_srcset(self, obj):
+        # thumbnail URLs by width, the original until make_thumbnails has run
+        return thumbnails.srcset(self.context.get('request'), obj.profile_pic, obj.profile_pic_thumbnails, obj.thumbnails_source)
     
     def update(self, instance, validated_data):
         # Handle profile_pic update
@@ -51,6 +59,7 @@ class AppointmentSerializers(serializers.ModelSerializer):
         model = models.Appointment
         fields = '__all__'
         read_only_fields = ('is_completed',)
+        validators = []  # slot clashes are reported by validate() below, with one message for all of them
     
     def validate_appointment_date(self, value):
         if value < timezone.now():
@@ -58,16 +67,54 @@ class AppointmentSerializers(serializers.ModelSerializer):
         return value
 
     def validate(self, data):
-        # Check doctor availability
-        if models.Appointment.objects.filter(
-            doctor=data['doctor'],
-            appointment_date__range=(
-                data['appointment_date'] - timedelta(minutes=29),
-                data['appointment_date'] + timedelta(minutes=29)
-            )
-        ).exists():
+        # Check doctor availability (cheap early answer, create/update re-check under a lock)
+        doctor = data.get('doctor', getattr(self.instance, 'doctor', None))
+        appointment_date = data.get('appointment_date', getattr(self.instance, 'appointment_date', None))
+        if self._has_conflict(doctor, appointment_date):
             raise serializers.ValidationError("Doctor is not available at this time")
         return data
+
+    def _has_conflict(self, doctor, appointment_date):
+        conflicts = models.Appointment.objects.conflicting(doctor, appointment_date)
+        if self.instance is not None:
+            conflicts = conflicts.exclude(pk=self.instance.pk)
+        return conflicts.exists()
+
+    @contextmanager
+    def _locked_slot(self, validated_data):
+        """Hold the doctor's row lock while saving so parallel bookings can't both pass"""
+        doctor = validated_data.get('doctor', getattr(self.instance, 'doctor', None))
+        appointment_date = validated_data.get('appointment_date', getattr(self.instance, 'appointment_date', None))
+        try:
+            with transaction.atomic():
+                #bookings for the same doctor queue up here, other doctors aren't blocked
+                models.Doctor.objects.select_for_update().get(pk=doctor.pk)
+                if self._has_conflict(doctor, appointment_date):
+                    raise serializers.ValidationError("Doctor is not available at this time")
+                yield
+        except IntegrityError as e:
+            if not self._is_slot_violation(e):
+                raise
+            #the unique/exclusion constraint caught a booking the lock didn't cover
+            raise serializers.ValidationError("Doctor is not available at this time")
+
+    @staticmethod
+    def _is_slot_violation(error):
+        """Whether an IntegrityError comes from one of Appointment's slot constraints"""
+        names = {constraint.name for constraint in models.Appointment._meta.constraints}
+        diag = getattr(error.__cause__, 'diag', None)
+        if diag is not None:  # psycopg names the violated constraint
+            return diag.constraint_name in names
+        # SQLite names the columns of a violated unique constraint instead
+        return 'UNIQUE constraint failed: doctorapp_appointment.doctor_id, doctorapp_appointment.appointment_date' in str(error)
+
+    def create(self, validated_data):
+        with self._locked_slot(validated_data):
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        with self._locked_slot(validated_data):
+            return super().update(instance, validated_data)
     
 class PrescriptionSerializers(serializers.ModelSerializer):
     class Meta:
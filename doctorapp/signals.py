@@ -1,9 +1,108 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save, post_delete, post_init
 from django.dispatch import receiver
-from .models import Doctor
+from patientapp.models import Patient, PatientDischargeDetails
+from .models import Doctor, Appointment, DoctorSlotOccupancy, DoctorStats
+from commonapp.models import CustomUser
+from . import directory, slots, stats
 
 @receiver(post_save, sender=Doctor)
 def activate_doctor(sender, instance, created, **kwargs):
     if created and not instance.status:  # If doctor is newly created and inactive
         instance.status = True
         instance.save()
+
+
+def _touched_days(doctor_id, appointment_date):
+    return {(doctor_id, day) for day in slots.occupied_bits(appointment_date)}
+
+@receiver(pre_save, sender=Appointment)
+def remember_old_slot(sender, instance, raw=False, **kwargs):
+    # A rescheduled appointment frees the days of its old slot, so keep them for post_save
+    instance._old_slot_days = set()
+    if instance.pk and not raw:
+        old = Appointment.objects.filter(pk=instance.pk).values_list('doctor_id', 'appointment_date').first()
+        if old:
+            instance._old_slot_days = _touched_days(*old)
+
+@receiver(post_save, sender=Appointment)
+def refresh_slot_occupancy(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    days = _touched_days(instance.doctor_id, instance.appointment_date) | getattr(instance, '_old_slot_days', set())
+    for doctor_id, day in days:
+        DoctorSlotOccupancy.rebuild(doctor_id, day)
+
+@receiver(post_delete, sender=Appointment)
+def free_slot_occupancy(sender, instance, **kwargs):
+    for doctor_id, day in _touched_days(instance.doctor_id, instance.appointment_date):
+        DoctorSlotOccupancy.rebuild(doctor_id, day)
+
+
+# DoctorStats counters (doctorapp/stats.py)
+
+@receiver(post_save, sender=Doctor)
+def create_doctor_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        DoctorStats.objects.get_or_create(doctor=instance)
+
+@receiver(post_init, sender=Appointment)
+@receiver(post_init, sender=PatientDischargeDetails)
+def remember_loaded_doctor(sender, instance, **kwargs):
+    instance._loaded_doctor_id = instance.__dict__.get('doctor_id')
+
+@receiver(post_init, sender=Patient)
+def remember_loaded_assigned_doctor(sender, instance, **kwargs):
+    instance._loaded_assigned_doctor_id = instance.__dict__.get('assigned_doctor_id')
+
+def _count_save(counter, created, current, loaded):
+    if created:
+        stats.bump(current, counter, 1)
+    else:
+        stats.move(counter, loaded, current)
+
+@receiver(post_save, sender=Appointment)
+def count_appointment(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        _count_save('appointments', created, instance.doctor_id, instance._loaded_doctor_id)
+        instance._loaded_doctor_id = instance.doctor_id
+
+@receiver(post_save, sender=PatientDischargeDetails)
+def count_discharge(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        _count_save('discharged_patients', created, instance.doctor_id, instance._loaded_doctor_id)
+        instance._loaded_doctor_id = instance.doctor_id
+
+@receiver(post_save, sender=Patient)
+def count_assigned_patient(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        _count_save('assigned_patients', created, instance.assigned_doctor_id, instance._loaded_assigned_doctor_id)
+        instance._loaded_assigned_doctor_id = instance.assigned_doctor_id
+
+@receiver(post_delete, sender=Appointment)
+def uncount_appointment(sender, instance, **kwargs):
+    stats.bump(instance._loaded_doctor_id, 'appointments', -1)
+
+@receiver(post_delete, sender=PatientDischargeDetails)
+def uncount_discharge(sender, instance, **kwargs):
+    stats.bump(instance._loaded_doctor_id, 'discharged_patients', -1)
+
+@receiver(post_delete, sender=Patient)
+def uncount_assigned_patient(sender, instance, **kwargs):
+    stats.bump(instance._loaded_assigned_doctor_id, 'assigned_patients', -1)
+
+
+# Doctor directory response cache (doctorapp/directory.py)
+
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+def refresh_directory(sender, **kwargs):
+    transaction.on_commit(directory.invalidate)
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def refresh_directory_for_user(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'last_login', 'password'}:
+        return  # not part of the directory payload; every login saves last_login
+    if instance.__dict__.get('user_type', 'doctor') == 'doctor':  # deferred counts as a doctor
+        transaction.on_commit(directory.invalidate)
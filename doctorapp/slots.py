@@ -0,0 +1,66 @@
+"""Per-doctor, per-day slot occupancy bitmaps.
+
+A day is cut into SLOTS_PER_DAY half hour slots (same length as Appointment.SLOT_LENGTH).
+Bit i of a day's bitmap is set when some appointment overlaps the slot starting at
+i * SLOT_LENGTH, so a clear bit is a start time that can be booked without a conflict.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+
+def day_start(day):
+    """Aware datetime of midnight for a date in the current timezone"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def slot_start(day, index):
+    return day_start(day) + timedelta(minutes=index * SLOT_MINUTES)
+
+
+def occupied_bits(appointment_date):
+    """{day: bitmask} of the grid slots an appointment starting at appointment_date overlaps"""
+    start = timezone.localtime(appointment_date)
+    minutes = start.hour * 60 + start.minute
+    first = minutes // SLOT_MINUTES
+    # an appointment that doesn't start on the grid also spills into the next slot
+    on_grid = minutes % SLOT_MINUTES == 0 and start.second == 0 and start.microsecond == 0
+    indexes = [first] if on_grid else [first, first + 1]
+
+    bits = {}
+    for index in indexes:
+        day = start.date() + timedelta(days=index // SLOTS_PER_DAY)
+        bits[day] = bits.get(day, 0) | (1 << (index % SLOTS_PER_DAY))
+    return bits
+
+
+def day_bitmap(appointment_dates, day):
+    """Bitmap of `day` built from the appointment start times that may touch it"""
+    bitmap = 0
+    for appointment_date in appointment_dates:
+        bitmap |= occupied_bits(appointment_date).get(day, 0)
+    return bitmap
+
+
+def earliest_free_slots(doctor_ids, occupancy, first_day, last_day, limit, opening_slot=0, closing_slot=SLOTS_PER_DAY, not_before=None):
+    """First `limit` (start, doctor_id) pairs that are free, in time order then doctor order.
+
+    occupancy maps (doctor_id, day) -> bitmap; a missing key is a day with nothing booked.
+    """
+    found = []
+    day = first_day
+    while day <= last_day and len(found) < limit:
+        for index in range(opening_slot, closing_slot):
+            start = slot_start(day, index)
+            if not_before and start < not_before:
+                continue
+            for doctor_id in doctor_ids:
+                if not occupancy.get((doctor_id, day), 0) & (1 << index):
+                    found.append((start, doctor_id))
+                    if len(found) == limit:
+                        return found
+        day += timedelta(days=1)
+    return found
@@ -0,0 +1,83 @@
+"""Maintenance of DoctorStats counters.
+
+Writes adjust the counters with F() updates inside the same transaction as the row that
+changed, so dashboard_stats is a single primary key read. recount() / collect_counts()
+rebuild them from the source tables (see `manage.py reconcile_doctor_stats`).
+"""
+from datetime import timedelta
+
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from . import slots
+from .models import Appointment, DoctorStats
+
+
+def _sources():
+    # counter -> (model, doctor FK attname); imported lazily, patientapp depends on doctorapp
+    from patientapp.models import Patient, PatientDischargeDetails
+    return {
+        'assigned_patients': (Patient, 'assigned_doctor_id'),
+        'appointments': (Appointment, 'doctor_id'),
+        'discharged_patients': (PatientDischargeDetails, 'doctor_id'),
+    }
+
+
+def collect_counts(doctor_ids=None):
+    """{doctor_id: {counter: n}} computed with one GROUP BY per counter"""
+    counts = {}
+    for counter, (model, attname) in _sources().items():
+        rows = model.objects.exclude(**{f'{attname}__isnull': True})
+        if doctor_ids is not None:
+            rows = rows.filter(**{f'{attname}__in': doctor_ids})
+        for row in rows.order_by().values(attname).annotate(n=Count('pk')):
+            counts.setdefault(row[attname], dict.fromkeys(DoctorStats.COUNTERS, 0))[counter] = row['n']
+    return counts
+
+
+def recount(doctor_id):
+    values = collect_counts([doctor_id]).get(doctor_id, dict.fromkeys(DoctorStats.COUNTERS, 0))
+    stats, _ = DoctorStats.objects.update_or_create(doctor_id=doctor_id, defaults=values)
+    return stats
+
+
+def bump(doctor_id, counter, delta):
+    """Add delta to one counter (a doctor without a stats row is left to reconcile_doctor_stats)"""
+    if doctor_id and delta:
+        DoctorStats.objects.filter(doctor_id=doctor_id).update(**{counter: Greatest(F(counter) + delta, 0)})
+
+
+def move(counter, old_doctor_id, new_doctor_id):
+    if old_doctor_id != new_doctor_id:
+        bump(old_doctor_id, counter, -1)
+        bump(new_doctor_id, counter, 1)
+
+
+def counters(doctor_id):
+    """{counter: n} of dashboard_stats, from the stats row (rebuilt if it is missing)"""
+    doctor_stats = DoctorStats.objects.filter(doctor_id=doctor_id).first() or recount(doctor_id)
+    return {counter: getattr(doctor_stats, counter) for counter in DoctorStats.COUNTERS}
+
+
+BREAKDOWNS = ('today', 'week')
+
+
+def breakdown_window(breakdown):
+    """(start day, end day) of a dashboard_stats ?breakdown=, None for an unknown one"""
+    if breakdown not in BREAKDOWNS:
+        return None
+    today = timezone.localdate()
+    if breakdown == 'today':
+        return today, today + timedelta(days=1)
+    week_start = today - timedelta(days=today.weekday())
+    return week_start, week_start + timedelta(days=7)
+
+
+def appointments_between(doctor_id, start, end):
+    # one range probe on the (doctor, appointment_date) index
+    return Appointment.objects.filter(
+        doctor_id=doctor_id,
+        appointment_date__gte=slots.day_start(start),
+        appointment_date__lt=slots.day_start(end),
+    ).count()
@@ -1,3 +1,264 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.http import QueryDict
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from commonapp.testing import QueryBudgetTestCase, api_client, bearer, make_doctor, make_patient, make_user
+from patientapp.models import PatientDischargeDetails
+
+from . import directory, slots, stats
+from .models import Appointment, DoctorSlotOccupancy, DoctorStats
+from .serializers import AppointmentSerializers
+
+
+class AsyncDashboardParityTests(TransactionTestCase):
+    """The async dashboard_stats answers like DoctorViewsets.dashboard_stats"""
+
+    def get_both(self, user, query=''):
+        sync = api_client(user).get(f'/api/doctor/profile/dashboard_stats/{query}')
+        # the async view runs queries in worker threads, hence TransactionTestCase
+        asynchronous = self.client.get(
+            f'/api/doctor/async/profile/dashboard_stats/{query}', HTTP_AUTHORIZATION=bearer(user)
+        )
+        return sync, asynchronous
+
+    def assertSameResponse(self, sync, asynchronous, status):
+        self.assertEqual((sync.status_code, asynchronous.status_code), (status, status))
+        self.assertEqual(sync.json(), asynchronous.json())
+
+    def test_doctor(self):
+        doctor = make_doctor()
+        for query in ('', '?breakdown=today', '?breakdown=week'):
+            with self.subTest(query=query):
+                self.assertSameResponse(*self.get_both(doctor.user, query), 200)
+        self.assertSameResponse(*self.get_both(doctor.user, '?breakdown=year'), 400)
+
+    def test_doctor_user_without_a_doctor_row(self):
+        sync, asynchronous = self.get_both(make_user('orphan', 'doctor'))
+        self.assertSameResponse(sync, asynchronous, 404)
+        self.assertEqual(asynchronous.json(), {"error": "Doctor not found"})
+
+
+class AppointmentSlotTests(TestCase):
+    """A doctor's slot can be booked once, whichever check catches the second booking"""
+
+    def setUp(self):
+        self.doctor, self.patient = make_doctor(), make_patient()
+        self.start = (timezone.now() + timedelta(days=1)).replace(microsecond=0)
+        Appointment.objects.create(patient=self.patient, doctor=self.doctor, appointment_date=self.start)
+
+    def book(self, appointment_date):
+        serializer = AppointmentSerializers(data={
+            'patient': self.patient.pk, 'doctor': self.doctor.pk, 'appointment_date': appointment_date,
+        })
+        if serializer.is_valid():
+            serializer.save()
+        return serializer
+
+    def test_same_and_overlapping_slots_are_refused(self):
+        for offset in (0, 10, -20):
+            with self.subTest(offset=offset):
+                serializer = self.book(self.start + timedelta(minutes=offset))
+                self.assertEqual(serializer.errors['non_field_errors'], ["Doctor is not available at this time"])
+        self.assertTrue(self.book(self.start + Appointment.SLOT_LENGTH).is_valid())
+
+    def test_constraint_violation_is_reported_as_unavailable(self):
+        # a booking that commits between the lock-free check and the insert
+        with mock.patch.object(AppointmentSerializers, '_has_conflict', return_value=False):
+            serializer = AppointmentSerializers(data={
+                'patient': self.patient.pk, 'doctor': self.doctor.pk, 'appointment_date': self.start,
+            })
+            self.assertTrue(serializer.is_valid())
+            with self.assertRaisesMessage(ValidationError, "Doctor is not available at this time"):
+                serializer.save()
+
+    def test_other_integrity_errors_propagate(self):
+        serializer = AppointmentSerializers(data={
+            'patient': self.patient.pk, 'doctor': self.doctor.pk, 'appointment_date': self.start + timedelta(hours=2),
+        })
+        self.assertTrue(serializer.is_valid())
+        error = IntegrityError("NOT NULL constraint failed: doctorapp_appointment.patient_id")
+        with mock.patch('rest_framework.serializers.ModelSerializer.create', side_effect=error):
+            with self.assertRaises(IntegrityError):
+                serializer.save()
+
+    @skipUnless(connection.vendor == 'postgresql', "the exclusion constraint exists on PostgreSQL only")
+    def test_database_refuses_overlapping_slots(self):
+        with self.assertRaises(IntegrityError) as caught:
+            Appointment.objects.create(patient=self.patient, doctor=self.doctor, appointment_date=self.start + timedelta(minutes=10))
+        self.assertTrue(AppointmentSerializers._is_slot_violation(caught.exception))
+
+
+class SlotOccupancyTests(TestCase):
+    """DoctorSlotOccupancy bitmaps follow the appointments and answer the earliest-free search"""
+
+    def setUp(self):
+        self.day = timezone.localdate() + timedelta(days=1)
+        self.doctor, self.patient = make_doctor(department='Cardiologist'), make_patient()
+
+    def occupancy(self, doctor=None):
+        return dict(DoctorSlotOccupancy.objects.filter(doctor=doctor or self.doctor).values_list('day', 'occupied'))
+
+    def test_occupied_bits(self):
+        self.assertEqual(slots.occupied_bits(slots.slot_start(self.day, 20)), {self.day: 1 << 20})
+        # off the grid, the appointment also takes the next slot
+        self.assertEqual(slots.occupied_bits(slots.slot_start(self.day, 20) + timedelta(minutes=10)), {self.day: 0b11 << 20})
+        last = slots.slot_start(self.day, slots.SLOTS_PER_DAY - 1) + timedelta(minutes=15)
+        self.assertEqual(slots.occupied_bits(last), {self.day: 1 << (slots.SLOTS_PER_DAY - 1), self.day + timedelta(days=1): 1})
+
+    def test_earliest_free_slots(self):
+        occupancy = {(1, self.day): 0b011, (2, self.day): 0b001}
+        self.assertEqual(slots.earliest_free_slots([1, 2], occupancy, self.day, self.day, 3), [
+            (slots.slot_start(self.day, 1), 2), (slots.slot_start(self.day, 2), 1), (slots.slot_start(self.day, 2), 2),
+        ])
+        # a fully booked day moves the search to the next one; not_before skips the past
+        next_day = self.day + timedelta(days=1)
+        full = {(1, self.day): (1 << slots.SLOTS_PER_DAY) - 1}
+        self.assertEqual(slots.earliest_free_slots([1], full, self.day, next_day, 1), [(slots.slot_start(next_day, 0), 1)])
+        self.assertEqual(
+            slots.earliest_free_slots([1], {}, self.day, self.day, 1, opening_slot=18, not_before=slots.slot_start(self.day, 20)),
+            [(slots.slot_start(self.day, 20), 1)],
+        )
+
+    def test_bitmap_follows_appointment_saves_and_deletes(self):
+        appointment = Appointment.objects.create(patient=self.patient, doctor=self.doctor, appointment_date=slots.slot_start(self.day, 20))
+        Appointment.objects.create(patient=self.patient, doctor=self.doctor, appointment_date=slots.slot_start(self.day, 24))
+        self.assertEqual(self.occupancy(), {self.day: (1 << 20) | (1 << 24)})
+
+        appointment.appointment_date = slots.slot_start(self.day, 30) + timedelta(minutes=15)
+        appointment.save()
+        self.assertEqual(self.occupancy(), {self.day: (1 << 24) | (0b11 << 30)})
+
+        other = make_doctor('other', department='Cardiologist')
+        appointment.doctor = other
+        appointment.save()
+        self.assertEqual((self.occupancy(), self.occupancy(other)), ({self.day: 1 << 24}, {self.day: 0b11 << 30}))
+
+        Appointment.objects.filter(doctor=self.doctor).delete()
+        self.assertEqual(self.occupancy(), {})  # no row for a free day
+
+    def test_available_slots_across_the_department(self):
+        other = make_doctor('other', department='Cardiologist')
+        make_doctor('neuro', department='Neurologist')
+        opening = settings.CLINIC_OPENING_HOUR * 60 // slots.SLOT_MINUTES
+        Appointment.objects.create(patient=self.patient, doctor=self.doctor, appointment_date=slots.slot_start(self.day, opening))
+        Appointment.objects.create(patient=self.patient, doctor=other, appointment_date=slots.slot_start(self.day, opening + 1))
+
+        response = api_client(self.patient.user).get(
+            f'/api/doctor/appointments/available_slots/?department=Cardiologist&start={self.day}&limit=3'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(row['doctor'], row['appointment_date']) for row in response.json()], [
+            (other.pk, slots.slot_start(self.day, opening).isoformat().replace('+00:00', 'Z')),
+            (self.doctor.pk, slots.slot_start(self.day, opening + 1).isoformat().replace('+00:00', 'Z')),
+            (self.doctor.pk, slots.slot_start(self.day, opening + 2).isoformat().replace('+00:00', 'Z')),
+        ])
+
+
+class DoctorStatsTests(TestCase):
+    """The counters kept by the signals match a recount from the source tables"""
+
+    def setUp(self):
+        self.first, self.second = make_doctor('first'), make_doctor('second')
+
+    def assertCounters(self, doctor, **expected):
+        self.assertEqual(stats.counters(doctor.pk), {**dict.fromkeys(DoctorStats.COUNTERS, 0), **expected})
+        recounted = stats.collect_counts([doctor.pk]).get(doctor.pk, dict.fromkeys(DoctorStats.COUNTERS, 0))
+        self.assertEqual(stats.counters(doctor.pk), recounted)
+
+    def test_counts_follow_creates_moves_and_deletes(self):
+        patient = make_patient(assigned_doctor=self.first)
+        appointments = [
+            Appointment.objects.create(patient=patient, doctor=self.first, appointment_date=timezone.now() + timedelta(days=1, hours=n))
+            for n in range(2)
+        ]
+        PatientDischargeDetails.objects.create(
+            patient=patient, doctor=self.first, address='a', release_date=date.today(), days_spent=1,
+            room_charge=1, medicine_cost=1, doctor_fee=1, other_charge=1, total=4)
+        self.assertCounters(self.first, assigned_patients=1, appointments=2, discharged_patients=1)
+
+        patient.assigned_doctor = self.second
+        patient.save()
+        appointments[0].doctor = self.second
+        appointments[0].save()
+        appointments[1].delete()
+        self.assertCounters(self.first, discharged_patients=1)
+        self.assertCounters(self.second, assigned_patients=1, appointments=1)
+
+        patient.delete()  # cascades to its appointments and discharges
+        self.assertCounters(self.first)
+        self.assertCounters(self.second)
+
+    def test_missing_row_is_rebuilt(self):
+        make_patient(assigned_doctor=self.first)
+        DoctorStats.objects.filter(doctor=self.first).delete()
+        self.assertCounters(self.first, assigned_patients=1)
+        self.assertTrue(DoctorStats.objects.filter(doctor=self.first).exists())
+
+
+class DirectoryCacheTests(TestCase):
+    """search_doctors and the doctor list are served from the directory cache until the roster changes"""
+
+    def setUp(self):
+        cache.clear()  # the roster version and payloads outlive the rolled back rows
+        self.doctor = make_doctor(department='Cardiologist')
+        self.client = api_client(make_patient().user)
+
+    def search(self, query='?department=cardio', **headers):
+        return self.client.get(f'/api/patient/profile/search_doctors/{query}', **headers)
+
+    def test_miss_then_hit(self):
+        first = self.search()
+        self.assertEqual((first.status_code, first['X-Cache']), (200, 'MISS'))
+        self.assertEqual([row['id'] for row in first.json()['results']], [self.doctor.pk])
+        with self.assertNumQueries(0):  # the principal is cached too
+            second = self.search()
+        self.assertEqual((second.status_code, second['X-Cache']), (200, 'HIT'))
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(directory.stats(), {'hits': 1, 'misses': 1, 'not_modified': 0, 'hit_ratio': 0.5})
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.search()['ETag']
+        for if_none_match in (etag, f'W/{etag}', f'"other", {etag}'):
+            with self.subTest(if_none_match=if_none_match):
+                response = self.search(HTTP_IF_NONE_MATCH=if_none_match)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.search(HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_doctor_save_starts_a_new_etag(self):
+        etag = self.search()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctor.department = 'Neurologist'
+            self.doctor.save()
+        response = self.search(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response['X-Cache']), (200, 'MISS'))
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_equivalent_queries_share_an_entry(self):
+        etag = self.search('?department=Cardio')['ETag']
+        response = self.search('?department=%20%20CARDIO%20&page=1&search=')
+        self.assertEqual((response['X-Cache'], response['ETag']), ('HIT', etag))
+        self.assertNotEqual(self.search('?department=neuro')['ETag'], etag)
+
+    def test_normalize(self):
+        params = QueryDict('search=%20Jane%20%20DOE&page=1&department=&ordering=Name')
+        self.assertEqual(directory.normalize(params), [('ordering', 'Name'), ('search', 'jane doe')])
+
+
+class QueryBudgetTests(QueryBudgetTestCase):
+    budgets = {
+        '/api/doctor/profile/': ('doctor', 2),
+        '/api/doctor/profile/my_patients/': ('doctor', 3),
+        '/api/doctor/appointments/': ('doctor', 1),
+        '/api/doctor/appointments/doctor_appointments/': ('doctor', 2),
+        '/api/doctor/prescriptions/': ('doctor', 1),
+    }
@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import DoctorViewsets, AppointmentViewsets, PrescriptionViewsets
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'profile', DoctorViewsets, basename='doctor')
@@ -8,5 +9,7 @@ router.register(r'appointments', AppointmentViewsets, basename='doctor-appointme
 router.register(r'prescriptions', PrescriptionViewsets, basename='prescription')
 
 urlpatterns = [
+    # async (ASGI) version of dashboard_stats
+    path('async/profile/dashboard_stats/', async_views.dashboard_stats, name='doctor-async-dashboard-stats'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -4,26 +4,40 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import PermissionDenied
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from commonapp.authentication import CachedJWTAuthentication
 from django.db.models import Count, Q
-from .models import Doctor, Appointment, Prescription
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .models import Doctor, Appointment, Prescription, DoctorSlotOccupancy, DoctorStats, departments
+from . import directory, slots, stats
+from commonapp import search
 from .serializers import DoctorSerializers, AppointmentSerializers, PrescriptionSerializers
 from patientapp.models import Patient, PatientDischargeDetails
 from patientapp.serializers import PatientSerializer
 from .permissions import IsDoctor
-from rest_framework.pagination import PageNumberPagination
+from commonapp.mixins import RelatedFieldsMixin
+from commonapp.pagination import ListPagination
 
-class PatientPagination(PageNumberPagination):
+class PatientPagination(ListPagination):
     page_size = 5  # Show 5 patients per page
     page_size_query_param = 'page_size'
     max_page_size = 50
+    keyset_ordering = ('id',)  # with ?pagination=cursor, page numbers stay the default here
+    default_mode = 'page'
 
 
-class DoctorViewsets(viewsets.ModelViewSet):
-    queryset = Doctor.objects.all()
+class DischargePagination(ListPagination):
+    keyset_ordering = ('-release_date', '-id')
+
+
+class DoctorViewsets(RelatedFieldsMixin, viewsets.ModelViewSet):
+    queryset = Doctor.objects.order_by('id')  # stable pages, they are cached one by one
     serializer_class = DoctorSerializers
+    select_related_fields = ('user',)
     # Will uncomment after creating authentication
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated,IsDoctor]
 
     '''
@@ -40,6 +54,15 @@ class DoctorViewsets(viewsets.ModelViewSet):
     DELETE /doctor/profile/{id}/ → Delete a doctor
     '''
 
+    def list(self, request, *args, **kwargs):
+        # the roster is served from the directory cache (with ETag/304) until a doctor changes
+        return directory.cached_response(request, 'doctor_list', lambda: super(DoctorViewsets, self).list(request, *args, **kwargs))
+
+    @action(detail=False, methods=['get'])
+    def directory_cache(self, request):#/api/doctor/profile/directory_cache/
+        """Hit/miss/304 counts of the doctor directory response cache"""
+        return Response(directory.stats())
+
 
     #Retrieve the profile of the logged-in doctor.
     @action(detail=False, methods=['get'])
@@ -51,19 +74,22 @@ class DoctorViewsets(viewsets.ModelViewSet):
 
     #new
     @action(detail=False, methods=['get'])
-    def dashboard_stats(self, request):#api/doctor/profile/dashboard_stats/
-        """Optimized Doctor Statistics API"""
+    def dashboard_stats(self, request):#api/doctor/profile/dashboard_stats/?breakdown=today|week
+        """Doctor statistics, read from the DoctorStats counters row"""
         doctor = getattr(request.user, 'doctor', None)
         if not doctor:
             return Response({"error": "Doctor not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        stats = {
-            #Uses related_name (less queries)
-            'assigned_patients': doctor.assigned_patients.count(),  
-            'appointments': doctor.appointments.count(),
-            'discharged_patients': doctor.discharged_patients.count()
-        }
-        return Response(stats)
+        breakdown = request.query_params.get('breakdown')
+        window = stats.breakdown_window(breakdown) if breakdown else None
+        if breakdown and window is None:
+            return Response({"error": f"breakdown must be one of {list(stats.BREAKDOWNS)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = stats.counters(doctor.pk)
+        # time-boxed appointment counts are one range probe on the (doctor, appointment_date) index
+        if window:
+            data[f'appointments_{breakdown}'] = stats.appointments_between(doctor.pk, *window)
+        return Response(data)
 
 
 
@@ -73,7 +99,7 @@ class DoctorViewsets(viewsets.ModelViewSet):
         """Get all patients assigned to the logged in doctor"""
         doctor = get_object_or_404(Doctor, user=request.user)
         # patients = Patient.objects.filter(assigned_doctor=doctor)
-        patients = Patient.objects.filter(assigned_doctor=doctor).select_related('user')
+        patients = Patient.objects.filter(assigned_doctor=doctor).select_related('user', 'assigned_doctor__user')  # PatientSerializer reads both
         #     # Get patients directly assigned to doctor
         # assigned_patients = Patient.objects.filter(assigned_doctor=doctor)
             # Get patients who have appointments with the doctor
@@ -84,16 +110,16 @@ class DoctorViewsets(viewsets.ModelViewSet):
         # patients = assigned_patients.union(appointment_patients).select_related('user')
         # Handle search by name or symptoms
         search_term = request.query_params.get('search', '')
+        paginator = PatientPagination()
         if search_term:
-            patients = patients.filter(
-                Q(user__first_name__icontains=search_term) | 
-                Q(user__last_name__icontains=search_term) |
-                Q(symptoms__icontains=search_term)
-            )
+            # ranked, typo tolerant match on first/last name and symptoms
+            patients = search.search(patients, search_term)
+            paginator.keyset_ordering = None  # keep the rank order
+        else:
+            patients = patients.order_by('id')
             
         serializer = PatientSerializer(patients, many=True)
                 # Apply custom pagination
-        paginator = PatientPagination()
         paginated_patients = paginator.paginate_queryset(patients, request)
         if paginated_patients is not None:  # Check if pagination is applied
             serializer = PatientSerializer(paginated_patients, many=True)
@@ -111,14 +137,17 @@ class DoctorViewsets(viewsets.ModelViewSet):
         discharged = PatientDischargeDetails.objects.filter(doctor=doctor)
         
         # Custom serializer would be better here
-        return Response(discharged.values())
+        paginator = DischargePagination()
+        page = paginator.paginate_queryset(discharged.values(), request, self)
+        return paginator.get_paginated_response(page)
 
 
-class AppointmentViewsets(viewsets.ModelViewSet):#/api/doctor/appointments/
+class AppointmentViewsets(RelatedFieldsMixin, viewsets.ModelViewSet):#/api/doctor/appointments/
     queryset = Appointment.objects.all()
     serializer_class = AppointmentSerializers
+    keyset_ordering = ('appointment_date', 'id')
     #Will uncomment after creating authentication
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
     '''
     ✅ Default Endpoints (Generated by DRF):
@@ -153,9 +182,51 @@ class AppointmentViewsets(viewsets.ModelViewSet):#/api/doctor/appointments/
         """Get appointments for logged-in doctor"""
         doctor = get_object_or_404(Doctor, user=request.user)
         appointments = Appointment.objects.filter(doctor=doctor)
-        serializer = self.get_serializer(appointments, many=True)# a doctor can have many appointments
-        return Response(serializer.data)
+        if request.query_params.get('upcoming') == 'true':
+            appointments = appointments.filter(is_completed=False, appointment_date__gte=timezone.now())
+        page = self.paginate_queryset(appointments)
+        serializer = self.get_serializer(page, many=True)# a doctor can have many appointments
+        return self.get_paginated_response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def available_slots(self, request):#/api/doctor/appointments/available_slots/?department=Cardiologist&start=2025-05-01&end=2025-05-07&limit=10
+        """Next free slots across every doctor of a department, read from the slot bitmaps"""
+        department = request.query_params.get('department')
+        if department not in dict(departments):
+            return Response({"error": "A valid department is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        today = timezone.localdate()
+        start = parse_date(request.query_params.get('start', '')) or today
+        end = parse_date(request.query_params.get('end', '')) or start + timedelta(days=6)
+        if end < start or (end - start).days > 31:
+            return Response({"error": "end must be on or after start and at most 31 days later"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+        except ValueError:
+            return Response({"error": "limit must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+
+        doctors = {doctor.id: doctor for doctor in Doctor.objects.filter(department=department, status=True).select_related('user')}
+        # one read on the (doctor, day) unique index for the whole window
+        occupancy = {
+            (row.doctor_id, row.day): row.occupied
+            for row in DoctorSlotOccupancy.objects.filter(doctor_id__in=doctors, day__range=(max(start, today), end))
+        }
+        free = slots.earliest_free_slots(
+            sorted(doctors), occupancy, max(start, today), end, limit,
+            opening_slot=settings.CLINIC_OPENING_HOUR * 60 // slots.SLOT_MINUTES,
+            closing_slot=settings.CLINIC_CLOSING_HOUR * 60 // slots.SLOT_MINUTES,
+            not_before=timezone.now(),
+        )
+        return Response([
+            {
+                'doctor': doctor_id,
+                'doctor_name': f"{doctors[doctor_id].user.first_name} {doctors[doctor_id].user.last_name}",
+                'department': department,
+                'appointment_date': slot_start,
+            }
+            for slot_start, doctor_id in free
+        ])
+
     def perform_create(self, serializer):
         user = self.request.user
         if hasattr(user, 'patient'):
@@ -175,11 +246,12 @@ class AppointmentViewsets(viewsets.ModelViewSet):#/api/doctor/appointments/
             raise PermissionDenied("You can't cancel this appointment.")
 
 
-class PrescriptionViewsets(viewsets.ModelViewSet):#	/api/doctor/prescriptions/
+class PrescriptionViewsets(RelatedFieldsMixin, viewsets.ModelViewSet):#	/api/doctor/prescriptions/
     queryset = Prescription.objects.all()
     serializer_class = PrescriptionSerializers
+    keyset_ordering = ('-date_issued', '-id')
     #Will uncomment after creating authentication
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     '''
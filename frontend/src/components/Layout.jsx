@@ -59,7 +59,7 @@ function Layout() {
               <div className="mt-6 flex items-center space-x-3 ml-8">
                 <div className="relative">
                   <img
-                    src={user?.profile?.profile_pic_url}
+                    src={user?.profile?.profile_pic_srcset?.['128'] || user?.profile?.profile_pic_url}
                     alt="None"
                     className="h-12 w-12 rounded-full object-cover border-2 border-white shadow-sm"
                   />
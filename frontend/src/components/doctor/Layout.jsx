@@ -65,7 +65,7 @@ function DoctorLayout() {
               
                 <div className="relative">
                   <img
-                    src={user?.profile_pic_url || 'https://img.icons8.com/fluency/96/doctor-male.png'}
+                    src={user?.profile_pic_srcset?.['128'] || user?.profile_pic_url || 'https://img.icons8.com/fluency/96/doctor-male.png'}
                     alt="Profile"
                     className="h-12 w-12 rounded-full object-cover border-2 border-white shadow-sm"
                   />
@@ -38,7 +38,7 @@ function DoctorSearch() {
       const response = await api.get('/api/patient/profile/search_doctors/', { params });
       console.log(response);
       console.log(response.data);
-      setDoctors(response.data);
+      setDoctors(response.data.results || response.data);  // paginated: { count, next, previous, results }
       setLoading(false);
     } catch (err) {
       console.error('Error searching doctors:', err);
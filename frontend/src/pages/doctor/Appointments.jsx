@@ -15,6 +15,8 @@ import {
 
 const Appointments = () => {
   const [appointments, setAppointments] = useState([]);
+  const [nextUrl, setNextUrl] = useState(null);  // cursor link to the following page, null on the last one
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [selectedAppointment, setSelectedAppointment] = useState(null);
@@ -32,7 +34,8 @@ const Appointments = () => {
   const fetchAppointments = async () => {
     try {
       const response = await api.get('/api/doctor/appointments/doctor_appointments/');
-      setAppointments(response.data);
+      setAppointments(response.data.results || response.data);
+      setNextUrl(response.data.next || null);
       setLoading(false);
     } catch (err) {
       console.error('Error fetching appointments:', err);
@@ -41,6 +44,22 @@ const Appointments = () => {
     }
   };
 
+  // the list is cursor paginated (10 per page, oldest first): append the next page
+  const loadMore = async () => {
+    if (!nextUrl) return;
+    setLoadingMore(true);
+    try {
+      const response = await api.get(nextUrl);
+      setAppointments((current) => [...current, ...response.data.results]);
+      setNextUrl(response.data.next || null);
+    } catch (err) {
+      console.error('Error fetching more appointments:', err);
+      setError('Failed to load appointments');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleSelectAppointment = (appointment) => {
     setSelectedAppointment(appointment);
     setFormData({
@@ -178,6 +197,18 @@ const Appointments = () => {
                     )}
                   </div>
                 ))}
+                {nextUrl && (
+                  <div className="text-center">
+                    <button
+                      type="button"
+                      onClick={loadMore}
+                      disabled={loadingMore}
+                      className="px-4 py-2 border border-gray-300 rounded-lg text-gray-700 hover:bg-gray-50 transition-colors duration-200 disabled:opacity-50"
+                    >
+                      {loadingMore ? 'Loading...' : 'Load more'}
+                    </button>
+                  </div>
+                )}
               </div>
             )}
           </div>
@@ -32,9 +32,9 @@ function Dashboard() {
         setStats(statsResponse.data);
         
         // Fetch upcoming appointments
-        const appointmentsResponse = await api.get('/api/doctor/appointments/doctor_appointments/');
+        const appointmentsResponse = await api.get('/api/doctor/appointments/doctor_appointments/', { params: { upcoming: true } });
         // Filter for upcoming appointments only and sort by date
-        const upcoming = appointmentsResponse.data
+        const upcoming = (appointmentsResponse.data.results || appointmentsResponse.data)
           .filter(app => !app.is_completed && new Date(app.appointment_date) >= new Date())
           .sort((a, b) => new Date(a.appointment_date) - new Date(b.appointment_date))
           .slice(0, 5); // Get only the next 5 appointments
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospitalapp', '0001_initial'),
+        ('patientapp', '0004_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emergencycase',
+            index=models.Index(fields=['admission_date', 'id'], name='emergency_admission_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospitalapp', '0002_keyset_indexes'),
+        ('patientapp', '0005_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bed',
+            index=models.Index(fields=['ward', 'is_occupied'], name='bed_ward_occupied_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bed',
+            index=models.Index(condition=models.Q(('is_occupied', False)), fields=['ward', 'id'], name='bed_free_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emergencycase',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['admission_date', 'id'], name='emergency_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emergencycase',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['patient'], name='emergency_active_patient_idx'),
+        ),
+    ]
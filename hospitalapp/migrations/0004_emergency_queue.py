@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:26
+
+from django.db import migrations, models
+
+
+def backfill_priority(apps, schema_editor):
+    EmergencyCase = apps.get_model('hospitalapp', 'EmergencyCase')
+    for severity, priority in (('Critical', 0), ('Moderate', 1)):  # Mild is the column default
+        EmergencyCase.objects.filter(severity=severity).update(priority=priority)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospitalapp', '0003_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emergencycase',
+            name='priority',
+            field=models.PositiveSmallIntegerField(default=2, editable=False),
+        ),
+        migrations.RunPython(backfill_priority, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='emergencycase',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['priority', 'admission_date', 'id'], name='emergency_queue_idx'),
+        ),
+    ]
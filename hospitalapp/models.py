@@ -2,13 +2,39 @@
 from django.db import models
 from patientapp.models import Patient
 
+# triage order of EmergencyCase.severity, most urgent first
+SEVERITY_PRIORITY = {'Critical': 0, 'Moderate': 1, 'Mild': 2}
+
 class EmergencyCase(models.Model):
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='emergency_cases')
     severity = models.CharField(max_length=50, choices=[('Critical', 'Critical'), ('Moderate', 'Moderate'), ('Mild', 'Mild')])
+    # SEVERITY_PRIORITY[severity], kept by save() so the triage queue can be read off an index
+    priority = models.PositiveSmallIntegerField(default=SEVERITY_PRIORITY['Mild'], editable=False)
     description = models.TextField()
     admission_date = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)  # Track if emergency is still active
 
+    # active cases in triage order (active_cases, the emergency stream snapshot)
+    QUEUE_ORDERING = ('priority', 'admission_date', 'id')
+
+    class Meta:
+        indexes = [
+            # keyset pagination (admission_date, id)
+            models.Index(fields=['admission_date', 'id'], name='emergency_admission_idx'),
+            # active cases are the ones read (active_cases, the patient dashboard, ward summary);
+            # resolved ones pile up but stay out of these indexes
+            models.Index(fields=['admission_date', 'id'], condition=models.Q(is_active=True), name='emergency_active_idx'),
+            models.Index(fields=['patient'], condition=models.Q(is_active=True), name='emergency_active_patient_idx'),
+            models.Index(fields=['priority', 'admission_date', 'id'], condition=models.Q(is_active=True), name='emergency_queue_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.priority = SEVERITY_PRIORITY.get(self.severity, SEVERITY_PRIORITY['Mild'])
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'severity' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'priority'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Emergency Case of {self.patient.user.first_name} - {self.severity}"
 
@@ -25,5 +51,13 @@ class Bed(models.Model):
         ('Maternity', 'Maternity Ward')
     ], default='General')
 
+    class Meta:
+        indexes = [
+            # ward filters, free bed allocation and the ward summary
+            models.Index(fields=['ward', 'is_occupied'], name='bed_ward_occupied_idx'),
+            # free beds of a ward in allocation order (available_beds, allocate)
+            models.Index(fields=['ward', 'id'], condition=models.Q(is_occupied=False), name='bed_free_idx'),
+        ]
+
     def __str__(self):
         return f"Bed {self.bed_number} - {self.ward} - {'Occupied' if self.is_occupied else 'Available'}"
\ No newline at end of file
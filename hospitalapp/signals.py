@@ -0,0 +1,83 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from commonapp import events
+from .models import Bed, EmergencyCase
+from .serializers import BedSerializer, EmergencyCaseSerializer
+from .summary import invalidate_ward_summary
+
+@receiver(post_save, sender=Bed)
+@receiver(post_delete, sender=Bed)
+@receiver(post_save, sender=EmergencyCase)
+@receiver(post_delete, sender=EmergencyCase)
+def refresh_ward_summary(sender, **kwargs):
+    # drop the cached snapshot once the change is visible to other requests
+    transaction.on_commit(invalidate_ward_summary)
+
+
+# Emergency queue and bed board deltas for the .../stream/ actions (commonapp/events.py)
+
+EMERGENCY_CHANNEL = 'emergency'
+BED_CHANNEL = 'beds'
+
+def _serialized(serializer_class, pk):
+    row = serializer_class.Meta.model.objects.select_related('patient__user').filter(pk=pk).first()
+    return serializer_class(row).data if row is not None else None
+
+@receiver(post_init, sender=EmergencyCase)
+def remember_loaded_activity(sender, instance, **kwargs):
+    instance._loaded_is_active = instance.__dict__.get('is_active')
+
+@receiver(post_save, sender=EmergencyCase)
+def publish_emergency_change(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        event = 'created'
+    elif instance._loaded_is_active and not instance.is_active:
+        event = 'resolved'
+    else:
+        event = 'updated'
+    instance._loaded_is_active = instance.is_active
+    case_id = instance.pk
+    events.publish_on_commit(
+        EMERGENCY_CHANNEL, event,
+        lambda: _serialized(EmergencyCaseSerializer, case_id),
+    )
+
+@receiver(post_delete, sender=EmergencyCase)
+def publish_emergency_delete(sender, instance, **kwargs):
+    case_id = instance.pk
+    events.publish_on_commit(EMERGENCY_CHANNEL, 'deleted', lambda: {'id': case_id})
+
+@receiver(post_init, sender=Bed)
+def remember_loaded_bed(sender, instance, **kwargs):
+    instance._loaded_bed = (instance.__dict__.get('is_occupied'), instance.__dict__.get('ward'))
+
+@receiver(post_save, sender=Bed)
+def publish_bed_change(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    was_occupied, previous_ward = instance._loaded_bed
+    if created:
+        event = 'created'
+    elif instance.is_occupied and not was_occupied:
+        event = 'assigned'
+    elif was_occupied and not instance.is_occupied:
+        event = 'released'
+    else:
+        event = 'updated'
+    instance._loaded_bed = (instance.is_occupied, instance.ward)
+    bed_id, moved_from = instance.pk, previous_ward if not created and previous_ward != instance.ward else None
+
+    def build():
+        data = _serialized(BedSerializer, bed_id)
+        if data is not None and moved_from:
+            data['previous_ward'] = moved_from  # so a board filtered on the old ward drops it
+        return data
+    events.publish_on_commit(BED_CHANNEL, event, build)
+
+@receiver(post_delete, sender=Bed)
+def publish_bed_delete(sender, instance, **kwargs):
+    bed_id, ward = instance.pk, instance.ward
+    events.publish_on_commit(BED_CHANNEL, 'deleted', lambda: {'id': bed_id, 'ward': ward})
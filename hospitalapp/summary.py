@@ -0,0 +1,71 @@
+"""Ward occupancy summary for the nurses' station dashboard.
+
+The whole summary (and any breakdown) comes out of one GROUP BY over Bed, and the
+result is cached until a Bed or EmergencyCase changes (see hospitalapp/signals.py).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, OuterRef, Subquery
+
+from .models import Bed, EmergencyCase
+
+CACHE_PREFIX = 'hospitalapp:ward_summary'
+
+
+def _active_severity():
+    # severity of the occupying patient's active emergency, NULL when there is none
+    return Subquery(
+        EmergencyCase.objects.filter(patient=OuterRef('patient'), is_active=True)
+        .order_by('-admission_date')
+        .values('severity')[:1]
+    )
+
+
+# breakdown name -> annotation grouped on next to (ward, is_occupied); adding one costs no extra query
+BREAKDOWNS = {
+    'severity': _active_severity,
+}
+
+
+def cache_key(breakdown=None):
+    return f"{CACHE_PREFIX}:{breakdown or 'base'}"
+
+
+def compute_ward_summary(breakdown=None):
+    wards = dict(Bed.ward.field.choices)
+    summary = {ward: {'total': 0, 'occupied': 0, 'available': 0} for ward in wards}
+
+    group_by = ['ward', 'is_occupied']
+    rows = Bed.objects.order_by()
+    if breakdown:
+        rows = rows.annotate(**{breakdown: BREAKDOWNS[breakdown]()})
+        group_by.append(breakdown)
+        for ward in summary:
+            summary[ward][f'occupied_by_{breakdown}'] = {}
+
+    for row in rows.values(*group_by).annotate(count=Count('id')):
+        ward = summary.setdefault(row['ward'], {'total': 0, 'occupied': 0, 'available': 0})
+        ward['total'] += row['count']
+        ward['occupied' if row['is_occupied'] else 'available'] += row['count']
+        if breakdown and row['is_occupied']:
+            key = row[breakdown] or 'none'
+            counts = ward.setdefault(f'occupied_by_{breakdown}', {})
+            counts[key] = counts.get(key, 0) + row['count']
+    return summary
+
+
+def get_ward_summary(breakdown=None, use_cache=True):
+    timeout = getattr(settings, 'WARD_SUMMARY_CACHE_TIMEOUT', 0)
+    if not (use_cache and timeout):
+        return compute_ward_summary(breakdown)
+
+    key = cache_key(breakdown)
+    summary = cache.get(key)
+    if summary is None:
+        summary = compute_ward_summary(breakdown)
+        cache.set(key, summary, timeout)
+    return summary
+
+
+def invalidate_ward_summary():
+    cache.delete_many([cache_key()] + [cache_key(breakdown) for breakdown in BREAKDOWNS])
@@ -1,3 +1,278 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from commonapp import events
+from commonapp.testing import QueryBudgetTestCase, api_client, make_doctor, make_patient
+
+from . import summary
+from .models import SEVERITY_PRIORITY, Bed, EmergencyCase
+
+
+class StreamConnectionTests(TransactionTestCase):
+    """An open event stream must not hold a (pooled) database connection"""
+
+    def open_stream(self, url):
+        """The streaming response, after checking the connection was closed (handed back) once it was built"""
+        wrapper = connections['default']
+        with mock.patch.object(wrapper, 'close', wraps=wrapper.close) as close:
+            response = api_client(self.doctor.user).get(url, HTTP_ACCEPT='text/event-stream')
+        self.addCleanup(response.close)
+        self.assertEqual(response.status_code, 200)
+        close.assert_called()
+        return response
+
+    def setUp(self):
+        self.doctor = make_doctor()
+        Bed.objects.create(bed_number='B1', ward='ICU')
+
+    def test_bed_stream_releases_the_connection_after_the_snapshot(self):
+        response = self.open_stream('/api/hospital/beds/stream/')
+        self.assertIn('event: snapshot', next(iter(response.streaming_content)).decode())
+
+    def test_emergency_stream_releases_the_connection(self):
+        self.open_stream('/api/hospital/emergency-cases/stream/')
+
+    def test_release_keeps_connections_inside_atomic_blocks(self):
+        with transaction.atomic():
+            Bed.objects.count()
+            events.release_connections()
+            self.assertIsNotNone(connection.connection)
+            Bed.objects.count()
+
+
+@override_settings(EVENT_STREAM_HEARTBEAT=0.1)
+class BedStreamResumeTests(TestCase):
+    """Bed board deltas reach open streams, and a reconnect replays what it missed (local transport)"""
+
+    def setUp(self):
+        self.doctor = make_doctor()
+        self.patient = make_patient()
+        self.icu = Bed.objects.create(bed_number='ICU-1', ward='ICU')
+        self.general = Bed.objects.create(bed_number='GEN-1', ward='General')
+
+    def open_stream(self, last_event_id=None):
+        headers = {'HTTP_LAST_EVENT_ID': last_event_id} if last_event_id else {}
+        response = api_client(self.doctor.user).get(
+            '/api/hospital/beds/stream/?ward=ICU', HTTP_ACCEPT='text/event-stream', **headers
+        )
+        self.addCleanup(response.close)
+        self.assertEqual(response.status_code, 200)
+        return iter(response.streaming_content)
+
+    def next_event(self, stream):
+        """{'id': ..., 'event': ..., 'data': ...} of the next event, skipping keep-alives"""
+        for chunk in stream:
+            text = chunk.decode()
+            if not text.startswith(':'):
+                return dict(line.split(': ', 1) for line in text.strip().split('\n'))
+        self.fail("stream ended")
+
+    def change(self, bed, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            for name, value in fields.items():
+                setattr(bed, name, value)
+            bed.save()
+
+    def test_deltas_and_resume(self):
+        stream = self.open_stream()
+        self.assertEqual(self.next_event(stream)['event'], 'snapshot')
+
+        self.change(self.icu, patient=self.patient, is_occupied=True)
+        assigned = self.next_event(stream)
+        self.assertEqual(assigned['event'], 'assigned')
+
+        # while disconnected: a General ward change (filtered out) and an ICU one
+        self.change(self.general, is_occupied=True)
+        self.change(self.icu, patient=None, is_occupied=False)
+
+        resumed = self.open_stream(last_event_id=assigned['id'])
+        released = self.next_event(resumed)
+        self.assertEqual(released['event'], 'released')  # the missed delta, no new snapshot
+        self.assertIn(f'"id":{self.icu.pk}', released['data'])
+
+    def test_unknown_event_id_reloads(self):
+        stream = self.open_stream(last_event_id='gone-1')
+        self.assertEqual(self.next_event(stream)['event'], 'snapshot')
+
+
+class EmergencyQueueTests(TestCase):
+    """active_cases lists the most severe cases first, each severity in admission order"""
+
+    def setUp(self):
+        self.doctor = make_doctor()
+        self.patient = make_patient()
+        self.admitted = timezone.now() - timedelta(hours=1)
+
+    def admit(self, severity, minutes, is_active=True):
+        case = EmergencyCase.objects.create(patient=self.patient, severity=severity, description='-', is_active=is_active)
+        # admission_date is auto_now_add
+        EmergencyCase.objects.filter(pk=case.pk).update(admission_date=self.admitted + timedelta(minutes=minutes))
+        return case
+
+    def active_cases(self):
+        response = api_client(self.doctor.user).get('/api/hospital/emergency-cases/active_cases/')
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.json()]
+
+    def test_ordered_by_severity_then_admission(self):
+        mild = self.admit('Mild', 0)
+        late_critical = self.admit('Critical', 30)
+        moderate = self.admit('Moderate', 10)
+        early_critical = self.admit('Critical', 20)
+        self.admit('Critical', 5, is_active=False)
+        self.assertEqual(self.active_cases(), [early_critical.pk, late_critical.pk, moderate.pk, mild.pk])
+
+    def test_severity_change_moves_the_case(self):
+        mild, moderate = self.admit('Mild', 0), self.admit('Moderate', 10)
+        self.assertEqual(self.active_cases(), [moderate.pk, mild.pk])
+
+        mild.severity = 'Critical'
+        mild.save(update_fields=['severity'])  # priority is saved along with it
+        self.assertEqual(EmergencyCase.objects.get(pk=mild.pk).priority, SEVERITY_PRIORITY['Critical'])
+        self.assertEqual(self.active_cases(), [mild.pk, moderate.pk])
+
+        response = api_client(self.doctor.user).patch(
+            f'/api/hospital/emergency-cases/{moderate.pk}/', {'severity': 'Critical'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(EmergencyCase.objects.get(pk=moderate.pk).priority, SEVERITY_PRIORITY['Critical'])
+        self.assertEqual(self.active_cases(), [mild.pk, moderate.pk])  # both critical now, in admission order
+
+
+@override_settings(WARD_SUMMARY_CACHE_TIMEOUT=60)
+class WardSummaryTests(TestCase):
+
+    def setUp(self):
+        cache.clear()  # a summary cached by an earlier test outlives its rolled back beds
+        self.doctor = make_doctor()
+        patients = [make_patient(f'patient{n}') for n in range(4)]
+        EmergencyCase.objects.create(patient=patients[0], severity='Critical', description='-')
+        EmergencyCase.objects.create(patient=patients[1], severity='Mild', description='-')
+        EmergencyCase.objects.create(patient=patients[1], severity='Critical', description='-', is_active=False)
+        beds = [('ICU', patients[0]), ('ICU', patients[1]), ('ICU', None), ('General', patients[2]),
+                ('General', None), ('Maternity', patients[3])]
+        for n, (ward, patient) in enumerate(beds):
+            Bed.objects.create(bed_number=f'B{n}', ward=ward, patient=patient, is_occupied=patient is not None)
+
+    def recount(self):
+        """The summary counted bed by bed, one ward at a time"""
+        expected = {}
+        for ward, _ in Bed.ward.field.choices:
+            beds = list(Bed.objects.filter(ward=ward))
+            occupied = [bed for bed in beds if bed.is_occupied]
+            by_severity = {}
+            for bed in occupied:
+                case = bed.patient.emergency_cases.filter(is_active=True).order_by('-admission_date').first()
+                key = case.severity if case else 'none'
+                by_severity[key] = by_severity.get(key, 0) + 1
+            expected[ward] = {'total': len(beds), 'occupied': len(occupied), 'available': len(beds) - len(occupied),
+                              'occupied_by_severity': by_severity}
+        return expected
+
+    def test_matches_a_per_ward_recount(self):
+        expected = self.recount()
+        with self.assertNumQueries(1):
+            self.assertEqual(summary.compute_ward_summary('severity'), expected)
+        for counts in expected.values():
+            del counts['occupied_by_severity']
+        self.assertEqual(summary.compute_ward_summary(), expected)
+        self.assertEqual(expected['ICU'], {'total': 3, 'occupied': 2, 'available': 1})
+
+    def test_endpoint_serves_the_cached_summary(self):
+        client = api_client(self.doctor.user)
+        first = client.get('/api/hospital/beds/ward_summary/?breakdown=severity').json()
+        self.assertEqual(first, self.recount())
+        Bed.objects.filter(ward='ICU').update(is_occupied=False)  # no signal: the cached summary stays
+        self.assertEqual(client.get('/api/hospital/beds/ward_summary/?breakdown=severity').json(), first)
+        self.assertEqual(client.get('/api/hospital/beds/ward_summary/?breakdown=severity&fresh=true').json(), self.recount())
+
+    def assertDroppedOnCommit(self, change):
+        for breakdown in (None, 'severity'):
+            summary.get_ward_summary(breakdown)
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+            self.assertIsNotNone(cache.get(summary.cache_key()))  # kept until the change commits
+        self.assertEqual(cache.get_many([summary.cache_key(), summary.cache_key('severity')]), {})
+
+    def test_bed_save_drops_the_summary_on_commit(self):
+        bed = Bed.objects.get(bed_number='B2')
+        bed.is_occupied = True
+        self.assertDroppedOnCommit(bed.save)
+        self.assertEqual(summary.get_ward_summary()['ICU']['occupied'], 3)
+
+    def test_emergency_case_save_drops_the_summary_on_commit(self):
+        case = EmergencyCase.objects.get(severity='Mild')
+        case.severity = 'Moderate'
+        self.assertDroppedOnCommit(case.save)
+        self.assertEqual(summary.get_ward_summary('severity')['ICU']['occupied_by_severity'], {'Critical': 1, 'Moderate': 1})
+
+
+class BedAllocationTests(TestCase):
+
+    def setUp(self):
+        self.doctor = make_doctor()
+        self.patients = [make_patient(f'patient{n}') for n in range(2)]
+        self.beds = [Bed.objects.create(bed_number=f'ICU-{n}', ward='ICU') for n in range(3)]
+
+    def allocate(self, user, patients, ward='ICU'):
+        return api_client(user).post(
+            '/api/hospital/beds/allocate/', {'ward': ward, 'patient_ids': [p.pk for p in patients]}, format='json'
+        )
+
+    def test_allocates_free_beds_in_order(self):
+        response = self.allocate(self.doctor.user, self.patients)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['bed_id'], row['patient_id']) for row in response.json()['allocated']],
+            [(self.beds[0].pk, self.patients[0].pk), (self.beds[1].pk, self.patients[1].pk)],
+        )
+
+    def test_patients_cannot_allocate(self):
+        response = self.allocate(self.patients[0].user, self.patients[:1])
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Bed.objects.filter(is_occupied=True).exists())
+
+    def test_a_patient_gets_one_bed(self):
+        self.assertEqual(self.allocate(self.doctor.user, self.patients[:1]).status_code, 200)
+        response = self.allocate(self.doctor.user, self.patients)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Bed.objects.filter(is_occupied=True).count(), 1)
+
+    def test_all_or_none_when_the_ward_is_short(self):
+        Bed.objects.filter(pk__in=[self.beds[0].pk, self.beds[1].pk]).update(ward='General')
+        self.assertEqual(self.allocate(self.doctor.user, self.patients).status_code, 409)
+        self.assertFalse(Bed.objects.filter(is_occupied=True).exists())
+
+
+    def assign(self, user, bed, patient):
+        return api_client(user).post(
+            f'/api/hospital/beds/{bed.pk}/assign_patient/', {'patient_id': patient.pk}, format='json'
+        )
+
+    def test_assign_patient(self):
+        self.assertEqual(self.assign(self.doctor.user, self.beds[0], self.patients[0]).status_code, 200)
+        self.beds[0].refresh_from_db()
+        self.assertEqual((self.beds[0].patient_id, self.beds[0].is_occupied), (self.patients[0].pk, True))
+
+    def test_patients_cannot_assign(self):
+        self.assertEqual(self.assign(self.patients[0].user, self.beds[0], self.patients[0]).status_code, 403)
+        self.assertFalse(Bed.objects.filter(is_occupied=True).exists())
+
+    def test_assign_gives_a_patient_one_bed(self):
+        self.assertEqual(self.assign(self.doctor.user, self.beds[0], self.patients[0]).status_code, 200)
+        response = self.assign(self.doctor.user, self.beds[1], self.patients[0])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Bed.objects.filter(is_occupied=True).count(), 1)
+
+class QueryBudgetTests(QueryBudgetTestCase):
+    budgets = {
+        '/api/hospital/beds/': ('doctor', 1),
+        '/api/hospital/beds/available_beds/?ward=Emergency': ('doctor', 1),
+        '/api/hospital/emergency-cases/': ('doctor', 1),
+        '/api/hospital/emergency-cases/active_cases/': ('doctor', 1),
+    }
@@ -3,19 +3,29 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.renderers import JSONRenderer
+from commonapp import events
+from commonapp.authentication import CachedJWTAuthentication
+from commonapp.events import EventStreamRenderer
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.utils import timezone
 from datetime import datetime
 
 from .models import EmergencyCase, Bed
 from .serializers import EmergencyCaseSerializer, BedSerializer
+from .summary import BREAKDOWNS, get_ward_summary
+from .signals import BED_CHANNEL, EMERGENCY_CHANNEL
 from doctorapp.permissions import IsDoctor
 from patientapp.permissions import IsPatient
+from commonapp.mixins import RelatedFieldsMixin
 
-class EmergencyCaseViewset(viewsets.ModelViewSet):
+class EmergencyCaseViewset(RelatedFieldsMixin, viewsets.ModelViewSet):
     queryset = EmergencyCase.objects.all()
     serializer_class = EmergencyCaseSerializer
-    authentication_classes = [JWTAuthentication]
+    select_related_fields = ('patient__user',)
+    keyset_ordering = ('-admission_date', '-id')
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     @action(detail=True, methods=['post'])
@@ -36,17 +46,30 @@ class EmergencyCaseViewset(viewsets.ModelViewSet):
             status=status.HTTP_200_OK
         )
 
+    def active_queue(self):
+        return self.get_queryset().filter(is_active=True).order_by(*EmergencyCase.QUEUE_ORDERING)
+
     @action(detail=False, methods=['get'])
     def active_cases(self, request):
-        """Get all active emergency cases"""
-        active_cases = self.get_queryset().filter(is_active=True)
-        serializer = self.get_serializer(active_cases, many=True)
+        """Get all active emergency cases, most severe first, then by admission time"""
+        serializer = self.get_serializer(self.active_queue(), many=True)
         return Response(serializer.data)
 
-class BedViewset(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'], renderer_classes=[EventStreamRenderer, JSONRenderer])
+    def stream(self, request):
+        """Server-sent events: a `snapshot` of the active queue, then `created`, `updated`,
+        `resolved` and `deleted` deltas as cases change (see hospitalapp/signals.py)"""
+        return events.stream_response(
+            request, EMERGENCY_CHANNEL,
+            initial=lambda: [('snapshot', self.get_serializer(self.active_queue(), many=True).data)],
+        )
+
+class BedViewset(RelatedFieldsMixin, viewsets.ModelViewSet):
     queryset = Bed.objects.all()
     serializer_class = BedSerializer
-    authentication_classes = [JWTAuthentication]
+    select_related_fields = ('patient__user',)
+    keyset_ordering = ('id',)
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -69,8 +92,7 @@ class BedViewset(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def assign_patient(self, request, pk=None):
         """Assign a patient to a bed"""
-        # if not request.user.is_doctor:
-        if not (request.user.is_doctor or request.user.is_superuser):
+        if not (request.user.user_type == 'doctor' or request.user.is_superuser):
             return Response(
                 {"error": "Only doctors and Admin can assign beds"},
                 status=status.HTTP_403_FORBIDDEN
@@ -85,25 +107,98 @@ class BedViewset(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if bed.is_occupied:
-            return Response(
-                {"error": "Bed is already occupied"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
         from patientapp.models import Patient
-        patient = get_object_or_404(Patient, id=patient_id)
-        
-        bed.patient = patient
-        bed.is_occupied = True
-        bed.assigned_date = datetime.now()
-        bed.save()
+        with transaction.atomic():
+            # patient first, then bed, the order allocate locks them in
+            patient = get_object_or_404(Patient.objects.select_for_update(), id=patient_id)
+            # re-read under a row lock so two doctors can't both see the bed as free
+            bed = Bed.objects.select_for_update().get(pk=bed.pk)
+            if bed.is_occupied:
+                return Response(
+                    {"error": "Bed is already occupied"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if Bed.objects.filter(patient=patient, is_occupied=True).exists():
+                return Response(
+                    {"error": "Patient already has a bed"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            bed.patient = patient
+            bed.is_occupied = True
+            bed.assigned_date = datetime.now()
+            bed.save()
 
         return Response(
             {"message": f"Patient assigned to bed {bed.bed_number} successfully"},
             status=status.HTTP_200_OK
         )
 
+    @action(detail=False, methods=['post'])
+    def allocate(self, request):#/api/hospital/beds/allocate/ {"ward": "ICU", "patient_ids": [1, 2]} (or "patient_id": 1)
+        """Claim any free bed(s) in a ward, all patients or none"""
+        if not (request.user.user_type == 'doctor' or request.user.is_superuser):
+            return Response(
+                {"error": "Only doctors and Admin can assign beds"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        ward = request.data.get('ward')
+        if ward not in dict(Bed.ward.field.choices):
+            return Response({"error": "A valid ward is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        patient_ids = request.data.get('patient_ids') or [request.data.get('patient_id')]
+        if not isinstance(patient_ids, list) or not all(patient_ids):
+            return Response({"error": "Patient ID is required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            patient_ids = list(dict.fromkeys(int(patient_id) for patient_id in patient_ids))
+        except (TypeError, ValueError):
+            return Response({"error": "Patient IDs must be numbers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        from patientapp.models import Patient
+        with transaction.atomic():
+            # lock the patients (in id order, so overlapping requests don't deadlock): a second
+            # allocation for one of them waits here and then sees the bed this one gave them
+            patients = {
+                patient.pk: patient
+                for patient in Patient.objects.select_for_update().filter(pk__in=patient_ids).order_by('pk')
+            }
+            missing = [patient_id for patient_id in patient_ids if patient_id not in patients]
+            if missing:
+                return Response({"error": f"Patients not found: {missing}"}, status=status.HTTP_404_NOT_FOUND)
+
+            already_bedded = list(
+                Bed.objects.filter(patient_id__in=patients, is_occupied=True).values_list('patient_id', flat=True)
+            )
+            if already_bedded:
+                return Response(
+                    {"error": f"Patients already have a bed: {already_bedded}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            # skip_locked: parallel allocators each take different free rows instead of queueing on the first one
+            beds = list(
+                Bed.objects.select_for_update(skip_locked=True)
+                .filter(ward=ward, is_occupied=False)
+                .order_by('id')[:len(patients)]
+            )
+            if len(beds) < len(patients):
+                return Response(
+                    {"error": f"Not enough free beds in {ward} ward"},
+                    status=status.HTTP_409_CONFLICT
+                )
+
+            allocated = []
+            now = timezone.now()
+            for bed, patient_id in zip(beds, patient_ids):
+                bed.patient = patients[patient_id]
+                bed.is_occupied = True
+                bed.assigned_date = now
+                bed.save(update_fields=['patient', 'is_occupied', 'assigned_date'])
+                allocated.append({'bed_id': bed.id, 'bed_number': bed.bed_number, 'patient_id': bed.patient_id})
+
+        return Response({"allocated": allocated}, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['post'])
     def release_bed(self, request, pk=None):
         """Release a patient from a bed"""
@@ -130,6 +225,26 @@ class BedViewset(viewsets.ModelViewSet):
             status=status.HTTP_200_OK
         )
 
+    @action(detail=False, methods=['get'], renderer_classes=[EventStreamRenderer, JSONRenderer])
+    def stream(self, request):#/api/hospital/beds/stream/?ward=ICU
+        """Server-sent events for the bed board: a `snapshot` of the beds, then `created`,
+        `assigned`, `released`, `updated` and `deleted` deltas. Reconnecting with
+        Last-Event-ID (or ?last_event_id=) replays the missed deltas instead of a new snapshot."""
+        ward = request.query_params.get('ward')
+        if ward and ward not in dict(Bed.ward.field.choices):
+            return Response({"error": "Unknown ward"}, status=status.HTTP_400_BAD_REQUEST)
+
+        def snapshot():
+            beds = Bed.objects.select_related('patient__user').order_by('id')
+            if ward:
+                beds = beds.filter(ward=ward)
+            return [('snapshot', self.get_serializer(beds, many=True).data)]
+
+        def in_ward(event, data):
+            return not ward or ward in (data.get('ward'), data.get('previous_ward'))
+
+        return events.stream_response(request, BED_CHANNEL, initial=snapshot, match=in_ward)
+
     @action(detail=False, methods=['get'])
     def available_beds(self, request):
         """Get all available beds"""
@@ -138,14 +253,13 @@ class BedViewset(viewsets.ModelViewSet):
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
-    def ward_summary(self, request):
+    def ward_summary(self, request):#/api/hospital/beds/ward_summary/?breakdown=severity
         """Get summary of bed availability by ward"""
-        summary = {}
-        for ward_choice in dict(Bed.ward.field.choices).keys():
-            ward_beds = Bed.objects.filter(ward=ward_choice)
-            summary[ward_choice] = {
-                'total': ward_beds.count(),
-                'occupied': ward_beds.filter(is_occupied=True).count(),
-                'available': ward_beds.filter(is_occupied=False).count()
-            }
-        return Response(summary)
+        breakdown = request.query_params.get('breakdown')
+        if breakdown and breakdown not in BREAKDOWNS:
+            return Response(
+                {"error": f"Unknown breakdown. Choose from {list(BREAKDOWNS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        fresh = request.query_params.get('fresh', '').lower() == 'true'
+        return Response(get_ward_summary(breakdown, use_cache=not fresh))
@@ -41,8 +41,20 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticated",
     ],
 }
+# JSON (de)serialization of API requests and responses: DRF's stdlib json renderer/parser, or the orjson
+# ones in commonapp/renderers.py (needs orjson). Opt in with API_JSON_BACKEND=orjson; compare them on the
+# seeded data with `manage.py benchmark_json`
+API_JSON_BACKENDS = {
+    'json': ('rest_framework.renderers.JSONRenderer', 'rest_framework.parsers.JSONParser'),
+    'orjson': ('commonapp.renderers.ORJSONRenderer', 'commonapp.renderers.ORJSONParser'),
+}
+API_JSON_BACKEND = os.environ.get('API_JSON_BACKEND', 'json')
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_RENDERER_CLASSES': [API_JSON_BACKENDS[API_JSON_BACKEND][0], 'rest_framework.renderers.BrowsableAPIRenderer'],
+    'DEFAULT_PARSER_CLASSES': [
+        API_JSON_BACKENDS[API_JSON_BACKEND][1], 'rest_framework.parsers.FormParser', 'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'commonapp.pagination.ListPagination',  # page numbers, or keyset cursors where a view declares keyset_ordering
     'PAGE_SIZE': 10,  # Show 10 doctors per page
 }
 SIMPLE_JWT = {
@@ -68,6 +80,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # trigram lookups for commonapp/search.py
     'rest_framework',
     'corsheaders',
     'patientapp',
@@ -81,6 +94,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.security.SecurityMiddleware',
+    'commonapp.compression.CompressionMiddleware',  # br/gzip for large bodies, before anything touching the body
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -115,18 +129,35 @@ WSGI_APPLICATION = 'hospitalproject.wsgi.application'
 
 # DATABASES = {
 #     'default': {
-#         'ENGINE': 'django.db.backends.sqlite3',
+#         'ENGINE': 'django.db.backends.sqlite3',  # or 'commonapp.backends.sqlite3' to try the pool below
 #         'NAME': BASE_DIR / 'db.sqlite3',
 #     }
 # }
+# Cache shared by every worker process (principals, dashboard snapshots, ward summary, doctor
+# directory), so an invalidation in one worker reaches all of them: Redis at REDIS_URL
+# (redis://host:6379/0, needs the redis package). Without it each process has its own LocMem cache
+# and serves an entry another worker invalidated until its timeout
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL, 'KEY_PREFIX': 'hms'}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+# Connections each worker process keeps at most (0 turns pooling off): keep workers x DB_POOL_MAX_SIZE
+# under PostgreSQL's max_connections. Requests wait up to DB_POOL_TIMEOUT seconds for a free one;
+# /api/db_pool/ shows how a worker's pool is doing (commonapp/dbpool.py)
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 10))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
 DATABASES = {
   'default': {
-  'ENGINE':'django.db.backends.postgresql_psycopg2',
+  'ENGINE':'commonapp.backends.postgresql',# Django's PostgreSQL backend plus a per-process connection pool
   'NAME': 'hospital3',#db name what i make new db in pgadmin for that project
   'USER':'postgres',# PostgreSQL username
   'PASSWORD':'123post',# PostgreSQL password
   'HOST':'localhost',
-  'PORT':5432
+  'PORT':5432,
+  'CONN_MAX_AGE': 0,# back to the pool at the end of each request
+  'CONN_HEALTH_CHECKS': True,# ping pooled connections that sat idle before reusing them
+  'POOL': {'max_size': DB_POOL_MAX_SIZE, 'timeout': DB_POOL_TIMEOUT} if DB_POOL_MAX_SIZE else None,
   }
 }
 
@@ -148,6 +179,24 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing profile. The first hasher is used for new hashes; the others only verify old
+# ones, which get re-encoded with the first one on the next login. Pick with PASSWORD_HASHER
+# (pbkdf2 | scrypt | argon2) and tune with PASSWORD_PBKDF2_ITERATIONS, then size workers with
+# `manage.py benchmark_password_hashers`.
+PASSWORD_HASHER_PROFILES = {
+    'pbkdf2': 'commonapp.hashers.TunablePBKDF2PasswordHasher',
+    'scrypt': 'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',  # needs argon2-cffi
+}
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2')
+PASSWORD_HASHERS = [PASSWORD_HASHER_PROFILES[PASSWORD_HASHER]] + [
+    hasher for name, hasher in PASSWORD_HASHER_PROFILES.items() if name != PASSWORD_HASHER
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 1_000_000))
+
+# Adds a Server-Timing header (db, hash, token) to login responses
+LOGIN_SERVER_TIMING = DEBUG
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
@@ -221,4 +270,55 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 # In settings.py
-AUTH_USER_MODEL = 'commonapp.CustomUser'
\ No newline at end of file
+AUTH_USER_MODEL = 'commonapp.CustomUser'
+
+# Appointment slot search (hours in TIME_ZONE), used by /api/doctor/appointments/available_slots/
+CLINIC_OPENING_HOUR = 9
+CLINIC_CLOSING_HOUR = 17
+
+# Seconds a ward occupancy summary stays cached (Bed/EmergencyCase changes drop it earlier); 0 disables
+WARD_SUMMARY_CACHE_TIMEOUT = 30
+
+# Threads rendering invoice PDFs for /api/patient/invoices/export/
+INVOICE_PDF_RENDER_WORKERS = 4
+
+# Rendered invoice PDF cache (patientapp/invoices.py); keep it outside MEDIA_ROOT, which is served publicly
+INVOICE_PDF_CACHE_ROOT = os.path.join(BASE_DIR, 'private', 'invoice_pdfs')
+
+# Seconds the JWT principal (user id, user_type, is_active, doctor/patient pk) is cached by
+# CachedJWTAuthentication. Saves drop it from the cache shared by the workers (CACHES above); with
+# the per-process LocMem fallback, other workers keep honouring a deactivated user's tokens for up
+# to this long
+AUTH_PRINCIPAL_CACHE_TIMEOUT = 60
+
+# Seconds a patient's dashboard snapshot stays cached (related saves drop it earlier)
+PATIENT_DASHBOARD_CACHE_TIMEOUT = 300
+
+# Most ranked matches commonapp/search.py returns for one patient/doctor search (then paginated)
+SEARCH_MAX_RESULTS = 200
+
+# Rows fetched per server-side cursor round trip (and written per chunk) by the billing CSV/NDJSON exports
+EXPORT_CHUNK_SIZE = 2000
+
+# Widths (px) of the WebP profile picture thumbnails made by `manage.py make_thumbnails`
+THUMBNAIL_SIZES = (64, 128, 256)
+
+# Seconds between keep-alive comments on server-sent event streams (emergency queue), and the events
+# a slow stream may fall behind before it is closed (the client reconnects)
+EVENT_STREAM_HEARTBEAT = 15
+EVENT_STREAM_QUEUE_SIZE = 1000
+
+# Where published stream events go: 'commonapp.events.LocalTransport' (this process only) or
+# 'commonapp.events.PostgresTransport' (LISTEN/NOTIFY, every worker process); and how many recent
+# events per channel each process keeps so a reconnecting stream can resume from Last-Event-ID
+EVENT_TRANSPORT = 'commonapp.events.LocalTransport'
+EVENT_STREAM_HISTORY = 500
+
+# Seconds a doctor directory response (doctor list, search_doctors) stays cached; Doctor and doctor
+# user saves start a new roster version earlier. 0 disables the cache and its ETags
+DOCTOR_DIRECTORY_CACHE_TIMEOUT = 300
+
+# Smallest response body (bytes) CompressionMiddleware compresses, and the brotli quality it uses (0-11;
+# brotli only with the brotli package installed, gzip otherwise)
+RESPONSE_COMPRESSION_MIN_BYTES = 1024
+RESPONSE_BROTLI_QUALITY = 5
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PatientappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'patientapp'
+
+    def ready(self):
+        import patientapp.signals  # Import signals when the app is ready
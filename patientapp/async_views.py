@@ -0,0 +1,60 @@
+"""Async (ASGI) versions of the patient dashboard actions of PatientViewSet.
+
+Same responses as /api/patient/profile/my_profile/ and /dashboard_overview/, with the
+independent queries run concurrently (see commonapp/asyncviews.py). Served at
+/api/patient/async/profile/<action>/.
+"""
+import asyncio
+
+from django.core.cache import cache
+
+from commonapp.asyncviews import api_view, in_thread, json_response
+from .dashboard import aget_snapshot, fill_from_discharge, snapshot_key, with_latest_discharge
+from .models import Patient
+from .serializers import PatientSerializer
+
+
+def _not_found(detail="Not found."):
+    return json_response({"detail": detail}, status=404)
+
+
+def _profile_data(request, patient_id):
+    patient = (
+        with_latest_discharge(Patient.objects.select_related('user', 'assigned_doctor__user'))
+        .filter(pk=patient_id).first()
+    )
+    if patient is None:
+        return None, False
+    updated = fill_from_discharge(patient)
+    if updated:
+        patient.save()
+    return PatientSerializer(patient, context={'request': request}).data, updated
+
+
+@api_view('patient')
+async def my_profile(request):
+    patient = getattr(request.user, 'patient', None)  # pk-only instance from the cached principal
+    if patient is None:
+        # get_object_or_404's message, as the sync action answers
+        return _not_found(f"No {Patient._meta.object_name} matches the given query.")
+    # the profile row and the bed/emergency snapshot don't depend on each other
+    (profile, updated), snapshot = await asyncio.gather(in_thread(_profile_data, request, patient.pk), aget_snapshot(patient.pk))
+    if profile is None or snapshot is None:
+        return _not_found()
+    if updated:
+        # the snapshot may have been cached from before the save; its bed/emergency are unaffected
+        await cache.adelete(snapshot_key(patient.pk))
+    return json_response({
+        'profile': profile,
+        'bed': snapshot['bed'],
+        'emergency_case': snapshot['emergency_case'],
+    })
+
+
+@api_view('patient')
+async def dashboard_overview(request):
+    patient = getattr(request.user, 'patient', None)
+    snapshot = await aget_snapshot(patient.pk) if patient else None
+    if snapshot is None:
+        return _not_found()
+    return json_response(snapshot['overview'])
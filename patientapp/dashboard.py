@@ -0,0 +1,157 @@
+"""Per-patient dashboard snapshot.
+
+dashboard_overview and the bed/emergency part of my_profile are built from one annotated
+Patient query plus the current bed and emergency case, then cached per patient. Signals on
+Patient, Appointment, Prescription, PatientDischargeDetails, Bed and EmergencyCase, and on the
+doctor and user rows whose names it shows, drop the snapshot (see patientapp/signals.py), so the cost stays flat however long the history gets.
+The three queries don't depend on each other; aget_snapshot() runs them concurrently for
+the async views (patientapp/async_views.py).
+"""
+import asyncio
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Exists, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from doctorapp.models import Appointment, Prescription
+from .models import Patient, PatientDischargeDetails
+
+CACHE_PREFIX = 'patientapp:dashboard'
+
+
+def snapshot_key(patient_id):
+    return f"{CACHE_PREFIX}:{patient_id}"
+
+
+def _count(model):
+    rows = model.objects.filter(patient=OuterRef('pk')).order_by().values('patient').annotate(n=Count('id')).values('n')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def with_latest_discharge(queryset):
+    """Annotate the patient rows with their latest discharge (same row `.last()` would give)"""
+    latest = PatientDischargeDetails.objects.filter(patient=OuterRef('pk')).order_by('-id')
+    return queryset.annotate(
+        is_discharged=Exists(latest),
+        discharge_symptoms=Subquery(latest.values('symptoms')[:1]),
+        discharge_mobile=Subquery(latest.values('mobile')[:1]),
+        discharge_address=Subquery(latest.values('address')[:1]),
+        discharge_doctor_id=Subquery(latest.values('doctor_id')[:1]),
+        discharge_doctor_first_name=Subquery(latest.values('doctor__user__first_name')[:1]),
+        discharge_doctor_last_name=Subquery(latest.values('doctor__user__last_name')[:1]),
+        discharge_doctor_department=Subquery(latest.values('doctor__department')[:1]),
+    )
+
+
+def fill_from_discharge(patient):
+    """my_profile fallback: copy missing details from the latest discharge; True if any changed"""
+    updated = False
+    if patient.is_discharged:
+        if not patient.symptoms and patient.discharge_symptoms:
+            patient.symptoms = patient.discharge_symptoms
+            updated = True
+        if not patient.assigned_doctor and patient.discharge_doctor_id:
+            patient.assigned_doctor_id = patient.discharge_doctor_id
+            updated = True
+        if not patient.mobile and patient.discharge_mobile:
+            patient.mobile = patient.discharge_mobile
+            updated = True
+        if not patient.address and patient.discharge_address:
+            patient.address = patient.discharge_address
+            updated = True
+    return updated
+
+
+def _overview(patient):
+    doctor_name = "Not Assigned"
+    department = "N/A"
+    # Try to get doctor from patient first, if no doctor assigned but discharged, pull from discharge
+    if patient.assigned_doctor:
+        doctor_name = f"{patient.assigned_doctor.user.first_name} {patient.assigned_doctor.user.last_name}"
+        department = patient.assigned_doctor.department
+    elif patient.discharge_doctor_id:
+        doctor_name = f"{patient.discharge_doctor_first_name} {patient.discharge_doctor_last_name}"
+        department = patient.discharge_doctor_department
+
+    return {
+        'patient_name': f"{patient.user.first_name} {patient.user.last_name}" if patient.user else "Unknown",
+        'doctor_name': doctor_name,
+        'department': department,
+        'admit_date': patient.admit_date,
+        'appointments_count': patient.appointments_count,
+        'prescriptions_count': patient.prescriptions_count,
+        'is_discharged': patient.is_discharged,
+    }
+
+
+def _patient_row(patient_id):
+    return (
+        with_latest_discharge(Patient.objects.filter(pk=patient_id))
+        .select_related('user', 'assigned_doctor__user')
+        .annotate(appointments_count=_count(Appointment), prescriptions_count=_count(Prescription))
+        .first()
+    )
+
+
+def _current_bed(patient_id):
+    from hospitalapp.models import Bed
+    return Bed.objects.filter(patient_id=patient_id, is_occupied=True).first()
+
+
+def _active_emergency(patient_id):
+    from hospitalapp.models import EmergencyCase
+    return EmergencyCase.objects.filter(patient_id=patient_id, is_active=True).first()
+
+
+def _assemble(patient, bed, emergency):
+    from hospitalapp.serializers import BedSerializer, EmergencyCaseSerializer
+
+    if patient is None:
+        return None
+    for obj in (bed, emergency):
+        if obj:
+            obj.patient = patient  # serializers read patient.user, already loaded
+    return {
+        'overview': _overview(patient),
+        'bed': BedSerializer(bed).data if bed else None,
+        'emergency_case': EmergencyCaseSerializer(emergency).data if emergency else None,
+    }
+
+
+def build_snapshot(patient_id):
+    patient = _patient_row(patient_id)
+    if patient is None:
+        return None
+    # Get current occupied bed and current active emergency case
+    return _assemble(patient, _current_bed(patient_id), _active_emergency(patient_id))
+
+
+async def abuild_snapshot(patient_id):
+    from commonapp.asyncviews import in_thread
+    rows = await asyncio.gather(*(in_thread(query, patient_id) for query in (_patient_row, _current_bed, _active_emergency)))
+    return _assemble(*rows)
+
+
+def get_snapshot(patient_id):
+    key = snapshot_key(patient_id)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_snapshot(patient_id)
+        if snapshot is not None:
+            cache.set(key, snapshot, getattr(settings, 'PATIENT_DASHBOARD_CACHE_TIMEOUT', 300))
+    return snapshot
+
+
+async def aget_snapshot(patient_id):
+    key = snapshot_key(patient_id)
+    snapshot = await cache.aget(key)
+    if snapshot is None:
+        snapshot = await abuild_snapshot(patient_id)
+        if snapshot is not None:
+            await cache.aset(key, snapshot, getattr(settings, 'PATIENT_DASHBOARD_CACHE_TIMEOUT', 300))
+    return snapshot
+
+
+def forget_snapshot(*patient_ids):
+    cache.delete_many([snapshot_key(patient_id) for patient_id in patient_ids if patient_id])
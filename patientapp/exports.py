@@ -0,0 +1,111 @@
+"""CSV / NDJSON exports of discharges and invoices for billing.
+
+Rows are read with values_list(...).iterator(chunk_size), which is a server-side cursor on
+PostgreSQL, and written out a chunk at a time. A year of records therefore streams in
+constant memory instead of being built into a list or a serializer first.
+"""
+import csv
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# column name -> lookup
+DISCHARGE_COLUMNS = {
+    'id': 'id',
+    'patient_id': 'patient_id',
+    'patient_first_name': 'patient__user__first_name',
+    'patient_last_name': 'patient__user__last_name',
+    'doctor_id': 'doctor_id',
+    'doctor_first_name': 'doctor__user__first_name',
+    'doctor_last_name': 'doctor__user__last_name',
+    'admit_date': 'admit_date',
+    'release_date': 'release_date',
+    'days_spent': 'days_spent',
+    'room_charge': 'room_charge',
+    'medicine_cost': 'medicine_cost',
+    'doctor_fee': 'doctor_fee',
+    'other_charge': 'other_charge',
+    'total': 'total',
+}
+
+INVOICE_COLUMNS = {
+    'id': 'id',
+    'patient_id': 'patient_id',
+    'patient_first_name': 'patient__user__first_name',
+    'patient_last_name': 'patient__user__last_name',
+    'assigned_doctor_id': 'patient__assigned_doctor_id',
+    'invoice_date': 'invoice_date',
+    'description': 'description',
+    'amount': 'amount',
+    'is_paid': 'is_paid',
+    'paid_date': 'paid_date',
+}
+
+
+class _Echo:
+    """csv.writer target that hands back each line instead of buffering it"""
+    def write(self, value):
+        return value
+
+
+def _chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def _rows(queryset, columns):
+    return queryset.values_list(*columns.values()).iterator(chunk_size=_chunk_size())
+
+
+def _csv_lines(rows, header):
+    writer = csv.writer(_Echo())
+    buffer = [writer.writerow(header)]
+    for row in rows:
+        buffer.append(writer.writerow(row))
+        if len(buffer) >= _chunk_size():
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _ndjson_lines(rows, header):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    buffer = []
+    for row in rows:
+        buffer.append(encoder.encode(dict(zip(header, row))) + '\n')
+        if len(buffer) >= _chunk_size():
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def export_filters(params, date_field, doctor_lookup):
+    """ORM filters from ?start=&end= (YYYY-MM-DD) and ?doctor=<id>, or raise ValueError"""
+    filters = {}
+    for param, lookup in (('start', 'gte'), ('end', 'lte')):
+        if params.get(param):
+            value = parse_date(params[param])
+            if value is None:
+                raise ValueError(f"{param} must be a YYYY-MM-DD date")
+            filters[f'{date_field}__{lookup}'] = value
+    if params.get('doctor'):
+        if not params['doctor'].isdigit():
+            raise ValueError("doctor must be a doctor id")
+        filters[doctor_lookup] = int(params['doctor'])
+    return filters
+
+
+def stream_export(queryset, columns, fmt, filename):
+    """StreamingHttpResponse writing `queryset` as CSV or NDJSON, one chunk at a time"""
+    lines = _csv_lines if fmt == 'csv' else _ndjson_lines
+    response = StreamingHttpResponse(lines(_rows(queryset, columns), list(columns)), content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
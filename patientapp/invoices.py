@@ -0,0 +1,119 @@
+"""Invoice PDF rendering with a content-addressed cache.
+
+A rendered PDF is stored once at <invoice id>/<fingerprint>.pdf under INVOICE_PDF_CACHE_ROOT,
+a storage outside MEDIA_ROOT: MEDIA_URL is served publicly and invoice ids are guessable, so the
+PDFs are only ever handed out by the views, which check who is asking. The fingerprint hashes
+every value printed on the PDF, so a changed invoice (or a renamed patient) misses the cache by
+itself; Invoice save/delete signals clean up the old files.
+"""
+import hashlib
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.utils.encoding import smart_str
+from reportlab.pdfgen import canvas
+
+def invoice_pdf_storage():
+    return FileSystemStorage(location=settings.INVOICE_PDF_CACHE_ROOT)
+
+
+def _printed_fields(invoice):
+    patient_name = invoice.patient.user.get_full_name() or invoice.patient.user.username
+    return [
+        f"Invoice ID: {invoice.id}",
+        f"Patient: {smart_str(patient_name)}",
+        f"Date: {invoice.invoice_date.strftime('%Y-%m-%d')}",
+        f"Description: {invoice.description or 'N/A'}",
+        f"Amount: ${invoice.amount}",
+        f"Status: {'Paid' if invoice.is_paid else 'Unpaid'}",
+    ]
+
+
+def invoice_fingerprint(invoice):
+    return hashlib.sha256("\n".join(_printed_fields(invoice)).encode()).hexdigest()
+
+
+def render_invoice_pdf(invoice):
+    buffer = BytesIO()
+    p = canvas.Canvas(buffer)
+    p.setFont("Helvetica", 14)
+    for i, line in enumerate(_printed_fields(invoice)):
+        p.drawString(100, 800 - i * 20, line)
+    p.showPage()
+    p.save()
+    return buffer.getvalue()
+
+
+def cached_path(invoice):
+    return f"{invoice.id}/{invoice_fingerprint(invoice)}.pdf"
+
+
+def get_invoice_pdf(invoice):
+    """PDF bytes for an invoice, rendered at most once per distinct content"""
+    storage = invoice_pdf_storage()
+    path = cached_path(invoice)
+    if storage.exists(path):
+        with storage.open(path, 'rb') as f:
+            return f.read()
+    pdf_content = render_invoice_pdf(invoice)
+    if not storage.exists(path):  # another worker may have just written it
+        storage.save(path, ContentFile(pdf_content))
+    return pdf_content
+
+
+def forget_invoice_pdfs(invoice_id):
+    """Remove every cached rendering of an invoice"""
+    storage = invoice_pdf_storage()
+    directory = str(invoice_id)
+    try:
+        _, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in files:
+        storage.delete(f"{directory}/{name}")
+
+
+class _StreamBuffer:
+    """Write-only file object for zipfile whose contents are handed out as they're written"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_invoices_zip(invoices, workers=None):
+    """Yield a ZIP of invoice PDFs chunk by chunk.
+
+    PDFs are rendered (or read from the cache) in a thread pool a window at a time,
+    so memory holds at most a couple of windows of PDFs, never the whole export.
+    `invoices` must already have patient__user selected; the threads don't touch the DB.
+    """
+    workers = workers or getattr(settings, 'INVOICE_PDF_RENDER_WORKERS', 4)
+    window = workers * 2
+    buffer = _StreamBuffer()
+    invoices = iter(invoices)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool, zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        while True:
+            chunk = [invoice for _, invoice in zip(range(window), invoices)]
+            if not chunk:
+                break
+            for invoice, pdf_content in zip(chunk, pool.map(get_invoice_pdf, chunk)):
+                archive.writestr(f"invoice_{invoice.id}.pdf", pdf_content)
+                yield buffer.drain()
+    yield buffer.drain()  # central directory, written when the archive closes
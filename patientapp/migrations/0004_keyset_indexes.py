@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctorapp', '0008_keyset_indexes'),
+        ('patientapp', '0003_patient_blood_group_patient_date_of_birth'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['patient', 'invoice_date', 'id'], name='invoice_patient_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patientdischargedetails',
+            index=models.Index(fields=['patient', 'release_date', 'id'], name='discharge_patient_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patientdischargedetails',
+            index=models.Index(fields=['doctor', 'release_date', 'id'], name='discharge_doctor_date_idx'),
+        ),
+    ]
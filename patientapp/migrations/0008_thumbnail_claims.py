@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctorapp', '0012_thumbnail_claims'),
+        ('patientapp', '0007_content_addressed_media'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='thumbnails_claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(condition=models.Q(('profile_pic__gt', ''), models.Q(('profile_pic', models.F('thumbnails_source')), _negated=True)), fields=['id'], name='patient_thumbnails_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.core.files.storage import default_storage
+from django.db import migrations
+
+# invoice PDFs used to be cached here, under the publicly served MEDIA_ROOT; the cache now
+# lives in INVOICE_PDF_CACHE_ROOT (patientapp/invoices.py) and refills on the next download
+PUBLIC_CACHE_DIR = 'invoice_pdfs'
+
+
+def remove_public_invoice_pdfs(apps, schema_editor):
+    if not default_storage.exists(PUBLIC_CACHE_DIR):
+        return
+    directories, _ = default_storage.listdir(PUBLIC_CACHE_DIR)
+    for directory in directories:
+        path = f"{PUBLIC_CACHE_DIR}/{directory}"
+        for name in default_storage.listdir(path)[1]:
+            default_storage.delete(f"{path}/{name}")
+        default_storage.delete(path)
+    default_storage.delete(PUBLIC_CACHE_DIR)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patientapp', '0008_thumbnail_claims'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_public_invoice_pdfs, migrations.RunPython.noop),
+    ]
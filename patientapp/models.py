@@ -2,12 +2,17 @@
 from django.db import models
 # from django.contrib.auth.models import User
 from commonapp.models import CustomUser  # Use your custom user model
+from commonapp.storage import profile_pic_storage
 import uuid  # For UUID primary key (if needed)
 
 
 class Patient(models.Model):  
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE)
-    profile_pic = models.ImageField(upload_to='profile_pics/PatientProfilePic/', null=True, blank=True)  
+    profile_pic = models.ImageField(upload_to='profile_pics/PatientProfilePic/', storage=profile_pic_storage, null=True, blank=True)
+    # WebP thumbnails of profile_pic {"64": path, ...} and the profile_pic they were made from (commonapp/thumbnails.py)
+    profile_pic_thumbnails = models.JSONField(default=dict, blank=True)
+    thumbnails_source = models.CharField(max_length=100, blank=True, default='')
+    thumbnails_claimed_at = models.DateTimeField(null=True, blank=True)  # a make_thumbnails worker is on it
     address = models.TextField()  
     mobile = models.CharField(max_length=20, null=False)  
     symptoms = models.TextField(null=False)  
@@ -20,6 +25,16 @@ class Patient(models.Model):
     #new
     blood_group = models.CharField(max_length=5, null=True, blank=True)
     date_of_birth = models.DateField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # rows waiting for thumbnails (commonapp.thumbnails.pending), a handful among all patients
+            models.Index(
+                fields=['id'], name='patient_thumbnails_pending_idx',
+                condition=models.Q(profile_pic__gt='') & ~models.Q(profile_pic=models.F('thumbnails_source')),
+            ),
+        ]
+
     # def __str__(self):
     #     return f"{self.user.username} - {self.status}"
       # Add properties for easier access
@@ -60,6 +75,13 @@ class PatientDischargeDetails(models.Model):
     other_charge = models.PositiveIntegerField(null=False)
     total = models.PositiveIntegerField(null=False)
 
+    class Meta:
+        indexes = [
+            # keyset pagination (release_date, id), per patient and per doctor
+            models.Index(fields=['patient', 'release_date', 'id'], name='discharge_patient_date_idx'),
+            models.Index(fields=['doctor', 'release_date', 'id'], name='discharge_doctor_date_idx'),
+        ]
+
     def __str__(self):
         return f"Discharge Details for {self.patient_name}"
 
@@ -84,6 +106,14 @@ class Invoice(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     is_paid = models.BooleanField(default=False)
     paid_date = models.DateField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # keyset pagination (invoice_date, id) of a patient's invoices
+            models.Index(fields=['patient', 'invoice_date', 'id'], name='invoice_patient_date_idx'),
+            # outstanding / paid
+            models.Index(fields=['patient', 'is_paid'], name='invoice_patient_paid_idx'),
+        ]
     
     def __str__(self):
         status = "Paid" if self.is_paid else "Outstanding"
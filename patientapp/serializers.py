@@ -1,18 +1,21 @@
 from rest_framework import serializers
 
 from commonapp.serializers import UserSerializer
+from commonapp import thumbnails
 from .models import Patient,PatientDischargeDetails,Invoice
 class PatientSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)  # Nest user details in profile
     #By nesting user = UserSerializer(read_only=True), the patient API will now return full user info instead of just user id.
     profile_pic = serializers.ImageField(required=False)#Without required=False, DRF will expect profile_pic on every update.
     profile_pic_url = serializers.SerializerMethodField()
+    profile_pic_srcset = serializers.SerializerMethodField()
     doctor_name = serializers.SerializerMethodField()
     department_name = serializers.SerializerMethodField()
 
     class Meta:
         model = Patient
         fields = '__all__'
+        read_only_fields = ('profile_pic_thumbnails', 'thumbnails_source', 'thumbnails_claimed_at')  # written by make_thumbnails
     #added newly for profile picture
     def get_profile_pic_url(self, obj):
         if obj.profile_pic:
@@ -20,6 +23,10 @@ class PatientSerializer(serializers.ModelSerializer):
             if request:
                 return request.build_absolute_uri(obj.profile_pic.url)
         return None
+
+    def get_profile_pic_srcset(self, obj):
+        # thumbnail URLs by width, the original until make_thumbnails has run
+        return thumbnails.srcset(self.context.get('request'), obj.profile_pic, obj.profile_pic_thumbnails, obj.thumbnails_source)
     
     def get_doctor_name(self, obj):
         return obj.doctor_name
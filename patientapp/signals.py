@@ -0,0 +1,73 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, post_init, pre_delete
+from django.dispatch import receiver
+from commonapp.models import CustomUser
+from doctorapp.models import Appointment, Doctor, Prescription
+from hospitalapp.models import Bed, EmergencyCase
+from .models import Invoice, Patient, PatientDischargeDetails
+from .invoices import forget_invoice_pdfs
+from .dashboard import forget_snapshot
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+def drop_cached_invoice_pdfs(sender, instance, **kwargs):
+    # the next download re-renders with the new content
+    invoice_id = instance.id
+    transaction.on_commit(lambda: forget_invoice_pdfs(invoice_id))
+
+
+# Dashboard snapshot (patientapp/dashboard.py) invalidation, once the change is visible to the
+# request rebuilding it (a snapshot rebuilt before the commit would be cached stale)
+
+def _forget_on_commit(*patient_ids):
+    transaction.on_commit(lambda: forget_snapshot(*patient_ids))
+
+def _patients_of_doctors(doctors):
+    # the overview shows the assigned doctor, or the one of the latest discharge
+    return {
+        *Patient.objects.filter(assigned_doctor__in=doctors).values_list('pk', flat=True),
+        *PatientDischargeDetails.objects.filter(doctor__in=doctors).values_list('patient_id', flat=True),
+    }
+
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+def drop_own_dashboard(sender, instance, **kwargs):
+    _forget_on_commit(instance.pk)
+
+@receiver(post_init, sender=Appointment)
+@receiver(post_init, sender=Prescription)
+@receiver(post_init, sender=PatientDischargeDetails)
+@receiver(post_init, sender=Bed)
+@receiver(post_init, sender=EmergencyCase)
+def remember_loaded_patient(sender, instance, **kwargs):
+    # a bed release or a moved record also changes the dashboard of the previous patient
+    instance._loaded_patient_id = instance.__dict__.get('patient_id')
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+@receiver(post_save, sender=Prescription)
+@receiver(post_delete, sender=Prescription)
+@receiver(post_save, sender=PatientDischargeDetails)
+@receiver(post_delete, sender=PatientDischargeDetails)
+@receiver(post_save, sender=Bed)
+@receiver(post_delete, sender=Bed)
+@receiver(post_save, sender=EmergencyCase)
+@receiver(post_delete, sender=EmergencyCase)
+def drop_related_dashboard(sender, instance, **kwargs):
+    _forget_on_commit(instance.patient_id, getattr(instance, '_loaded_patient_id', None))
+
+@receiver(post_save, sender=Doctor)
+@receiver(pre_delete, sender=Doctor)  # before SET_NULL clears assigned_doctor (without signals)
+def drop_doctor_patient_dashboards(sender, instance, created=False, update_fields=None, **kwargs):
+    if created or (update_fields is not None and 'department' not in update_fields):
+        return  # the department is the only doctor field a snapshot shows
+    _forget_on_commit(*_patients_of_doctors([instance.pk]))
+
+@receiver(post_save, sender=CustomUser)
+def drop_user_dashboards(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and not {'first_name', 'last_name'} & set(update_fields)):
+        return  # snapshots show patient and doctor names only; every login saves last_login
+    patient_ids = set(Patient.objects.filter(user=instance).values_list('pk', flat=True))
+    patient_ids |= _patients_of_doctors(Doctor.objects.filter(user=instance).values('pk'))
+    if patient_ids:
+        _forget_on_commit(*patient_ids)
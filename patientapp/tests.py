@@ -1,3 +1,255 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+import zipfile
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from commonapp.testing import QueryBudgetTestCase, api_client, bearer, make_doctor, make_patient, make_user
+
+from . import exports, invoices
+from .dashboard import get_snapshot, snapshot_key
+from .models import Invoice, PatientDischargeDetails
+
+
+class AsyncDashboardParityTests(TransactionTestCase):
+    """The async dashboard views answer like the PatientViewSet actions they mirror"""
+
+    def get_both(self, user, action):
+        sync = api_client(user).get(f'/api/patient/profile/{action}/')
+        # the async views run queries in worker threads, hence TransactionTestCase
+        asynchronous = self.client.get(f'/api/patient/async/profile/{action}/', HTTP_AUTHORIZATION=bearer(user))
+        return sync, asynchronous
+
+    def assertSameResponse(self, sync, asynchronous, status):
+        self.assertEqual((sync.status_code, asynchronous.status_code), (status, status))
+        self.assertEqual(sync.json(), asynchronous.json())
+
+    def test_patient(self):
+        patient = make_patient()
+        for action in ('my_profile', 'dashboard_overview'):
+            with self.subTest(action=action):
+                self.assertSameResponse(*self.get_both(patient.user, action), 200)
+
+    def test_patient_user_without_a_patient_row(self):
+        user = make_user('orphan', 'patient')
+        for action, detail in (('my_profile', "No Patient matches the given query."), ('dashboard_overview', "Not found.")):
+            with self.subTest(action=action):
+                sync, asynchronous = self.get_both(user, action)
+                self.assertSameResponse(sync, asynchronous, 404)
+                self.assertEqual(asynchronous.json(), {"detail": detail})
+
+    def test_other_roles_are_forbidden(self):
+        user = make_user('doc', 'doctor')
+        self.assertSameResponse(*self.get_both(user, 'dashboard_overview'), 403)
+
+
+class DashboardSnapshotTests(TestCase):
+    """A cached dashboard snapshot is dropped once a change to anything it shows commits"""
+
+    def setUp(self):
+        cache.clear()  # ids are reused once a test's rows are rolled back, the cache isn't
+        self.doctor = make_doctor(department='Cardiologist')
+        self.patient = make_patient(assigned_doctor=self.doctor)
+
+    def overview(self):
+        return get_snapshot(self.patient.pk)['overview']
+
+    def commit(self, change):
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+
+    def test_doctor_renamed(self):
+        self.assertEqual(self.overview()['doctor_name'], 'Doc Tor')
+        self.doctor.user.last_name = 'Who'
+        self.commit(self.doctor.user.save)
+        self.assertEqual(self.overview()['doctor_name'], 'Doc Who')
+
+    def test_department_changed(self):
+        self.overview()
+        self.doctor.department = 'Dermatologists'
+        self.commit(self.doctor.save)
+        self.assertEqual(self.overview()['department'], 'Dermatologists')
+
+    def test_doctor_deleted(self):
+        self.overview()
+        self.commit(self.doctor.delete)
+        self.assertEqual(self.overview()['doctor_name'], 'Not Assigned')
+
+    def test_patient_renamed(self):
+        self.overview()
+        self.patient.user.first_name = 'Renamed'
+        self.commit(self.patient.user.save)
+        self.assertTrue(self.overview()['patient_name'].startswith('Renamed'))
+
+    def test_kept_until_the_commit(self):
+        before = self.overview()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.doctor.user.last_name = 'Who'
+            self.doctor.user.save()
+            # a request reading now sees the old rows and caches them; the commit drops that copy
+            self.assertEqual(self.overview(), before)
+        self.assertEqual(self.overview()['doctor_name'], 'Doc Who')
+
+    def test_logins_keep_the_snapshot(self):
+        self.overview()
+        self.commit(lambda: self.doctor.user.save(update_fields=['last_login']))
+        self.assertIsNotNone(cache.get(snapshot_key(self.patient.pk)))
+
+
+class InvoicePdfTests(TestCase):
+
+    def setUp(self):
+        self.cache_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(INVOICE_PDF_CACHE_ROOT=self.cache_root, MEDIA_ROOT=self.media_root))
+        self.patient = make_patient()
+        self.invoice = Invoice.objects.create(patient=self.patient, description='x-ray', amount='40.00')
+        self.client = api_client(self.patient.user)
+        self.render = self.enterContext(mock.patch.object(invoices, 'render_invoice_pdf', wraps=invoices.render_invoice_pdf))
+
+    def download(self, invoice):
+        return self.client.get(f'/api/patient/invoices/{invoice.pk}/download/')
+
+    def cached_files(self):
+        return [os.path.join(root, name) for root, _, names in os.walk(self.cache_root) for name in names]
+
+    def test_rendered_once_outside_media_root(self):
+        first, second = self.download(self.invoice), self.download(self.invoice)
+        self.assertEqual((first.status_code, second.status_code), (200, 200))
+        self.assertEqual(first.content, second.content)
+        self.assertTrue(first.content.startswith(b'%PDF'))
+        self.assertEqual(self.render.call_count, 1)
+        self.assertEqual(self.cached_files(), [os.path.join(self.cache_root, invoices.cached_path(self.invoice))])
+        self.assertEqual(list(os.walk(self.media_root))[0][1:], ([], []))
+
+    def test_saved_invoice_is_rendered_again(self):
+        self.download(self.invoice)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.invoice.is_paid = True
+            self.invoice.save()
+        self.assertEqual(self.cached_files(), [])  # forget_invoice_pdfs ran on commit
+        response = self.download(self.invoice)
+        self.assertEqual(self.render.call_count, 2)
+        self.assertEqual(self.cached_files(), [os.path.join(self.cache_root, invoices.cached_path(self.invoice))])
+        self.assertNotEqual(response.content, b'')
+
+    def test_other_patients_invoice_is_not_found(self):
+        other = Invoice.objects.create(patient=make_patient('other'), description='x', amount='1.00')
+        self.assertEqual(self.download(other).status_code, 404)
+        self.render.assert_not_called()
+
+    def test_export_streams_a_zip_of_the_patients_invoices(self):
+        older = Invoice.objects.create(patient=self.patient, description='blood test', amount='12.50')
+        Invoice.objects.filter(pk=older.pk).update(invoice_date=date(2025, 1, 5))
+        Invoice.objects.create(patient=make_patient('other'), description='x', amount='1.00')
+
+        response = self.client.get('/api/patient/invoices/export/')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(archive.namelist(), [f'invoice_{older.pk}.pdf', f'invoice_{self.invoice.pk}.pdf'])
+        self.assertEqual(archive.read(f'invoice_{self.invoice.pk}.pdf'), self.download(self.invoice).content)
+
+        response = self.client.get('/api/patient/invoices/export/?start=2025-02-01')
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(archive.namelist(), [f'invoice_{self.invoice.pk}.pdf'])
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)  # several chunks out of a handful of rows
+class BillingExportTests(TestCase):
+
+    def setUp(self):
+        self.doctor, self.other_doctor = make_doctor(), make_doctor('other_doctor')
+        self.patient = make_patient(first_name='Ann', assigned_doctor=self.doctor)
+        self.other_patient = make_patient('other_patient', assigned_doctor=self.other_doctor)
+        self.invoices = [
+            self.invoice(self.patient, date(2025, 1, 10), '10.50', description='x-ray, "urgent"'),
+            self.invoice(self.other_patient, date(2025, 1, 20), '20.00'),
+            self.invoice(self.patient, date(2025, 2, 5), '30.00', is_paid=True),
+            self.invoice(self.patient, date(2025, 1, 15), '40.00'),
+        ]
+        self.staff = make_user('staff', 'doctor', is_staff=True)
+
+    def invoice(self, patient, invoice_date, amount, **fields):
+        invoice = Invoice.objects.create(patient=patient, description=fields.pop('description', '-'), amount=amount, **fields)
+        Invoice.objects.filter(pk=invoice.pk).update(invoice_date=invoice_date)  # auto_now_add
+        return invoice
+
+    def export(self, user, query='', url='/api/patient/invoices/billing_export/'):
+        return api_client(user).get(f'{url}{query}')
+
+    def csv_rows(self, response):
+        self.assertTrue(response.streaming)
+        return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_csv(self):
+        response = self.export(self.staff)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="invoices.csv"')
+        header, *rows = self.csv_rows(response)
+        self.assertEqual(header, list(exports.INVOICE_COLUMNS))
+        self.assertEqual([int(row[0]) for row in rows], [self.invoices[i].pk for i in (0, 3, 1, 2)])  # by invoice_date
+        self.assertEqual(rows[0], [
+            str(self.invoices[0].pk), str(self.patient.pk), 'Ann', '', str(self.doctor.pk),
+            '2025-01-10', 'x-ray, "urgent"', '10.50', 'False', '',
+        ])
+
+    def test_ndjson(self):
+        response = self.export(self.patient.user, '?output=ndjson')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="invoices.ndjson"')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row['id'] for row in rows], [self.invoices[i].pk for i in (0, 3, 2)])  # the patient's own
+        self.assertEqual(rows[2], {
+            'id': self.invoices[2].pk, 'patient_id': self.patient.pk, 'patient_first_name': 'Ann', 'patient_last_name': '',
+            'assigned_doctor_id': self.doctor.pk, 'invoice_date': '2025-02-05', 'description': '-', 'amount': '30.00',
+            'is_paid': True, 'paid_date': None,
+        })
+
+    def test_filters(self):
+        cases = [
+            (self.staff, '?start=2025-01-12&end=2025-01-31', (3, 1)),
+            (self.staff, f'?doctor={self.other_doctor.pk}', (1,)),
+            (self.doctor.user, '', (0, 3, 2)),  # a doctor's own patients
+            (self.doctor.user, f'?doctor={self.other_doctor.pk}', ()),
+            (self.patient.user, '?end=2025-01-31', (0, 3)),
+        ]
+        for user, query, expected in cases:
+            with self.subTest(user=user.username, query=query):
+                rows = self.csv_rows(self.export(user, query))[1:]
+                self.assertEqual([int(row[0]) for row in rows], [self.invoices[i].pk for i in expected])
+
+    def test_bad_requests(self):
+        for query in ('?output=xml', '?start=2025-13-01', '?doctor=me'):
+            with self.subTest(query=query):
+                self.assertEqual(self.export(self.staff, query).status_code, 400)
+        self.assertEqual(self.export(make_user('nobody', 'patient')).status_code, 403)
+
+    def test_discharges(self):
+        for doctor, release_date in ((self.doctor, date(2025, 3, 1)), (self.other_doctor, date(2025, 2, 1))):
+            PatientDischargeDetails.objects.create(
+                patient=self.patient, doctor=doctor, address='a', release_date=release_date, days_spent=2,
+                room_charge=100, medicine_cost=20, doctor_fee=50, other_charge=5, total=175,
+            )
+        response = self.export(self.doctor.user, url='/api/patient/discharge/billing_export/')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="discharges.csv"')
+        header, *rows = self.csv_rows(response)
+        self.assertEqual(header, list(exports.DISCHARGE_COLUMNS))
+        self.assertEqual([(row[5], row[8], row[14]) for row in rows], [('Doc', '2025-03-01', '175')])
+        self.assertEqual(len(self.csv_rows(self.export(self.staff, url='/api/patient/discharge/billing_export/'))), 3)
+
+
+class QueryBudgetTests(QueryBudgetTestCase):
+    budgets = {
+        '/api/patient/discharge/': ('patient', 1),
+        '/api/patient/invoices/': ('patient', 1),
+        '/api/patient/profile/search_doctors/': ('patient', 2),
+    }
@@ -2,6 +2,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import PatientViewSet, PatientDischargeDetailsViewSet, InvoiceViewSet
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'profile', PatientViewSet, basename='patient')
@@ -9,6 +10,9 @@ router.register(r'discharge', PatientDischargeDetailsViewSet, basename='discharg
 router.register(r'invoices', InvoiceViewSet, basename='invoice')
 
 urlpatterns = [
+    # async (ASGI) versions of the dashboard actions
+    path('async/profile/my_profile/', async_views.my_profile, name='patient-async-my-profile'),
+    path('async/profile/dashboard_overview/', async_views.dashboard_overview, name='patient-async-dashboard-overview'),
     path('', include(router.urls)),
 ]
 
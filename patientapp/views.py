@@ -7,69 +7,61 @@ from rest_framework.permissions import IsAuthenticated#Builtin
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from commonapp.authentication import CachedJWTAuthentication
 from django.db.models import Q
 from .models import Patient, PatientDischargeDetails, Invoice
 from .serializers import InvoiceSerializer, PatientSerializer, PatientDischargeDetailsSerializer
 from doctorapp.models import Doctor, Appointment, Prescription
 from doctorapp.serializers import DoctorSerializers
+from doctorapp import directory
 from .permissions import IsPatient
+from commonapp.mixins import RelatedFieldsMixin
 from hospitalapp.models import Bed, EmergencyCase  
 from hospitalapp.serializers import BedSerializer, EmergencyCaseSerializer
 # REST API ViewSets
-from django.http import HttpResponse
-from reportlab.pdfgen import canvas
-from io import BytesIO
-from django.utils.encoding import smart_str
-class PatientViewSet(viewsets.ModelViewSet):
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from .invoices import get_invoice_pdf, stream_invoices_zip
+from . import exports
+from .dashboard import fill_from_discharge, get_snapshot, with_latest_discharge
+from commonapp import search as search_index
+from rest_framework.pagination import PageNumberPagination
+
+class DoctorSearchPagination(PageNumberPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+
+class PatientViewSet(RelatedFieldsMixin, viewsets.ModelViewSet):
     """API for managing Patients"""
     queryset = Patient.objects.all()
     serializer_class = PatientSerializer
+    select_related_fields = ('user', 'assigned_doctor__user')
     # Will uncomment after creating authentication
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated,IsPatient]
     parser_classes = [MultiPartParser, FormParser]  # for image/file handling
 
     @action(detail=False, methods=['get'])
     def my_profile(self, request):
-        patient = get_object_or_404(Patient, user=request.user)
+        patient = get_object_or_404(
+            with_latest_discharge(Patient.objects.select_related('user', 'assigned_doctor__user')),
+            user=request.user
+        )
 
         # fallback logic from discharge, if those details were not provided,it'll catch from discharge
-        updated = False  # Track if any field was updated
-
-        if not patient.symptoms or not patient.assigned_doctor or not patient.mobile or not patient.address:
-            last_discharge = PatientDischargeDetails.objects.filter(patient=patient).last()
-            if last_discharge:
-                if not patient.symptoms and last_discharge.symptoms:
-                    patient.symptoms = last_discharge.symptoms
-                    updated = True
-                if not patient.assigned_doctor and last_discharge.doctor:
-                    patient.assigned_doctor = last_discharge.doctor
-                    updated = True
-                if not patient.mobile and last_discharge.mobile:
-                    patient.mobile = last_discharge.mobile
-                    updated = True
-                if not patient.address and last_discharge.address:
-                    patient.address = last_discharge.address
-                    updated = True
-
         # Saving to patientapp_patient table(Patient model) only if any changes were made
-        if updated:
+        if fill_from_discharge(patient):
             patient.save()
 
         serializer = self.get_serializer(patient, context={'request': request})
-        # Get current occupied bed
-        bed = Bed.objects.filter(patient=patient, is_occupied=True).first()
-        bed_data = BedSerializer(bed).data if bed else None
-
-        # Get current active emergency case
-        emergency = EmergencyCase.objects.filter(patient=patient, is_active=True).first()
-        emergency_data = EmergencyCaseSerializer(emergency).data if emergency else None
+        # Current occupied bed and active emergency case come from the dashboard snapshot
+        snapshot = get_snapshot(patient.pk)
 
         return Response({
             'profile': serializer.data,
-            'bed': bed_data,
-            'emergency_case': emergency_data
+            'bed': snapshot['bed'],
+            'emergency_case': snapshot['emergency_case']
         })
 
     @action(detail=False, methods=['put'], url_path='update_profile')
@@ -84,72 +76,47 @@ class PatientViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def dashboard_overview(self, request):
         """Get dashboard information for patient"""
-        patient = get_object_or_404(Patient, user=request.user)
-        
-        appointments_count = Appointment.objects.filter(patient=patient).count()
-        prescriptions_count = Prescription.objects.filter(patient=patient).count()
-        
-        # Try to get doctor from patient first
-        doctor = patient.assigned_doctor
-        
-        # If no doctor assigned but discharged, pull from discharge
-        if not doctor:
-            latest_discharge = PatientDischargeDetails.objects.filter(patient=patient).last()
-            if latest_discharge:
-                doctor = latest_discharge.doctor
-        
-        # Safely get doctor name and department
-        doctor_name = "Not Assigned"
-        department = "N/A"
-        
-        if doctor:
-            # Handle doctor being either an object or string
-            if hasattr(doctor, 'user') and doctor.user:
-                doctor_name = f"{doctor.user.first_name} {doctor.user.last_name}"
-                
-            # Handle department with safer attribute checking
-            if hasattr(doctor, 'department'):
-                if hasattr(doctor.department, 'name'):
-                    department = doctor.department.name
-                elif isinstance(doctor.department, str):
-                    department = doctor.department
-        
-        data = {
-            'patient_name': f"{patient.user.first_name} {patient.user.last_name}" if patient.user else "Unknown",
-            'doctor_name': doctor_name,
-            'department': department,
-            'admit_date': patient.admit_date,
-            'appointments_count': appointments_count,
-            'prescriptions_count': prescriptions_count,
-            'is_discharged': PatientDischargeDetails.objects.filter(patient=patient).exists()
-        }
-        
-        return Response(data)
+        patient = getattr(request.user, 'patient', None)  # pk-only instance, no query
+        snapshot = get_snapshot(patient.pk) if patient else None
+        if snapshot is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(snapshot['overview'])
 
     @action(detail=False, methods=['get'], url_path='search_doctors')
     def search_doctors(self, request):
-        queryset = Doctor.objects.all()
+        # served from the doctor directory cache (with ETag/304) until a doctor changes
+        return directory.cached_response(request, 'search_doctors', lambda: self._search_doctors(request))
+
+    def _search_doctors(self, request):
+        queryset = Doctor.objects.select_related('user')  # DoctorSerializers nests the user
         # Skip filters for testing
         search = request.query_params.get('search')
         department = request.query_params.get('department')
         
-        if search:
-            queryset = queryset.filter(user__first_name__icontains=search)
         if department:
             queryset = queryset.filter(department__icontains=department)
+        if search:
+            # ranked, typo tolerant match on first/last name and department
+            queryset = search_index.search(queryset, search)
+        else:
+            queryset = queryset.order_by('id')
 
-        serializer = DoctorSerializers(queryset, many=True)
-        return Response(serializer.data)
+        paginator = DoctorSearchPagination()
+        page = paginator.paginate_queryset(queryset, request)
+        serializer = DoctorSerializers(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 
 
-class PatientDischargeDetailsViewSet(viewsets.ModelViewSet):
+class PatientDischargeDetailsViewSet(RelatedFieldsMixin, viewsets.ModelViewSet):
     """API for managing Patient Discharge Details"""
     # queryset = PatientDischargeDetails.objects.all()
-    queryset = PatientDischargeDetails.objects.select_related('patient__user', 'doctor__user')
+    queryset = PatientDischargeDetails.objects.all()
     serializer_class = PatientDischargeDetailsSerializer
+    select_related_fields = ('patient__user', 'doctor__user')
+    keyset_ordering = ('-release_date', '-id')
     #Will uncomment after creating authentication
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -158,16 +125,25 @@ class PatientDischargeDetailsViewSet(viewsets.ModelViewSet):
         if hasattr(user, 'patient'):
             return PatientDischargeDetails.objects.filter(patient=user.patient)
         return PatientDischargeDetails.objects.none()
+
+    @action(detail=False, methods=['get'])
+    def billing_export(self, request):#/api/patient/discharge/billing_export/?output=csv&start=2025-01-01&end=2025-12-31&doctor=3
+        """Stream discharges as CSV or NDJSON: staff see all, doctors their own, patients theirs"""
+        return billing_export(
+            request, PatientDischargeDetails.objects.all(), exports.DISCHARGE_COLUMNS,
+            date_field='release_date', doctor_lookup='doctor_id', patient_lookup='patient', filename='discharges',
+        )
     
 
 #===========
-class InvoiceViewSet(viewsets.ModelViewSet):
+class InvoiceViewSet(RelatedFieldsMixin, viewsets.ModelViewSet):
     """API for managing patient invoices"""
     #Will uncomment after creating authentication
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
     
     serializer_class = InvoiceSerializer
+    keyset_ordering = ('-invoice_date', '-id')
     
     def get_queryset(self):
         """Allow patients to view only their invoices"""
@@ -195,26 +171,10 @@ class InvoiceViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['get'], url_path='download')
     def download_invoice(self, request, pk=None):
-        invoice = get_object_or_404(Invoice, pk=pk, patient__user=request.user)
+        invoice = get_object_or_404(Invoice.objects.select_related('patient__user'), pk=pk, patient__user=request.user)
 
         try:
-            buffer = BytesIO()
-            p = canvas.Canvas(buffer)
-            patient_name = invoice.patient.user.get_full_name() or invoice.patient.user.username
-
-            p.setFont("Helvetica", 14)
-            p.drawString(100, 800, f"Invoice ID: {invoice.id}")
-            p.drawString(100, 780, f"Patient: {smart_str(patient_name)}")
-            p.drawString(100, 760, f"Date: {invoice.invoice_date.strftime('%Y-%m-%d')}")
-            p.drawString(100, 740, f"Description: {invoice.description or 'N/A'}")
-            p.drawString(100, 720, f"Amount: ${invoice.amount}")
-            p.drawString(100, 700, f"Status: {'Paid' if invoice.is_paid else 'Unpaid'}")
-
-            p.showPage()
-            p.save()
-
-            pdf_content = buffer.getvalue()  # Read content before closing buffer
-            buffer.close()  # Now safe to close
+            pdf_content = get_invoice_pdf(invoice)  # rendered once, then served from the cache
 
             response = HttpResponse(pdf_content, content_type='application/pdf')
             response['Content-Disposition'] = f'attachment; filename="invoice_{invoice.id}.pdf"'
@@ -224,3 +184,47 @@ class InvoiceViewSet(viewsets.ModelViewSet):
 
         except Exception as e:
             return Response({'error': f'PDF generation failed: {str(e)}'}, status=500)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export_invoices(self, request):#/api/patient/invoices/export/?start=2025-01-01&end=2025-12-31
+        """Stream a ZIP of the logged-in patient's invoice PDFs, optionally within a date range"""
+        invoices = self.get_queryset().select_related('patient__user').order_by('invoice_date', 'id')
+        for param, lookup in (('start', 'invoice_date__gte'), ('end', 'invoice_date__lte')):
+            value = request.query_params.get(param)
+            if value:
+                date = parse_date(value)
+                if not date:
+                    return Response({'error': f'{param} must be a YYYY-MM-DD date'}, status=status.HTTP_400_BAD_REQUEST)
+                invoices = invoices.filter(**{lookup: date})
+
+        response = StreamingHttpResponse(stream_invoices_zip(invoices.iterator(chunk_size=200)), content_type='application/zip')
+        response['Content-Disposition'] = 'attachment; filename="invoices.zip"'
+        return response
+
+    @action(detail=False, methods=['get'])
+    def billing_export(self, request):#/api/patient/invoices/billing_export/?output=ndjson&start=2025-01-01&end=2025-01-31
+        """Stream invoices as CSV or NDJSON: staff see all, doctors their patients', patients theirs"""
+        return billing_export(
+            request, Invoice.objects.all(), exports.INVOICE_COLUMNS,
+            date_field='invoice_date', doctor_lookup='patient__assigned_doctor_id', patient_lookup='patient', filename='invoices',
+        )
+
+
+def billing_export(request, queryset, columns, date_field, doctor_lookup, patient_lookup, filename):
+    user = request.user
+    if not user.is_staff:
+        if hasattr(user, 'doctor'):
+            queryset = queryset.filter(**{doctor_lookup: user.doctor.pk})
+        elif hasattr(user, 'patient'):
+            queryset = queryset.filter(**{patient_lookup: user.patient})
+        else:
+            return Response({'error': 'Not allowed to export'}, status=status.HTTP_403_FORBIDDEN)
+
+    output = request.query_params.get('output', 'csv')
+    if output not in exports.FORMATS:
+        return Response({'error': f"output must be one of {list(exports.FORMATS)}"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        queryset = queryset.filter(**exports.export_filters(request.query_params, date_field, doctor_lookup))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return exports.stream_export(queryset.order_by(date_field, 'id'), columns, output, filename)